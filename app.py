@@ -1,42 +1,1872 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g, has_request_context
 import os
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from werkzeug.utils import secure_filename
+import base64
+import bisect
+import copy
+import cProfile
+import fcntl
+import gzip
+import hashlib
+import importlib
+import importlib.util
 import json
+import multiprocessing
+import operator
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    pandas and plotly make up most of the app's import time, and the upload
+    page, uploads and static files never use them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
+pio = LazyModule('plotly.io')
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None  # enables the columnar copy of uploads
+pa = LazyModule('pyarrow')
+pa_csv = LazyModule('pyarrow.csv')
+pa_compute = LazyModule('pyarrow.compute')
+
+# Rust-based Excel reader, several times faster than openpyxl
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') is not None else None
+
+def warm_imports():
+    """Import the lazily loaded libraries ahead of the first chart request"""
+    for module in (np, pd, pa, pa_csv, px, go, pio):
+        if module not in (pa, pa_csv) or HAS_PYARROW:
+            module.load()
+
+try:
+    import orjson  # noqa: F401 - fast figure serialization
+    JSON_ENGINE = 'orjson'
+except ImportError:
+    JSON_ENGINE = 'json'
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'data-viz-dashboard-key'
 app.config['UPLOAD_FOLDER'] = 'data'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['DATAFRAME_CACHE_BYTES'] = 512 * 1024 * 1024  # Memory budget for parsed DataFrames
+app.config['CHART_POINT_BUDGET'] = 5000  # Max points per chart before line/scatter data is reduced
+app.config['CHART_MAX_POINTS'] = 20000  # Largest point budget a request may ask for with max_points
+app.config['WEBGL_POINT_BUDGET'] = 100000  # Max scatter points drawn with WebGL before binning
+app.config['HISTOGRAM_MAX_BINS'] = 100
+app.config['ZOOM_PYRAMID_FACTOR'] = 8  # Each zoom level keeps about 1/N of the points of the level below
+app.config['ZOOM_CACHE_BYTES'] = 256 * 1024 * 1024  # Memory budget for the zoom pyramids of line and scatter charts
+app.config['FIGURE_CACHE_BYTES'] = 64 * 1024 * 1024  # Memory budget for serialized chart responses
+app.config['AGGREGATE_CACHE_BYTES'] = 64 * 1024 * 1024  # Memory budget for chart aggregates kept across requests
+app.config['BATCH_MAX_CHARTS'] = 50
+app.config['COMPRESS_MIN_BYTES'] = 1024  # Smaller responses are sent uncompressed
+app.config['BATCH_CHART_WORKERS'] = 4  # Threads building the figures of one batch request
+app.config['UPLOAD_CHUNK_BYTES'] = 8 * 1024 * 1024  # Part size used by the resumable upload client
+app.config['UPLOAD_PARTIAL_TTL'] = 24 * 3600  # Seconds an unfinished resumable upload is kept after its last part
+app.config['STREAMING_INGEST_BYTES'] = 64 * 1024 * 1024  # CSVs above this are processed in chunks
+app.config['CSV_CHUNK_ROWS'] = 250000
+app.config['PARALLEL_INGEST'] = True  # Parse with the multi-threaded pyarrow CSV reader and calamine when installed
+app.config['CSV_BLOCK_BYTES'] = 16 * 1024 * 1024  # CSV text per block of the pyarrow reader
+app.config['PROFILE_DISTINCT_LIMIT'] = 1000  # Distinct values tracked exactly per column
+app.config['SKETCH_TOP_VALUES'] = 1000  # Most frequent values counted per text column at ingest
+app.config['CHART_MAX_CATEGORIES'] = 50  # Count charts of text columns with more values show the top ones plus Other
+app.config['COLUMNAR_STORE_BYTES'] = 10 * 1024 * 1024 * 1024  # Disk budget for columnar copies of uploads
+app.config['DATASET_IDLE_SECONDS'] = 7 * 24 * 3600  # Columnar copies unread for this long are evicted
+app.config['CATEGORY_MAX_RATIO'] = 0.5  # Strings with at most this many distinct values per row load as category
+app.config['SERVER_WORKERS'] = min(4, os.cpu_count() or 1)  # Processes started by serve.py
+app.config['SERVER_THREADS'] = 4  # Request threads per server process
+app.config['SERVER_TIMEOUT'] = 120  # Seconds before a stuck server process is restarted
+app.config['CHART_JOB_WORKERS'] = 2  # Processes building charts submitted as background jobs
+app.config['CHART_JOB_MIN_ROWS'] = 1000000  # Dashboards of larger datasets build charts as jobs
+app.config['CHART_JOB_TTL'] = 600  # Seconds finished jobs stay available
+app.config['PROFILE_SLOW_REQUESTS_MS'] = None  # Set to dump cProfile stats of slower requests
+app.config['PROFILE_FOLDER'] = 'profiles'
+app.config['PROFILE_KEEP'] = 20  # Profiles of the slowest requests kept on disk
+app.config['LIVE_POLL_SECONDS'] = 2  # How often live dashboards check their dataset for new rows
+app.config['LIVE_MAX_STREAMS'] = 2  # Live dashboards streamed at once per process, each holding a request thread
+app.config['ADMISSION_MEMORY_BYTES'] = 1024 * 1024 * 1024  # Estimated data memory of the charts built at once per process; None disables admission control
+app.config['ADMISSION_QUEUE_LENGTH'] = 32  # Chart requests waiting for memory beyond this are rejected at once
+app.config['ADMISSION_WAIT_SECONDS'] = 10  # Longest a chart request waits for memory before a 429
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'json'}
+CHART_TYPES = {'bar', 'line', 'scatter', 'pie', 'histogram'}
+AGGREGATE_CHART_TYPES = {'bar', 'pie', 'histogram'}
+
+@app.template_filter('number_format')
+def number_format(value):
+    return f"{value:,}"
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def load_data(file_path, file_type):
-    """Load data from various file formats"""
+def arrow_csv_options(file_path, columns=None, newlines_in_values=False):
+    """pyarrow CSV options reading a file with the types pd.read_csv would give it.
+
+    pyarrow infers dates and timestamps from the first block, while pandas
+    leaves them as text; such columns are read as strings so profiles and
+    charts see the same types whichever reader parsed the file. Returns
+    (read, parse, convert) options, or None when pd.read_csv should be used
+    instead.
+    """
+    read_options = pa_csv.ReadOptions(block_size=app.config['CSV_BLOCK_BYTES'])
+    parse_options = pa_csv.ParseOptions(newlines_in_values=newlines_in_values)
+    convert_options = pa_csv.ConvertOptions(include_columns=columns, strings_can_be_null=True)
+    with pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options,
+                         convert_options=convert_options) as reader:
+        schema = reader.schema
+    if len(set(schema.names)) != len(schema.names):
+        # pandas renames duplicate headers, pyarrow keeps them
+        return None
+    convert_options.column_types = {field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)}
+    return read_options, parse_options, convert_options
+
+def is_split_value_error(error):
+    """Whether pyarrow failed on a quoted value spanning lines, cut where its chunker split blocks"""
+    message = str(error)
+    return 'out of sync with chunker' in message or message.startswith('CSV parse error')
+
+def with_arrow_csv(file_path, read):
+    """Call read(newlines_in_values), first with the fast block chunker.
+
+    The default chunker splits blocks at any newline, which only works when
+    no quoted value spans lines. Files where it cut such a value are read
+    again with newlines_in_values, whose chunker tracks quotes and is
+    slower; other files never pay for it.
+    """
     try:
-        if file_type == 'csv':
-            return pd.read_csv(file_path)
-        elif file_type in ['xlsx', 'xls']:
-            return pd.read_excel(file_path)
-        elif file_type == 'json':
-            return pd.read_json(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        return read(False)
+    except pa.ArrowInvalid as e:
+        if not is_split_value_error(e):
+            raise
+        app.logger.info("Reading %s with values spanning lines: %s", file_path, e)
+        return read(True)
+
+def read_csv(file_path, columns=None):
+    """Parse a CSV, using every core through the pyarrow reader when available.
+
+    Files pyarrow cannot read with the types it inferred from the first
+    block (say integers turning into decimals further down) are parsed with
+    pd.read_csv.
+    """
+    def read(newlines_in_values):
+        options = arrow_csv_options(file_path, columns, newlines_in_values)
+        if options is None:
+            return None
+        read_options, parse_options, convert_options = options
+        return pa_csv.read_csv(file_path, read_options=read_options, parse_options=parse_options,
+                               convert_options=convert_options).to_pandas()
+
+    if HAS_PYARROW and app.config['PARALLEL_INGEST']:
+        try:
+            df = with_arrow_csv(file_path, read)
+            if df is not None:
+                return df
+        except pa.ArrowException as e:
+            app.logger.info("Parsing %s with pandas: %s", file_path, e)
+    return pd.read_csv(file_path, usecols=columns)
+
+def parse_file(file_path, file_type, columns=None):
+    """Parse an uploaded file in its original format.
+
+    columns limits parsing to the listed columns, in that order; CSV and
+    Excel readers skip the other columns entirely.
+    """
+    usecols = list(columns) if columns is not None else None
+    if file_type == 'csv':
+        df = read_csv(file_path, usecols)
+    elif file_type in ['xlsx', 'xls']:
+        df = pd.read_excel(file_path, usecols=usecols, engine=EXCEL_ENGINE if app.config['PARALLEL_INGEST'] else None)
+    elif file_type == 'json':
+        df = pd.read_json(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    return df[usecols] if usecols is not None else df
+
+def optimize_dtypes(df):
+    """Store columns in the smallest types that hold their values exactly.
+
+    Integers are downcast to the narrowest integer type covering their range
+    and strings repeating often enough (CATEGORY_MAX_RATIO distinct values
+    per row) become categoricals. Floats stay float64 so sums keep their
+    precision.
+    """
+    max_ratio = app.config['CATEGORY_MAX_RATIO']
+    dtypes = {}
+    for name, values in df.items():
+        if pd.api.types.is_bool_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            dtype = pd.to_numeric(values, downcast='integer').dtype
+            if dtype != values.dtype:
+                dtypes[name] = dtype
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            try:
+                distinct = values.nunique()
+            except TypeError:
+                # Unhashable values such as nested JSON objects
+                continue
+            if len(values) and distinct <= max_ratio * len(values):
+                dtypes[name] = 'category'
+    return df.astype(dtypes) if dtypes else df
+
+def columnar_path(file_path):
+    """Location of the Arrow IPC (Feather) copy of an upload"""
+    return f"{file_path}.feather"
+
+def columnar_temp_path(file_path):
+    # Unique per process so workers converting the same upload do not collide
+    return f"{columnar_path(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def evicted_marker_path(file_path):
+    """Marker left by evict_cold_datasets so the columnar copy is rebuilt on next read"""
+    return f"{file_path}.evicted"
+
+def has_fresh_columnar(file_path):
+    """Check the columnar copy exists and is not older than the upload"""
+    target = columnar_path(file_path)
+    return (HAS_PYARROW and os.path.exists(target)
+            and os.stat(target).st_mtime_ns >= os.stat(file_path).st_mtime_ns)
+
+def convert_to_columnar(file_path, file_type, df=None):
+    """Convert an upload once into a typed Arrow IPC file next to the original.
+
+    Returns the path of the columnar file, or None when the data cannot be
+    stored in Arrow (pyarrow missing, non-string column names, mixed-type
+    columns); such uploads keep being parsed from the original file. An
+    already parsed DataFrame of the upload can be passed in as df.
+    """
+    if not HAS_PYARROW:
+        return None
+
+    if df is None:
+        df = parse_file(file_path, file_type)
+    if not all(isinstance(col, str) for col in df.columns):
+        return None
+
+    target = columnar_path(file_path)
+    temp_path = columnar_temp_path(file_path)
+    try:
+        # Uncompressed so readers can map the file instead of decompressing it
+        optimize_dtypes(df.reset_index(drop=True)).to_feather(temp_path, compression='uncompressed')
+    except Exception as e:
+        app.logger.warning("Columnar conversion of %s failed: %s", file_path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    os.replace(temp_path, target)
+    return target
+
+def read_columnar(file_path, columns=None):
+    """Read the columnar copy of an upload through a memory map.
+
+    The copy is stored uncompressed, so Arrow uses the mapped pages in
+    place and numeric columns without nulls become views of them: worker
+    processes reading the same dataset share the OS page cache instead of
+    each holding a copy.
+    """
+    table = pa.ipc.open_file(pa.memory_map(columnar_path(file_path))).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    touch_columnar(file_path)
+    return table.to_pandas(split_blocks=True)
+
+def touch_columnar(file_path):
+    """Record a read of the columnar copy in its access time, used for eviction"""
+    target = columnar_path(file_path)
+    stat = os.stat(target)
+    now = time.time()
+    # Access times are only needed to the minute
+    if now - stat.st_atime > 60:
+        try:
+            os.utime(target, ns=(int(now * 1e9), stat.st_mtime_ns))
+        except OSError:
+            pass
+
+def ensure_columnar(file_path, file_type):
+    """Check for a fresh columnar copy, rebuilding one that is stale or was removed by eviction.
+
+    A copy goes stale when another process writes to the upload. It is
+    rebuilt under the append lock, so an append cannot add its rows to a copy
+    already rebuilt from them; a copy that cannot be rebuilt is removed.
+    """
+    if has_fresh_columnar(file_path):
+        return True
+    target = columnar_path(file_path)
+    marker = evicted_marker_path(file_path)
+    if not HAS_PYARROW or not (os.path.exists(marker) or os.path.exists(target)):
+        return False
+    with append_lock():
+        if not has_fresh_columnar(file_path):
+            if is_streamed(file_path, file_type):
+                rebuilt = convert_csv_to_columnar_chunked(file_path, get_profile(file_path, file_type))
+            else:
+                rebuilt = convert_to_columnar(file_path, file_type)
+            if rebuilt is None and os.path.exists(target):
+                os.remove(target)
+        if os.path.exists(marker):
+            os.remove(marker)
+    return has_fresh_columnar(file_path)
+
+def load_data(file_path, file_type, columns=None):
+    """Load data from various file formats.
+
+    Only the requested columns are read: from the memory-mapped columnar
+    copy of the upload when one is available (already stored with optimized
+    dtypes), otherwise by parsing just those columns and optimizing their
+    dtypes.
+    """
+    try:
+        if ensure_columnar(file_path, file_type):
+            return read_columnar(file_path, columns)
+        return optimize_dtypes(parse_file(file_path, file_type, columns))
     except Exception as e:
         raise ValueError(f"Error loading file: {str(e)}")
 
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total weight of its values"""
+
+    def __init__(self, max_weight, weigher=None):
+        self.max_weight = max_weight
+        self.weigher = weigher or (lambda value: 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        weight = self.weigher(value)
+        with self._lock:
+            if key in self._entries:
+                self._weight -= self._entries.pop(key)[1]
+            # Values larger than the whole budget are never cached
+            if weight > self.max_weight:
+                return
+            self._entries[key] = (value, weight)
+            self._weight += weight
+            while self._weight > self.max_weight:
+                _, (_, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+                self.evictions += 1
+
+    def put_version(self, key, value):
+        """Cache a value derived from one version of a file, dropping those of its older versions.
+
+        key starts with the file's fingerprint (path, mtime_ns, size); entries
+        of older versions of the same path can never be hit again.
+        """
+        path, mtime = key[:2]
+        self.discard(lambda k: k[0] == path and k[1] <= mtime and k[:3] != key[:3])
+        self.put(key, value)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def items(self):
+        """Snapshot of the cached (key, value) pairs, without counting hits"""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def discard(self, predicate):
+        """Drop every entry whose key matches predicate"""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                self._weight -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'weight': self._weight,
+                'max_weight': self.max_weight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def dataframe_size(df):
+    """Approximate in-memory size of a DataFrame in bytes"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+dataframe_cache = LRUCache(app.config['DATAFRAME_CACHE_BYTES'], weigher=dataframe_size)
+
+def file_fingerprint(file_path):
+    """Identify a file version by its path, modification time and size"""
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+def load_cached_data(file_path, file_type, columns=None):
+    """Load data through the shared DataFrame cache.
+
+    With columns given, a cached full frame is projected when present;
+    otherwise only those columns are loaded and cached. The returned
+    DataFrame is shared between requests and must not be modified in place.
+    Uploads with a columnar copy are read from its memory map instead:
+    those frames live in the OS page cache, shared by all workers.
+    """
+    if ensure_columnar(file_path, file_type):
+        return load_data(file_path, file_type, columns)
+
+    fingerprint = file_fingerprint(file_path)
+    full_key = fingerprint + (None,)
+    df = dataframe_cache.get(full_key)
+    if df is not None:
+        return df[list(columns)] if columns is not None else df
+    if columns is None:
+        key = full_key
+    else:
+        key = fingerprint + (tuple(columns),)
+        df = dataframe_cache.get(key)
+        if df is not None:
+            return df
+
+    df = load_data(file_path, file_type, columns)
+    dataframe_cache.put_version(key, df)
+    return df
+
+def chart_columns(*columns):
+    """Distinct, non-empty column names used by a chart, in order"""
+    return list(dict.fromkeys(col for col in columns if col))
+
+def normalize_dtype(dtype):
+    """Collapse a pandas dtype into the few types tracked by a profile"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float64'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime64[ns]'
+    return 'str'
+
+def merge_dtypes(first, second):
+    """Common dtype of a column typed differently in two chunks"""
+    if first == second:
+        return first
+    if {first, second} <= {'int64', 'float64'}:
+        return 'float64'
+    return 'str'
+
+DTYPE_KINDS = {'int64': 'numeric', 'float64': 'numeric', 'bool': 'boolean',
+               'datetime64[ns]': 'datetime', 'str': 'categorical'}
+# Kinds whose histograms bin values; pandas counts booleans as numeric too
+BINNED_KINDS = ('numeric', 'boolean', 'datetime')
+
+HLL_PRECISION = 12  # 4096 HyperLogLog registers per column, about 1.6% standard error
+
+def bit_length(values):
+    """Number of significant bits of each value of a uint64 array"""
+    length = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        over = values >= np.uint64(1 << shift)
+        values = np.where(over, values >> np.uint64(shift), values)
+        length += over.astype(np.uint8) * shift
+    return length + (values > 0)
+
+def hll_registers(values):
+    """HyperLogLog registers of an array of values.
+
+    Each value is hashed; the first HLL_PRECISION bits pick a register,
+    which keeps the highest position of the first set bit among the rest.
+    Duplicates leave the registers unchanged, so passing only the distinct
+    values of a chunk gives the same result.
+    """
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    if len(values):
+        hashes = pd.util.hash_array(np.asarray(values), categorize=False)
+        register = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - HLL_PRECISION)) - 1)
+        np.maximum.at(registers, register, (64 - HLL_PRECISION + 1 - bit_length(rest)).astype(np.uint8))
+    return registers
+
+def encode_registers(registers):
+    return base64.b64encode(registers.tobytes()).decode('ascii')
+
+def decode_registers(text):
+    return np.frombuffer(base64.b64decode(text), dtype=np.uint8)
+
+def hll_estimate(registers):
+    """Distinct values counted by HyperLogLog registers"""
+    size = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / size) * size * size / np.exp2(-registers.astype(np.float64)).sum()
+    empty = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * size and empty:
+        # Linear counting is more accurate while many registers are empty
+        estimate = size * np.log(size / empty)
+    return int(round(estimate))
+
+def count_top_values(top, error, values, capacity):
+    """Fold a chunk into Space-Saving counters of the most frequent values.
+
+    Values new to the counters start from error, the most times an
+    untracked value may have been seen, so every count is an upper bound
+    at most error above the true count. Returns the counters, largest
+    first, and the new error bound.
+    """
+    counts = values.value_counts()
+    if isinstance(counts.index, pd.CategoricalIndex):
+        # Categories missing from the chunk are counted as zero
+        counts = counts.iloc[:np.count_nonzero(counts.to_numpy())]
+    untracked_error = error
+    if len(counts) > capacity:
+        # Beyond the chunk's most frequent values only tracked ones can stay in the counters
+        rest = counts.iloc[capacity:]
+        untracked_error += int(rest.iloc[0])
+        counts = pd.concat([counts.iloc[:capacity], rest.iloc[np.flatnonzero(rest.index.isin(list(top)))]])
+
+    merged = dict(top)
+    for value, count in zip(counts.index.astype(str), counts.tolist()):
+        merged[value] = merged.get(value, error) + count
+    ranked = sorted(merged.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) > capacity:
+        untracked_error = max(untracked_error, ranked[capacity][1])
+    return dict(ranked[:capacity]), untracked_error
+
+class DatasetProfile:
+    """Column metadata of a dataset, accumulated one chunk at a time.
+
+    Per column it records the dtype, null count, cardinality and min/max of
+    numeric and datetime values. Distinct values are tracked exactly up to
+    PROFILE_DISTINCT_LIMIT; beyond that the cardinality is estimated from a
+    HyperLogLog sketch. Text columns also keep Space-Saving counters of
+    their SKETCH_TOP_VALUES most frequent values.
+    """
+
+    def __init__(self, rows=0, columns=None):
+        self.rows = rows
+        self.columns = columns if columns is not None else {}
+        self._temporal = {}
+
+    def update(self, chunk):
+        distinct_limit = app.config['PROFILE_DISTINCT_LIMIT']
+        self.rows += len(chunk)
+        self._temporal = {}
+        for name in chunk.columns:
+            series = chunk[name]
+            dtype = normalize_dtype(series.dtype)
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = {'dtype': dtype, 'nulls': 0, 'distinct': 0,
+                                               'distinct_exact': True, 'values': [],
+                                               'min': None, 'max': None,
+                                               'hll': encode_registers(hll_registers([])),
+                                               'top': {}, 'top_error': 0}
+            else:
+                column['dtype'] = merge_dtypes(column['dtype'], dtype)
+            column['nulls'] += int(series.isna().sum())
+            present = series.dropna()
+
+            if column['distinct_exact']:
+                values = set(column['values'])
+                values.update(pd.unique(present.astype(str)))
+                if len(values) > distinct_limit:
+                    column.update(distinct=max(len(values), column['distinct']), distinct_exact=False, values=[])
+                else:
+                    column.update(distinct=len(values), values=sorted(values))
+
+            if pd.api.types.is_object_dtype(present):
+                # Sketch values such as nested JSON objects, which cannot be hashed, by their text
+                present = present.astype(str)
+            # Profiles saved before the sketches were added have none to update
+            if column.get('hll') is not None:
+                registers = np.maximum(decode_registers(column['hll']), hll_registers(pd.unique(present)))
+                column['hll'] = encode_registers(registers)
+                if not column['distinct_exact']:
+                    column['distinct'] = max(distinct_limit + 1, hll_estimate(registers))
+            if column.get('top') is not None:
+                if DTYPE_KINDS[column['dtype']] == 'categorical':
+                    column['top'], column['top_error'] = count_top_values(
+                        column['top'], column['top_error'], present, app.config['SKETCH_TOP_VALUES'])
+                else:
+                    column['top'] = None
+
+            kind = DTYPE_KINDS[column['dtype']]
+            if kind not in ('numeric', 'datetime') or kind != DTYPE_KINDS[dtype]:
+                column['min'] = column['max'] = None
+            elif len(present):
+                if kind == 'datetime':
+                    low, high = present.min().isoformat(), present.max().isoformat()
+                else:
+                    low, high = present.min().item(), present.max().item()
+                column['min'] = low if column['min'] is None else min(column['min'], low)
+                column['max'] = high if column['max'] is None else max(column['max'], high)
+        return self
+
+    def kind(self, name):
+        return DTYPE_KINDS[self.columns[name]['dtype']]
+
+    def is_temporal(self, name):
+        """Whether a column holds dates, either typed or kept as text and known from its profiled values"""
+        kind = self.kind(name)
+        if kind != 'categorical':
+            return kind == 'datetime'
+        if name not in self._temporal:
+            column = self.columns[name]
+            sample = (column['values'] or list(column.get('top') or {}))[:100]
+            temporal = bool(sample)
+            if temporal:
+                try:
+                    pd.to_datetime(pd.Series(sample), format='ISO8601')
+                except (ValueError, TypeError):
+                    temporal = False
+            self._temporal[name] = temporal
+        return self._temporal[name]
+
+    def binned(self, name):
+        """Whether histograms of a column bin its values, dates kept as text included"""
+        return self.kind(name) in BINNED_KINDS or self.is_temporal(name)
+
+    def value_range(self, name):
+        column = self.columns[name]
+        return [column['min'], column['max']]
+
+    def columns_of_kind(self, kind):
+        return [name for name in self.columns if self.kind(name) == kind]
+
+    def summary(self):
+        """Per-column overview shown on the dashboard"""
+        return [{'name': name, 'kind': self.kind(name), 'dtype': column['dtype'],
+                 'nulls': column['nulls'], 'distinct': column['distinct'],
+                 'distinct_exact': column['distinct_exact'],
+                 'distinct_estimated': not column['distinct_exact'] and column.get('hll') is not None,
+                 'min': column['min'], 'max': column['max']}
+                for name, column in self.columns.items()]
+
+    def to_dict(self):
+        return {'rows': self.rows, 'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['rows'], data['columns'])
+
+def profile_path(file_path):
+    """Location of the profile sidecar of an upload"""
+    return f"{file_path}.profile.json"
+
+def save_profile(file_path, profile):
+    # Unique per process and thread so concurrent writers do not collide
+    temp_path = f"{profile_path(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(profile.to_dict(), f)
+    os.replace(temp_path, profile_path(file_path))
+
+def load_profile(file_path):
+    """Read the profile sidecar of an upload, or None when missing or stale"""
+    path = profile_path(file_path)
+    if not os.path.exists(path) or os.stat(path).st_mtime_ns < os.stat(file_path).st_mtime_ns:
+        return None
+    with open(path) as f:
+        return DatasetProfile.from_dict(json.load(f))
+
+def is_streamed(file_path, file_type):
+    """Whether an upload is too large to be loaded into memory whole"""
+    return file_type == 'csv' and os.path.getsize(file_path) > app.config['STREAMING_INGEST_BYTES']
+
+def profile_csv_chunked(file_path):
+    """Profile a CSV with pd.read_csv(chunksize=...) in bounded memory"""
+    profile = DatasetProfile()
+    for chunk in pd.read_csv(file_path, chunksize=app.config['CSV_CHUNK_ROWS']):
+        profile.update(chunk)
+    return profile
+
+def convert_csv_to_columnar_chunked(file_path, profile):
+    """Write the Arrow IPC copy of a large CSV one chunk at a time.
+
+    Chunks are parsed with the dtypes resolved by the profile, so every
+    record batch shares the same schema.
+    """
+    if not HAS_PYARROW:
+        return None
+
+    dtypes = {name: column['dtype'] for name, column in profile.columns.items()
+              if column['dtype'] != 'datetime64[ns]'}
+    target = columnar_path(file_path)
+    temp_path = columnar_temp_path(file_path)
+    writer = schema = None
+    try:
+        for chunk in pd.read_csv(file_path, chunksize=app.config['CSV_CHUNK_ROWS'], dtype=dtypes):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                options = pa.ipc.IpcWriteOptions(compression=None)
+                writer = pa.ipc.new_file(temp_path, schema, options=options)
+            writer.write_table(table.cast(schema))
+    except Exception as e:
+        app.logger.warning("Columnar conversion of %s failed: %s", file_path, e)
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    if writer is None:
+        return None
+    writer.close()
+    os.replace(temp_path, target)
+    return target
+
+def ingest_csv_arrow(file_path):
+    """Profile a large CSV and write its columnar copy in a single pass.
+
+    The pyarrow streaming reader parses blocks of CSV_BLOCK_BYTES on
+    several threads; each record batch goes to the columnar copy as is and
+    updates the profile. Returns the profile, or None when the file has to
+    go through the two-pass pandas route (pd.read_csv chunks).
+    """
+    target = columnar_path(file_path)
+    temp_path = columnar_temp_path(file_path)
+
+    def ingest(newlines_in_values):
+        options = arrow_csv_options(file_path, newlines_in_values=newlines_in_values)
+        if options is None:
+            return None
+        read_options, parse_options, convert_options = options
+        profile = DatasetProfile()
+        with pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options,
+                             convert_options=convert_options) as reader:
+            write_options = pa.ipc.IpcWriteOptions(compression=None)
+            with pa.ipc.new_file(temp_path, reader.schema, options=write_options) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+                    profile.update(batch.to_pandas())
+        return profile
+
+    try:
+        profile = with_arrow_csv(file_path, ingest)
+        if profile is None:
+            return None
+    except pa.ArrowException as e:
+        app.logger.info("Ingesting %s with pandas: %s", file_path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    os.replace(temp_path, target)
+    return profile
+
+def ingest_upload(file_path, file_type):
+    """Prepare the derived files of a new upload.
+
+    Every upload gets its profile sidecar and columnar copy from a single
+    parse. Large CSVs are profiled and converted block by block so memory
+    stays bounded regardless of the file size.
+    """
+    if is_streamed(file_path, file_type):
+        profile = ingest_csv_arrow(file_path) if HAS_PYARROW and app.config['PARALLEL_INGEST'] else None
+        if profile is None:
+            profile = profile_csv_chunked(file_path)
+            convert_csv_to_columnar_chunked(file_path, profile)
+    else:
+        df = parse_file(file_path, file_type)
+        profile = DatasetProfile().update(df)
+        convert_to_columnar(file_path, file_type, df)
+    save_profile(file_path, profile)
+    evict_cold_datasets()
+
+def evict_cold_datasets():
+    """Remove the columnar copies of uploads that are not being read.
+
+    Copies unread for DATASET_IDLE_SECONDS are removed, then the least
+    recently read ones until the rest fit in COLUMNAR_STORE_BYTES. Each
+    evicted upload gets a marker so its copy is rebuilt when it is read
+    again. Returns the paths of the evicted uploads.
+    """
+    folder = app.config['UPLOAD_FOLDER']
+    copies = []
+    for name in os.listdir(folder):
+        if name.endswith('.feather'):
+            stat = os.stat(os.path.join(folder, name))
+            copies.append((stat.st_atime, stat.st_size, os.path.join(folder, name)))
+    copies.sort()
+
+    total = sum(size for _, size, _ in copies)
+    idle_cutoff = time.time() - app.config['DATASET_IDLE_SECONDS']
+    evicted = []
+    for accessed, size, path in copies:
+        if accessed >= idle_cutoff and total <= app.config['COLUMNAR_STORE_BYTES']:
+            break
+        upload = path[:-len('.feather')]
+        try:
+            # Processes still mapping the file keep reading it until they close it
+            os.remove(path)
+        except OSError as e:
+            app.logger.warning("Could not evict %s: %s", path, e)
+            continue
+        total -= size
+        if os.path.exists(upload):
+            open(evicted_marker_path(upload), 'w').close()
+            evicted.append(upload)
+    if evicted:
+        app.logger.info("Evicted columnar copies of %d cold uploads", len(evicted))
+    return evicted
+
+profile_cache = LRUCache(256)
+
+def get_profile(file_path, file_type):
+    """Profile of an upload, computed and saved on first use when missing"""
+    key = file_fingerprint(file_path)
+    profile = profile_cache.get(key)
+    if profile is None:
+        profile = load_profile(file_path)
+        if profile is None:
+            if is_streamed(file_path, file_type):
+                profile = profile_csv_chunked(file_path)
+            else:
+                profile = DatasetProfile().update(load_cached_data(file_path, file_type))
+            save_profile(file_path, profile)
+        profile_cache.put_version(key, profile)
+    return profile
+
+def validate_chart_columns(spec, profile):
+    """Reject column choices that cannot work before any data is loaded"""
+    for role in ('x_column', 'y_column', 'color_column'):
+        column = spec[role]
+        if column is not None and column not in profile.columns:
+            raise ValueError(f"Column '{column}' not found in dataset")
+    if spec['chart_type'] in ('line', 'scatter') and not spec['y_column']:
+        raise ValueError(f"A y_column is required for {spec['chart_type']} charts")
+    if spec['chart_type'] == 'bar' and spec['y_column'] and profile.kind(spec['y_column']) != 'numeric':
+        raise ValueError(f"Column '{spec['y_column']}' must be numeric to be summed in a bar chart")
+    if spec['resample']:
+        if not profile.is_temporal(spec['x_column']):
+            raise ValueError(f"Column '{spec['x_column']}' must hold dates to be resampled")
+        if profile.kind(spec['y_column']) != 'numeric':
+            raise ValueError(f"Column '{spec['y_column']}' must be numeric to be resampled")
+    for predicate in spec['filters']:
+        if predicate['column'] not in profile.columns:
+            raise ValueError(f"Filter column '{predicate['column']}' not found in dataset")
+        filter_value(profile.kind(predicate['column']), predicate['value'])
+
+COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+               '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+FILTER_OPS = set(COMPARISONS) | {'in', 'between'}
+
+def decode_json_field(data, field):
+    # GET requests carry nested fields as JSON text
+    value = data.get(field)
+    return json.loads(value) if isinstance(value, str) else value
+
+def filter_spec(data):
+    """Normalize the filters and time window of a chart request into a list of predicates.
+
+    filters is a list of {"column", "op", "value"} predicates, all of which
+    must hold; time_window {"column", "start", "end"} selects start <= value
+    < end and becomes two predicates.
+    """
+    filters = decode_json_field(data, 'filters') or []
+    if not isinstance(filters, list):
+        raise ValueError('filters must be a list of {"column", "op", "value"} objects')
+    predicates = []
+    for item in filters:
+        if not isinstance(item, dict) or not item.get('column'):
+            raise ValueError('Every filter needs a column')
+        op, value = item.get('op'), item.get('value')
+        if op not in FILTER_OPS:
+            raise ValueError(f"Filter operator must be one of {', '.join(sorted(FILTER_OPS))}")
+        if value is None:
+            raise ValueError(f"Filter on '{item['column']}' needs a value")
+        if op == 'in' and not isinstance(value, list):
+            raise ValueError("The 'in' operator takes a list of values")
+        if op == 'between' and not (isinstance(value, list) and len(value) == 2):
+            raise ValueError("The 'between' operator takes a [low, high] pair")
+        predicates.append({'column': item['column'], 'op': op, 'value': value})
+
+    window = decode_json_field(data, 'time_window')
+    if window:
+        if not isinstance(window, dict) or not window.get('column') or not (window.get('start') or window.get('end')):
+            raise ValueError('time_window needs a column and a start or an end')
+        if window.get('start'):
+            predicates.append({'column': window['column'], 'op': '>=', 'value': window['start']})
+        if window.get('end'):
+            predicates.append({'column': window['column'], 'op': '<', 'value': window['end']})
+    return predicates
+
+def filter_value(kind, value):
+    """Convert a filter value to the type of the column kind it is compared with"""
+    if isinstance(value, list):
+        return [filter_value(kind, item) for item in value]
+    try:
+        if kind == 'numeric':
+            return pd.to_numeric(value)
+        if kind == 'datetime':
+            return pd.Timestamp(value)
+        if kind == 'boolean':
+            if isinstance(value, str) and value.lower() in ('true', 'false'):
+                return value.lower() == 'true'
+            if not isinstance(value, bool):
+                raise ValueError("expected true or false")
+            return value
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid filter value {value!r} for a {kind} column: {e}")
+    # Text columns compare as strings, so ISO dates stored as text filter by date too
+    return str(value)
+
+def predicate_mask(values, op, value):
+    if op == 'in':
+        return values.isin(value)
+    if op == 'between':
+        return (values >= value[0]) & (values <= value[1])
+    return COMPARISONS[op](values, value)
+
+def filter_mask(df, filters):
+    """Vectorized mask of the rows matching every predicate; missing values never match"""
+    mask = np.ones(len(df), dtype=bool)
+    for predicate in filters:
+        name, op = predicate['column'], predicate['op']
+        values = df[name]
+        value = filter_value(DTYPE_KINDS[normalize_dtype(values.dtype)], predicate['value'])
+        try:
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Test the few categories, then look each row up by its code (-1, missing, picks False)
+                matches = predicate_mask(pd.Series(values.cat.categories), op, value).to_numpy()
+                mask &= np.append(matches, False)[values.cat.codes.to_numpy()]
+            else:
+                mask &= (predicate_mask(values, op, value) & values.notna()).to_numpy()
+        except TypeError as e:
+            raise ValueError(f"Cannot filter column '{name}' with {op} {predicate['value']!r}: {e}")
+    return mask
+
+def apply_filters(df, filters, columns=None):
+    """Rows of df matching filters, limited to columns"""
+    if filters:
+        df = df[filter_mask(df, filters)]
+    return df[list(columns)] if columns is not None and list(df.columns) != list(columns) else df
+
+def zone_may_match(zone, op, value):
+    """Whether a record batch whose values span zone (min, max) can hold rows matching a predicate"""
+    low, high = zone
+    if low is None:
+        # Only missing values, which never match
+        return False
+    try:
+        if op == '==':
+            return low <= value <= high
+        if op == '!=':
+            return not low == high == value
+        if op == 'in':
+            return any(low <= item <= high for item in value)
+        if op == 'between':
+            return value[0] <= high and low <= value[1]
+        return COMPARISONS[op](low if op in ('<', '<=') else high, value)
+    except TypeError:
+        return True
+
+def arrow_kind(arrow_type):
+    """Profile kind of an Arrow column type"""
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return 'numeric'
+    if pa.types.is_timestamp(arrow_type):
+        return 'datetime'
+    return 'categorical'
+
+zone_cache = LRUCache(1024)
+
+def zone_map(file_path, reader, column):
+    """Min and max of a column in each record batch of the columnar copy.
+
+    Computed with Arrow kernels over the memory-mapped column on the first
+    filtered read of a file version, then cached.
+    """
+    key = file_fingerprint(file_path) + (column,)
+    zones = zone_cache.get(key)
+    if zones is None:
+        zones = []
+        for i in range(reader.num_record_batches):
+            values = reader.get_batch(i).column(column)
+            if pa.types.is_dictionary(values.type):
+                values = values.dictionary_decode()
+            stats = pa_compute.min_max(values)
+            zones.append((stats['min'].as_py(), stats['max'].as_py()))
+        zone_cache.put_version(key, zones)
+    return zones
+
+def load_filtered(file_path, file_type, columns, filters):
+    """Load the rows of an upload matching filters, with only the given columns.
+
+    Reading the columnar copy skips every record batch whose zone map rules
+    the filters out, so selective filters on sorted or clustered columns
+    (time windows on appended data, say) read a few batches only.
+    """
+    if is_streamed(file_path, file_type) or has_fresh_columnar(file_path):
+        chunks = list(iter_chunks(file_path, file_type, columns, filters))
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0].reset_index(drop=True)
+    needed = chart_columns(*columns, *(predicate['column'] for predicate in filters))
+    return apply_filters(load_cached_data(file_path, file_type, needed), filters, columns).reset_index(drop=True)
+
+def iter_chunks(file_path, file_type, columns=None, filters=None):
+    """Yield the data of an upload as bounded-size DataFrame chunks.
+
+    With filters, only matching rows are yielded, and record batches of the
+    columnar copy that their zone maps rule out are not read at all. At
+    least one, possibly empty, chunk is yielded.
+    """
+    filters = filters or []
+    needed = columns
+    if columns is not None and filters:
+        needed = chart_columns(*columns, *(predicate['column'] for predicate in filters))
+
+    if ensure_columnar(file_path, file_type):
+        touch_columnar(file_path)
+        with pa.memory_map(columnar_path(file_path)) as source:
+            reader = pa.ipc.open_file(source)
+            pruning = [(zone_map(file_path, reader, p['column']), p['op'],
+                        filter_value(arrow_kind(reader.schema.field(p['column']).type), p['value']))
+                       for p in filters]
+            yielded = False
+            for i in range(reader.num_record_batches):
+                if not all(zone_may_match(zones[i], op, value) for zones, op, value in pruning):
+                    continue
+                batch = reader.get_batch(i)
+                yield apply_filters((batch.select(needed) if needed is not None else batch).to_pandas(),
+                                    filters, columns)
+                yielded = True
+            if not yielded:
+                empty = reader.schema.empty_table()
+                yield (empty.select(columns) if columns is not None else empty).to_pandas()
+    elif file_type == 'csv':
+        for chunk in pd.read_csv(file_path, chunksize=app.config['CSV_CHUNK_ROWS'], usecols=needed):
+            yield apply_filters(chunk, filters, columns)
+    else:
+        yield apply_filters(load_data(file_path, file_type, needed), filters, columns)
+
+def chart_spec(data):
+    """Validate a chart request body and normalize optional fields to None"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+
+    chart_type = data.get('chart_type')
+    if chart_type not in CHART_TYPES:
+        raise ValueError('Invalid chart type')
+    if not data.get('x_column'):
+        raise ValueError('x_column is required')
+
+    max_points = data.get('max_points') or app.config['CHART_POINT_BUDGET']
+    if not isinstance(max_points, int) or max_points < 2:
+        raise ValueError('max_points must be an integer of at least 2')
+    # A larger budget would let a request switch off sampling and binning and ship every row
+    max_points = min(max_points, app.config['CHART_MAX_POINTS'])
+
+    resample = data.get('resample') or None
+    aggregation = data.get('aggregation') or None
+    if resample is not None:
+        if chart_type != 'line':
+            raise ValueError('Only line charts can be resampled')
+        if resample != 'auto':
+            resample_step(resample)
+        aggregation = aggregation or 'mean'
+        if aggregation not in RESAMPLE_AGGREGATIONS:
+            raise ValueError(f"aggregation must be one of {', '.join(RESAMPLE_AGGREGATIONS)}")
+    elif aggregation is not None:
+        raise ValueError('aggregation needs a resample bucket')
+
+    return {
+        'chart_type': chart_type,
+        'x_column': data['x_column'],
+        'y_column': data.get('y_column') or None,
+        'color_column': data.get('color_column') or None,
+        'max_points': max_points,
+        'filters': filter_spec(data),
+        'resample': resample,
+        'aggregation': aggregation
+    }
+
+RESAMPLE_AGGREGATIONS = ('mean', 'sum', 'min', 'max', 'p95')
+# Bucket sizes picked from by resample='auto', finest first
+RESAMPLE_BUCKETS = ('1s', '5s', '15s', '30s', '1min', '5min', '15min', '30min', '1h', '3h', '6h', '12h',
+                    '1D', '7D', '30D', '91D', '365D')
+
+def resample_step(bucket):
+    """Parse a fixed resample bucket size such as '30s', '5min', '1h' or '7D'"""
+    try:
+        step = pd.Timedelta(bucket)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid resample bucket '{bucket}'; use 'auto' or a duration such as '5min', '1h' or '1D'")
+    if step <= pd.Timedelta(0):
+        raise ValueError('The resample bucket must be a positive duration')
+    return step
+
+def auto_resample_bucket(span, series, max_points):
+    """Finest bucket of RESAMPLE_BUCKETS that keeps every series of a chart within its point budget"""
+    per_series = max(1, max_points // max(series, 1))
+    for bucket in RESAMPLE_BUCKETS:
+        if span // resample_step(bucket) + 1 <= per_series:
+            return bucket
+    return RESAMPLE_BUCKETS[-1]
+
+def resample_series(df, spec):
+    """Aggregate a time series into buckets of time per color group.
+
+    The dates of x are floored to the bucket size, and y is aggregated per
+    color group and bucket in a single groupby, so the chart holds at most
+    one point per series and bucket however many rows the dataset has.
+    Dates kept as text are parsed first. Returns the resampled DataFrame
+    and the bucket size used.
+    """
+    x_column, y_column, color_column = spec['x_column'], spec['y_column'], spec['color_column']
+    x = df[x_column]
+    if not pd.api.types.is_datetime64_any_dtype(x):
+        try:
+            x = pd.to_datetime(x, format='ISO8601')
+        except (ValueError, TypeError):
+            raise ValueError(f"Column '{x_column}' must hold dates to be resampled")
+
+    bucket = spec['resample']
+    if bucket == 'auto':
+        series = df[color_column].nunique() if color_column else 1
+        span = x.max() - x.min() if x.notna().any() else pd.Timedelta(0)
+        bucket = auto_resample_bucket(span, series, spec['max_points'])
+    keys = [x.dt.floor(resample_step(bucket)).rename(x_column)]
+    if color_column:
+        keys.insert(0, df[color_column])
+
+    grouped = df[y_column].groupby(keys, sort=True, observed=True)
+    if spec['aggregation'] == 'p95':
+        values = grouped.quantile(0.95)
+    else:
+        values = grouped.agg(spec['aggregation'])
+    return values.reset_index(), bucket
+
+def first_per_bucket(points, keys):
+    """First of points in each bucket given by keys, in their original order.
+
+    Used by the min/max reductions when y has no ordering to preserve
+    extremes of.
+    """
+    return np.sort(pd.Series(points).groupby(keys, sort=False, dropna=False).first().to_numpy())
+
+def downsample_minmax(df, y_column, max_points, group_column=None):
+    """Reduce a line series to the min and max row of each bucket.
+
+    Rows are bucketed by position within their color group, keeping the
+    original row order, so peaks and troughs survive the reduction. Each
+    group gets a share of the budget proportional to its size.
+    """
+    groups = df[group_column] if group_column else pd.Series(0, index=df.index)
+    position = groups.groupby(groups, sort=False, dropna=False, observed=True).cumcount().to_numpy()
+    group_size = groups.groupby(groups, sort=False, dropna=False, observed=True).transform('size').to_numpy()
+    # Two points (min and max) are kept per bucket
+    buckets_per_group = np.maximum(1, (max_points // 2) * group_size // len(df))
+    bucket = position * buckets_per_group // group_size
+
+    keys = [groups.to_numpy(), bucket]
+    y = df[y_column]
+    if pd.api.types.is_numeric_dtype(y):
+        grouped = y.reset_index(drop=True).groupby(keys, sort=False, dropna=False)
+        rows = np.union1d(grouped.idxmin().dropna().to_numpy(), grouped.idxmax().dropna().to_numpy())
+    else:
+        rows = first_per_bucket(np.arange(len(df)), keys)
+    return df.iloc[np.sort(rows.astype(np.int64))]
+
+def binned_scatter(frames, x_column, y_column, bins, ranges=None):
+    """Summarize a numeric scatter as a 2D histogram of point density.
+
+    ranges ([[x_min, x_max], [y_min, y_max]]) is required when frames is a
+    stream of chunks rather than a single DataFrame.
+    """
+    counts = 0
+    for frame in as_frames(frames):
+        data = frame[[x_column, y_column]].dropna()
+        if ranges is None:
+            ranges = [[data[x_column].min(), data[x_column].max()], [data[y_column].min(), data[y_column].max()]]
+        chunk_counts, x_edges, y_edges = np.histogram2d(data[x_column], data[y_column], bins=bins, range=ranges)
+        counts = counts + chunk_counts
+    fig = go.Figure(go.Heatmap(
+        z=counts.T,
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        colorscale='Blues',
+        colorbar={'title': 'Points'},
+        hovertemplate=f"{x_column}=%{{x}}<br>{y_column}=%{{y}}<br>points=%{{z}}<extra></extra>"
+    ))
+    fig.update_layout(xaxis_title=x_column, yaxis_title=y_column)
+    return fig, int(np.count_nonzero(counts))
+
+def as_frames(data):
+    """Treat a single DataFrame as a stream of one chunk"""
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+def combine_partials(partials, keys):
+    """Add up per-chunk groupby results into one result per group"""
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials).groupby(level=list(range(len(keys))), sort=False).sum()
+
+def count_label(*columns):
+    """Name for a count column that does not clash with the chart columns"""
+    return 'count' if 'count' not in columns else 'row_count'
+
+def count_partial(frames, x_column, color_column=None):
+    """Row counts per (x, color) group, as a Series that combine_partials can merge"""
+    keys = chart_columns(x_column, color_column)
+    partials = [frame.groupby(keys, sort=False, observed=True).size() for frame in as_frames(frames)]
+    return combine_partials(partials, keys)
+
+def format_counts(counts, x_column, color_column=None):
+    label = count_label(x_column, color_column)
+    counts = counts.reset_index(name=label)
+    if not color_column:
+        counts = counts.sort_values(label, ascending=False, kind='stable')
+    return counts
+
+def aggregate_counts(frames, x_column, color_column=None):
+    """Count rows per category, one row per (x, color) pair"""
+    return format_counts(count_partial(frames, x_column, color_column), x_column, color_column)
+
+def sum_partial(frames, x_column, y_column, color_column=None):
+    """Sums of y per (x, color) group, as a Series that combine_partials can merge"""
+    keys = chart_columns(x_column, color_column)
+    partials = [frame.groupby(keys, sort=False, observed=True)[y_column].sum() for frame in as_frames(frames)]
+    return combine_partials(partials, keys)
+
+def aggregate_sums(frames, x_column, y_column, color_column=None):
+    """Sum y per category, matching the stacked height of a raw bar chart"""
+    return sum_partial(frames, x_column, y_column, color_column).reset_index()
+
+def histogram_edges(values, max_bins):
+    """Bin edges for a numeric series, capped at max_bins bins"""
+    values = values.dropna().to_numpy()
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    edges = np.histogram_bin_edges(values, bins='auto')
+    if len(edges) > max_bins + 1:
+        edges = np.linspace(values.min(), values.max(), max_bins + 1)
+    return edges
+
+def as_datetime(values):
+    """Dates of a column, parsing those kept as ISO text"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, format='ISO8601')
+
+def datetime_as_int(values):
+    """Nanosecond integer values of a datetime series, NaN where missing"""
+    return pd.Series(values.to_numpy(dtype='datetime64[ns]').astype(np.int64),
+                     index=values.index).where(values.notna())
+
+def histogram_partial(frames, x_column, color_column=None, edges=None, max_bins=100):
+    """Bin counts of a numeric column per color group: (edges, {group: counts}, is_datetime).
+
+    Datetime columns are binned on their integer nanosecond values. All color
+    groups share the same edges so their bars stack. edges is derived from
+    the data for a single DataFrame and is required for a stream of chunks.
+    """
+    is_datetime = False
+    bin_counts = {}
+    for frame in as_frames(frames):
+        values = frame[x_column]
+        if not pd.api.types.is_numeric_dtype(values):
+            # Dates, typed or kept as text
+            is_datetime = True
+            values = datetime_as_int(as_datetime(values))
+        if edges is None:
+            edges = histogram_edges(values, max_bins)
+        groups = [(None, values)] if not color_column else values.groupby(frame[color_column], sort=False, observed=True)
+        for group, group_values in groups:
+            counts, _ = np.histogram(group_values.dropna().to_numpy(), bins=edges)
+            bin_counts[group] = bin_counts.get(group, 0) + counts
+    return edges, bin_counts, is_datetime
+
+def format_histogram(partial, x_column, color_column=None):
+    """One row per (bin, color) pair of a histogram partial, plus the bin widths"""
+    edges, bin_counts, is_datetime = partial
+    label = count_label(x_column, color_column)
+    parts = []
+    for group, counts in bin_counts.items():
+        part = pd.DataFrame({x_column: (edges[:-1] + edges[1:]) / 2, label: counts,
+                             'bin_start': edges[:-1], 'bin_end': edges[1:]})
+        if color_column:
+            part[color_column] = group
+        parts.append(part)
+    result = pd.concat(parts, ignore_index=True)
+
+    if is_datetime:
+        for col in (x_column, 'bin_start', 'bin_end'):
+            result[col] = pd.to_datetime(result[col].astype(np.int64))
+    return result, np.diff(edges)
+
+def aggregate_histogram(frames, x_column, color_column=None, edges=None, max_bins=100):
+    """Bin a numeric column with np.histogram, one row per (bin, color) pair"""
+    return format_histogram(histogram_partial(frames, x_column, color_column, edges, max_bins),
+                            x_column, color_column)
+
+def update_partial(key, partial, new_rows):
+    """Fold the aggregates of appended rows into a partial of the same memo key.
+
+    Returns None for a histogram partial when new values fall outside its
+    edges, since the bins then have to be recomputed from all the data.
+    """
+    if key[0] == 'filtered':
+        _, filters, key = key
+        new_rows = new_rows[filter_mask(new_rows, json.loads(filters))]
+    if key[0] == 'counts':
+        _, x_column, color_column = key
+        return combine_partials([partial, count_partial(new_rows, x_column, color_column)],
+                                chart_columns(x_column, color_column))
+    if key[0] == 'sums':
+        _, x_column, y_column, color_column = key
+        return combine_partials([partial, sum_partial(new_rows, x_column, y_column, color_column)],
+                                chart_columns(x_column, color_column))
+
+    _, x_column, color_column = key
+    edges, bin_counts, is_datetime = partial
+    values = new_rows[x_column]
+    values = (datetime_as_int(as_datetime(values)) if is_datetime else values).dropna()
+    if not values.between(edges[0], edges[-1]).all():
+        return None
+    _, new_counts, _ = histogram_partial(new_rows, x_column, color_column, edges)
+    merged = dict(bin_counts)
+    for group, counts in new_counts.items():
+        merged[group] = merged.get(group, 0) + counts
+    return edges, merged, is_datetime
+
+def memoized(memo, key, compute):
+    """Reuse an aggregate already computed for another chart.
+
+    memo is a dict shared by the charts of a batch, or an AggregateStore
+    kept across requests.
+    """
+    if memo is None:
+        return compute()
+    value = memo.get(key)
+    if value is None:
+        value = memo[key] = compute()
+    return value
+
+def partial_size(partial):
+    """Approximate in-memory size of an aggregate partial in bytes"""
+    if isinstance(partial, pd.Series):
+        return int(partial.memory_usage(index=True, deep=True))
+    edges, bin_counts, _ = partial
+    return edges.nbytes + sum(np.asarray(counts).nbytes for counts in bin_counts.values())
+
+aggregate_cache = LRUCache(app.config['AGGREGATE_CACHE_BYTES'], weigher=partial_size)
+
+class AggregateStore:
+    """Memo of the chart aggregates of one upload version, shared across requests.
+
+    Entries live in aggregate_cache keyed by the file fingerprint followed
+    by the aggregate key, so an append moves them to the new version through
+    update_aggregates and older versions are dropped by put_version.
+    """
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
+    def __contains__(self, key):
+        return self.fingerprint + (key,) in aggregate_cache
+
+    def get(self, key):
+        return aggregate_cache.get(self.fingerprint + (key,))
+
+    def __setitem__(self, key, value):
+        aggregate_cache.put_version(self.fingerprint + (key,), value)
+
+def update_aggregates(old_fingerprint, new_fingerprint, new_rows):
+    """Fold appended rows into the stored aggregates of an upload.
+
+    Returns the number of aggregates carried over to the new version;
+    the others are recomputed when next requested.
+    """
+    updated = 0
+    for cache_key, partial in aggregate_cache.items():
+        if cache_key[:3] != old_fingerprint:
+            continue
+        key = cache_key[3]
+        partial = update_partial(key, partial, new_rows)
+        if partial is not None:
+            aggregate_cache.put(new_fingerprint + (key,), partial)
+            updated += 1
+    aggregate_cache.discard(lambda k: k[:3] == old_fingerprint)
+    return updated
+
+def aggregate_key(spec, binned):
+    """Memo key of the aggregate a bar, pie or histogram chart is built from.
+
+    Aggregates of filtered rows are keyed ('filtered', filters, key).
+    """
+    x_column = spec['x_column']
+    color_column = spec['color_column']
+    if spec['chart_type'] == 'bar' and spec['y_column']:
+        key = ('sums', x_column, spec['y_column'], color_column)
+    elif spec['chart_type'] == 'pie':
+        key = ('counts', x_column, None)
+    elif spec['chart_type'] == 'histogram' and binned:
+        key = ('histogram', x_column, color_column)
+    else:
+        key = ('counts', x_column, color_column)
+    if spec['filters']:
+        return ('filtered', json.dumps(spec['filters'], sort_keys=True), key)
+    return key
+
+def aggregate_figure(frames, spec, binned, edges=None, memo=None):
+    """Plot a bar, pie or histogram chart from data aggregated in pandas.
+
+    frames is a DataFrame or a stream of chunks. binned tells whether a
+    histogram bins numeric x values or counts categories. Charts built from
+    the same DataFrame can share their groupbys through a memo dict.
+    Returns the figure and the number of aggregated rows it holds.
+    """
+    chart_type = spec['chart_type']
+    x_column = spec['x_column']
+    y_column = spec['y_column']
+    color_column = spec['color_column']
+    label = count_label(x_column, color_column)
+    key = aggregate_key(spec, binned)
+
+    if chart_type == 'bar':
+        if y_column:
+            agg = memoized(memo, key, lambda: sum_partial(frames, x_column, y_column, color_column)).reset_index()
+            fig = px.bar(agg, x=x_column, y=y_column, color=color_column, title=f"{y_column} by {x_column}")
+        else:
+            # Count plot for categorical data
+            agg = format_counts(memoized(memo, key, lambda: count_partial(frames, x_column, color_column)),
+                                x_column, color_column)
+            fig = px.bar(agg, x=x_column, y=label, color=color_column, title=f"Count of {x_column}")
+    elif chart_type == 'pie':
+        agg = format_counts(memoized(memo, key, lambda: count_partial(frames, x_column)), x_column)
+        fig = px.pie(agg, names=x_column, values=count_label(x_column), title=f"Distribution of {x_column}")
+    elif binned:
+        agg, widths = format_histogram(memoized(memo, key, lambda: histogram_partial(
+            frames, x_column, color_column, edges, app.config['HISTOGRAM_MAX_BINS'])), x_column, color_column)
+        fig = px.bar(agg, x=x_column, y=label, color=color_column, title=f"Distribution of {x_column}",
+                     hover_data=['bin_start', 'bin_end'])
+        if pd.api.types.is_datetime64_any_dtype(agg[x_column]):
+            # Plotly measures date bar widths in milliseconds
+            widths = widths / 1e6
+        fig.update_traces(width=widths.tolist())
+        fig.update_layout(bargap=0)
+    else:
+        agg = format_counts(memoized(memo, key, lambda: count_partial(frames, x_column, color_column)),
+                            x_column, color_column)
+        fig = px.bar(agg, x=x_column, y=label, color=color_column, title=f"Distribution of {x_column}")
+    return fig, len(agg)
+
+def style_figure(fig):
+    """Apply the dashboard's common layout"""
+    with timed('layout'):
+        fig.update_layout(
+            template='plotly_white',
+            font_family="Arial",
+            title_font_size=16
+        )
+    return fig
+
+def build_figure(df, spec, memo=None, binned=None):
+    """Build the Plotly figure for a chart spec.
+
+    Returns the figure together with a description of how the data was
+    reduced: bar, pie and histogram data is aggregated in pandas so the
+    figure holds one row per category or bin, while line and scatter data
+    is kept within the chart's point budget. Resampled lines hold one point
+    per series and time bucket. memo shares aggregates between
+    charts built from the same DataFrame. binned tells whether a histogram
+    bins x, which the caller knows from the profile for dates kept as text;
+    by default only number and date columns are binned.
+    """
+    chart_type = spec['chart_type']
+    x_column = spec['x_column']
+    y_column = spec['y_column']
+    color_column = spec['color_column']
+    max_points = spec['max_points']
+    reduction = {'method': 'none', 'input_points': len(df), 'output_points': len(df)}
+
+    # Generate chart based on type
+    if chart_type in AGGREGATE_CHART_TYPES:
+        if binned is None:
+            x = df[x_column]
+            binned = pd.api.types.is_numeric_dtype(x) or pd.api.types.is_datetime64_any_dtype(x)
+        fig, rows = aggregate_figure(df, spec, binned, memo=memo)
+        reduction.update(method='aggregate', output_points=rows)
+    elif chart_type == 'line':
+        if spec['resample']:
+            input_points = len(df)
+            df, bucket = resample_series(df, spec)
+            reduction.update(method='resample', bucket=bucket, aggregation=spec['aggregation'],
+                             input_points=input_points, output_points=len(df))
+        elif len(df) > max_points:
+            df = downsample_minmax(df, y_column, max_points, color_column)
+            reduction.update(method='minmax', output_points=len(df))
+        fig = px.line(df, x=x_column, y=y_column, color=color_column, title=f"{y_column} over {x_column}")
+    elif chart_type == 'scatter':
+        title = f"{x_column} vs {y_column}"
+        webgl_budget = max(max_points, app.config['WEBGL_POINT_BUDGET'])
+        numeric = all(pd.api.types.is_numeric_dtype(df[col]) for col in (x_column, y_column))
+        if len(df) > webgl_budget and numeric:
+            bins = int(np.sqrt(max_points))
+            fig, cells = binned_scatter(df, x_column, y_column, bins)
+            fig.update_layout(title=title)
+            reduction.update(method='density', output_points=cells, bins=[bins, bins])
+        else:
+            if len(df) > webgl_budget:
+                df = df.sample(n=webgl_budget, random_state=0).sort_index()
+                reduction.update(method='sample', output_points=len(df))
+            render_mode = 'webgl' if len(df) > max_points else 'svg'
+            if render_mode == 'webgl' and reduction['method'] == 'none':
+                reduction['method'] = 'webgl'
+            fig = px.scatter(df, x=x_column, y=y_column, color=color_column, title=title,
+                             render_mode=render_mode)
+
+    return style_figure(fig), reduction
+
+def build_stored_figure(spec, profile, memo):
+    """Build a bar, pie or histogram chart from an aggregate already in memo.
+
+    Returns None when the aggregate is missing and the data has to be loaded.
+    Filtered charts always load their rows, which tell how many rows matched.
+    """
+    if spec['chart_type'] not in AGGREGATE_CHART_TYPES or spec['filters']:
+        return None
+    binned = profile.binned(spec['x_column'])
+    key = aggregate_key(spec, binned)
+    partial = memo.get(key)
+    if partial is None:
+        return None
+    fig, rows = aggregate_figure(None, spec, binned, memo={key: partial})
+    return style_figure(fig), {'method': 'aggregate', 'input_points': profile.rows, 'output_points': rows}
+
+def top_values_chart(spec, profile):
+    """Whether a chart counts the values of a text column with too many of them to show.
+
+    Pie, count bar and histogram charts of such columns are drawn from the
+    column's top values sketch: the CHART_MAX_CATEGORIES most frequent
+    values plus one slice or bar for all the others. Dates kept as text are
+    not: their histograms bin them as dates.
+    """
+    chart_type = spec['chart_type']
+    if chart_type != 'pie' and (spec['color_column'] or chart_type not in AGGREGATE_CHART_TYPES
+                                or chart_type == 'bar' and spec['y_column']):
+        return False
+    column = profile.columns[spec['x_column']]
+    return (not spec['filters'] and bool(column.get('top')) and profile.kind(spec['x_column']) == 'categorical'
+            and not profile.is_temporal(spec['x_column']) and column['distinct'] > app.config['CHART_MAX_CATEGORIES'])
+
+def build_top_values_figure(spec, profile):
+    """Build a count chart of the most frequent values of a column from its profile, without the data"""
+    x_column = spec['x_column']
+    column = profile.columns[x_column]
+    top = list(column['top'].items())[:app.config['CHART_MAX_CATEGORIES']]
+    others = max(profile.rows - column['nulls'] - sum(count for _, count in top), 0)
+    names, counts = [value for value, _ in top], [count for _, count in top]
+    if others:
+        names.append('Other' if 'Other' not in column['top'] else '(Other)')
+        counts.append(others)
+    partial = pd.Series(counts, index=pd.Index(names, name=x_column))
+    fig, rows = aggregate_figure(None, spec, False, memo={aggregate_key(spec, False): partial})
+    if spec['chart_type'] != 'pie':
+        # Keep the other values last rather than sorted among the top ones
+        fig.update_xaxes(categoryorder='array', categoryarray=names)
+    return style_figure(fig), {'method': 'top_values', 'input_points': profile.rows, 'output_points': rows,
+                               'distinct': column['distinct'], 'max_error': column['top_error']}
+
+def can_stream_chart(spec, profile):
+    """Check a chart can be built by folding over chunks of the file"""
+    if spec['chart_type'] in AGGREGATE_CHART_TYPES:
+        # Histograms of dates kept as text need their range, which the profile lacks, to bin chunks
+        return not (spec['chart_type'] == 'histogram' and profile.kind(spec['x_column']) == 'categorical'
+                    and profile.is_temporal(spec['x_column']))
+    if spec['chart_type'] == 'scatter':
+        webgl_budget = max(spec['max_points'], app.config['WEBGL_POINT_BUDGET'])
+        return (profile.rows > webgl_budget
+                and all(profile.kind(col) == 'numeric' for col in (spec['x_column'], spec['y_column'])))
+    return False
+
+def build_streamed_figure(chunks, spec, profile, memo=None):
+    """Build a chart from chunks of a file too large to load whole.
+
+    Histogram edges and density map ranges come from the min/max values in
+    the dataset profile, so a single pass over the chunks is enough. The
+    chunks are not read at all when memo already holds the aggregate.
+    """
+    x_column = spec['x_column']
+    reduction = {'method': 'aggregate', 'input_points': profile.rows}
+
+    if spec['chart_type'] == 'scatter':
+        y_column = spec['y_column']
+        bins = int(np.sqrt(spec['max_points']))
+        ranges = [profile.value_range(x_column), profile.value_range(y_column)]
+        fig, cells = binned_scatter(chunks, x_column, y_column, bins, ranges)
+        fig.update_layout(title=f"{x_column} vs {y_column}")
+        reduction.update(method='density', output_points=cells, bins=[bins, bins])
+    else:
+        binned = profile.kind(x_column) == 'numeric'
+        edges = None
+        if spec['chart_type'] == 'histogram' and binned:
+            low, high = profile.value_range(x_column)
+            bins = min(app.config['HISTOGRAM_MAX_BINS'], int(np.ceil(np.log2(max(profile.rows, 1)) + 1)))
+            edges = np.linspace(low, high if high > low else low + 1, bins + 1)
+        fig, rows = aggregate_figure(chunks, spec, binned, edges, memo)
+        reduction['output_points'] = rows
+
+    return style_figure(fig), reduction
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    """Thread-safe histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name, description, label_names, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, _, _ = series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0, 0.0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def count(self, *label_values):
+        with self._lock:
+            return self._series.get(label_values, [None, 0])[1]
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), count, total)
+                      for labels, (counts, count, total) in sorted(self._series.items())]
+        for label_values, counts, count, total in series:
+            labels = [f'{name}="{metric_label(value)}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = ','.join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            bucket_labels = ','.join(labels + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            lines.append(f"{self.name}_sum{{{','.join(labels)}}} {total}")
+            lines.append(f"{self.name}_count{{{','.join(labels)}}} {count}")
+        return lines
+
+def metric_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_seconds = Histogram('dataviz_request_seconds', 'Request handling time.', ('endpoint', 'status'))
+chart_seconds = Histogram('dataviz_chart_request_seconds', 'Chart request time per chart type and file format.',
+                          ('chart_type', 'file_format'))
+stage_seconds = Histogram('dataviz_stage_seconds', 'Time spent per stage of building chart responses.',
+                          ('stage', 'chart_type', 'file_format'))
+
+# Chart type and file format of the chart being rendered on this thread
+stage_labels = threading.local()
+
+@contextmanager
+def timed(stage):
+    """Time a stage of request handling for the Server-Timing header and /metrics"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage, *getattr(stage_labels, 'value', ('', '')))
+        if has_request_context() and 'timings' in g:
+            g.timings[stage] = g.timings.get(stage, 0) + elapsed
+
+def save_request_profile(profiler, elapsed_ms):
+    """Dump the cProfile stats of a slow request, keeping only the slowest ones"""
+    folder = app.config['PROFILE_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    name = f"{int(elapsed_ms):08d}ms_{request.endpoint or 'unknown'}_{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(os.path.join(folder, name))
+    # Names start with the zero-padded duration, so they sort fastest first
+    profiles = sorted(f for f in os.listdir(folder) if f.endswith('.prof'))
+    for stale in profiles[:-app.config['PROFILE_KEEP']]:
+        os.remove(os.path.join(folder, stale))
+    app.logger.info("Saved profile of %s (%.0f ms) to %s", request.path, elapsed_ms, name)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.timings = {}
+    g.profiler = None
+    if app.config['PROFILE_SLOW_REQUESTS_MS'] is not None:
+        g.profiler = cProfile.Profile()
+        try:
+            g.profiler.enable()
+        except ValueError:
+            # Another profiler is already active
+            g.profiler = None
+
+@app.after_request
+def record_request_timing(response):
+    """Report stage timings in a Server-Timing header and record request metrics.
+
+    Registered before compress_response so it runs after it and includes
+    compression in the total.
+    """
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    if g.profiler is not None:
+        g.profiler.disable()
+        if elapsed * 1000 >= app.config['PROFILE_SLOW_REQUESTS_MS']:
+            save_request_profile(g.profiler, elapsed * 1000)
+
+    timings = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in g.timings.items()]
+    response.headers['Server-Timing'] = ', '.join(timings + [f"total;dur={elapsed * 1000:.1f}"])
+    request_seconds.observe(elapsed, request.endpoint or '', str(response.status_code))
+    if 'chart_labels' in g:
+        chart_seconds.observe(elapsed, *g.chart_labels)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON responses with brotli or gzip"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_BYTES']:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        with timed('compress'):
+            response.set_data(brotli.compress(data, quality=4))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        with timed('compress'):
+            response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', upload_chunk_bytes=app.config['UPLOAD_CHUNK_BYTES'])
+
+CONTENT_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.\w+$')
+
+def alias_path(filename):
+    """Pointer file naming the dataset an upload filename refers to"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], '.aliases', filename)
+
+def read_alias(filename):
+    try:
+        with open(alias_path(filename)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_alias(filename, dataset):
+    path = alias_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(dataset)
+    os.replace(temp_path, path)
+
+def upload_path(filename):
+    """Path of the dataset an upload filename refers to.
+
+    Uploads are stored once per content as <sha256>.<ext>, and the filename
+    each upload was given is an alias of that dataset, so identical uploads
+    share one profile, columnar copy and set of cached charts. Files put in
+    the upload folder directly are their own dataset.
+    """
+    return os.path.join(app.config['UPLOAD_FOLDER'], read_alias(filename) or filename)
+
+def existing_upload(filename):
+    """Path of the dataset an upload filename refers to, or None when there is none.
+
+    Uploads are stored under names secure_filename leaves unchanged, so other
+    names such as '..' or the alias folder never refer to a dataset.
+    """
+    if not filename or secure_filename(filename) != filename:
+        return None
+    file_path = upload_path(filename)
+    return file_path if os.path.isfile(file_path) else None
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def store_upload(temp_path, filename, digest):
+    """Store a received upload under its content hash and alias filename to it.
+
+    An upload with the content of a stored dataset is discarded and only
+    aliased; new content is ingested. Returns the path of the dataset.
+    """
+    extension = filename.rsplit('.', 1)[1].lower()
+    dataset = f"{digest}.{extension}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], dataset)
+    if os.path.exists(file_path):
+        os.remove(temp_path)
+        write_alias(filename, dataset)
+        app.logger.info("Upload %s has the content of %s", filename, dataset)
+        return file_path
+
+    os.replace(temp_path, file_path)
+    write_alias(filename, dataset)
+    # Convert once so later requests read typed columns instead of text
+    try:
+        ingest_upload(file_path, extension)
+    except Exception as e:
+        app.logger.warning("Skipping ingest of %s: %s", filename, e)
+    return file_path
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -53,8 +1883,17 @@ def upload_file():
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
+
+        # Hash the upload as it is written, to find out whether its content is already stored
+        folder = os.path.join(app.config['UPLOAD_FOLDER'], '.partial')
+        os.makedirs(folder, exist_ok=True)
+        temp_path = os.path.join(folder, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        with open(temp_path, 'wb') as f:
+            for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+                digest.update(block)
+                f.write(block)
+        store_upload(temp_path, unique_filename, digest.hexdigest())
 
         flash('File uploaded successfully!')
         return redirect(url_for('dashboard', filename=unique_filename))
@@ -64,77 +1903,1425 @@ def upload_file():
 
 @app.route('/dashboard/<filename>')
 def dashboard(filename):
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(file_path):
+    file_path = existing_upload(filename)
+    if file_path is None:
         flash('File not found')
         return redirect(url_for('index'))
 
     try:
         file_ext = filename.rsplit('.', 1)[1].lower()
-        df = load_data(file_path, file_ext)
+        profile = get_profile(file_path, file_ext)
 
-        # Get basic data info
+        # Get basic data info from the profile, without loading the data
         data_info = {
             'filename': filename,
-            'rows': len(df),
-            'columns': len(df.columns),
-            'columns_list': df.columns.tolist(),
-            'numeric_columns': df.select_dtypes(include=['number']).columns.tolist(),
-            'categorical_columns': df.select_dtypes(include=['object', 'category']).columns.tolist()
+            'rows': profile.rows,
+            'columns': len(profile.columns),
+            'columns_list': list(profile.columns),
+            'numeric_columns': profile.columns_of_kind('numeric'),
+            'categorical_columns': profile.columns_of_kind('categorical'),
+            'datetime_columns': [name for name in profile.columns if profile.is_temporal(name)],
+            'column_profiles': profile.summary()
         }
+        use_jobs = profile.rows >= app.config['CHART_JOB_MIN_ROWS']
 
-        return render_template('dashboard.html', data_info=data_info, filename=filename)
+        return render_template('dashboard.html', data_info=data_info, filename=filename, use_jobs=use_jobs)
 
     except Exception as e:
         flash(f'Error processing file: {str(e)}')
         return redirect(url_for('index'))
 
-@app.route('/api/generate_chart/<filename>', methods=['POST'])
+@contextmanager
+def chart_stages(chart_type, file_type):
+    """Label the stages timed inside with the chart being built"""
+    stage_labels.value = (chart_type, file_type)
+    try:
+        yield
+    finally:
+        stage_labels.value = ('', '')
+
+def build_chart(file_path, file_type, spec, df=None, memo=None):
+    """Build the figure of a chart and describe how its data was reduced.
+
+    df may hold already loaded, unfiltered data with at least the chart's
+    columns. Aggregates are shared through memo, by default the
+    AggregateStore of the upload, so bar, pie and histogram charts whose
+    aggregate is stored are built without loading any data, like count
+    charts of text columns with too many values, drawn from the profile's
+    top values sketch. Charts with filters are built from the matching rows
+    only; their reduction tells how many rows the dataset has in
+    filtered_from.
+    """
+    columns = chart_columns(spec['x_column'], spec['y_column'], spec['color_column'])
+    filters = spec['filters']
+    if memo is None:
+        memo = AggregateStore(file_fingerprint(file_path))
+    profile = get_profile(file_path, file_type)
+    if top_values_chart(spec, profile):
+        with timed('build'):
+            return build_top_values_figure(spec, profile)
+    if is_streamed(file_path, file_type) and can_stream_chart(spec, profile):
+        # Chunks are read as the figure is built, so both count as building
+        chunks = cancellable(iter_chunks(file_path, file_type, columns, filters))
+        with timed('build'):
+            if not filters:
+                return build_streamed_figure(chunks, spec, profile, memo)
+            # Count the matching rows as the chunks go by, so no stored aggregate is used
+            matched = []
+
+            def counted(chunks):
+                for chunk in chunks:
+                    matched.append(len(chunk))
+                    yield chunk
+
+            fig, reduction = build_streamed_figure(counted(chunks), spec, profile)
+            reduction.update(input_points=sum(matched), filtered_from=profile.rows)
+            return fig, reduction
+
+    stored = build_stored_figure(spec, profile, memo)
+    if stored is not None:
+        return stored
+    if filters:
+        with timed('load'):
+            df = load_filtered(file_path, file_type, columns, filters)
+    elif df is None or not set(columns) <= set(df.columns):
+        with timed('load'):
+            df = load_cached_data(file_path, file_type, columns)
+    check_cancelled()
+    with timed('build'):
+        fig, reduction = build_figure(df, spec, memo, profile.binned(spec['x_column']))
+    if filters:
+        reduction['filtered_from'] = profile.rows
+    return fig, reduction
+
+def render_chart(file_path, file_type, spec, df=None, memo=None):
+    """Build a chart and serialize its response body"""
+    with chart_stages(spec['chart_type'], file_type):
+        fig, reduction = build_chart(file_path, file_type, spec, df, memo)
+        check_cancelled()
+        # Embed the figure JSON as an object rather than a JSON-encoded string
+        with timed('serialize'):
+            return '{"chart":' + serialize_figure(fig) + ',"reduction":' + json.dumps(reduction) + '}'
+
+def serialize_figure(fig):
+    """Serialize a figure to JSON text.
+
+    Uses orjson when installed. Numeric arrays are written as base64 typed
+    arrays ({"dtype": ..., "bdata": ...}), which Plotly.js decodes without
+    parsing a number per point.
+    """
+    return pio.to_json(fig, validate=False, engine=JSON_ENGINE)
+
+figure_cache = LRUCache(app.config['FIGURE_CACHE_BYTES'], weigher=len)
+
+def chart_cache_key(file_path, spec):
+    """Cache key of a chart: the upload version plus the canonical spec"""
+    return file_fingerprint(file_path) + (json.dumps(spec, sort_keys=True),)
+
+def chart_etag(cache_key):
+    return hashlib.sha1(repr(cache_key).encode()).hexdigest()
+
+def cached_chart(file_path, file_type, spec, cache_key=None, df=None, memo=None):
+    """Serialized chart response through the figure cache"""
+    cache_key = cache_key or chart_cache_key(file_path, spec)
+    body = figure_cache.get(cache_key)
+    if body is None:
+        body = render_chart(file_path, file_type, spec, df, memo)
+        store_chart(cache_key, body)
+    return body
+
+def store_chart(cache_key, body):
+    figure_cache.put_version(cache_key, body)
+
+def loads_data(spec, profile, memo):
+    """Whether a chart needs rows of its dataset, rather than a stored aggregate or the profile's sketches"""
+    if top_values_chart(spec, profile):
+        return False
+    return (spec['chart_type'] not in AGGREGATE_CHART_TYPES or bool(spec['filters'])
+            or aggregate_key(spec, profile.binned(spec['x_column'])) not in memo)
+
+def columns_memory(file_path, profile, columns, rows):
+    """Rough in-memory size of rows of some columns of a dataset.
+
+    Numbers and dates take 8 bytes per value and booleans 1. Text repeating
+    enough to load as a category takes a 4-byte code; other text takes its
+    share of the file size plus the 16 bytes pandas adds per string.
+    """
+    cells = max(profile.rows * len(profile.columns), 1)
+    text_bytes = os.path.getsize(file_path) / cells + 16
+    widths = {'numeric': 8, 'datetime': 8, 'boolean': 1}
+    total = 0
+    for name in columns:
+        kind = profile.kind(name)
+        if kind in widths:
+            total += widths[kind]
+        elif profile.columns[name]['distinct'] <= app.config['CATEGORY_MAX_RATIO'] * profile.rows:
+            total += 4
+        else:
+            total += text_bytes
+    return int(rows * total)
+
+def chart_memory_estimate(file_path, file_type, specs, profile):
+    """Estimated bytes of data held while building charts of one dataset.
+
+    Charts drawn from a stored aggregate or the profile cost nothing and
+    streamed charts hold one chunk at a time. Other charts share one load
+    of the union of their columns, plus the columns they are filtered by.
+    """
+    memo = AggregateStore(file_fingerprint(file_path))
+    loaded, streamed = [], []
+    for spec in specs:
+        if not loads_data(spec, profile, memo):
+            continue
+        columns = [spec[role] for role in ('x_column', 'y_column', 'color_column')]
+        if is_streamed(file_path, file_type) and can_stream_chart(spec, profile):
+            streamed.extend(columns)
+        else:
+            loaded.extend(columns + [predicate['column'] for predicate in spec['filters']])
+    return (columns_memory(file_path, profile, chart_columns(*loaded), profile.rows)
+            + columns_memory(file_path, profile, chart_columns(*streamed),
+                             min(profile.rows, app.config['CSV_CHUNK_ROWS'])))
+
+class MemorySemaphore:
+    """Semaphore admitting work by its estimated memory rather than by count.
+
+    Work is admitted in arrival order while the estimates of the work in
+    progress fit within capacity bytes. An estimate above the capacity is
+    clamped to it, so such work runs alone rather than never. At most
+    max_waiting callers with a timeout queue; others are refused at once.
+    Callers without a timeout wait as long as it takes and are never refused.
+    """
+
+    def __init__(self, capacity, max_waiting):
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'timeout': 0}
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    def acquire(self, cost, timeout=None):
+        """Wait up to timeout seconds, or without limit, for cost bytes to be free; returns whether they were taken"""
+        cost = min(cost, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if not self._waiting and self.in_use + cost <= self.capacity:
+                self.in_use += cost
+                self.admitted += 1
+                return True
+            if deadline is not None and len(self._waiting) >= self.max_waiting:
+                self.rejected['queue_full'] += 1
+                return False
+            ticket = object()
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or self.in_use + cost > self.capacity:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.rejected['timeout'] += 1
+                        return False
+                    self._condition.wait(remaining)
+                self.in_use += cost
+                self.admitted += 1
+                return True
+            finally:
+                self._waiting.remove(ticket)
+                # The next caller in line may fit now
+                self._condition.notify_all()
+
+    def release(self, cost):
+        with self._condition:
+            self.in_use -= min(cost, self.capacity)
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {'capacity': self.capacity, 'in_use': self.in_use, 'waiting': len(self._waiting),
+                    'admitted': self.admitted, 'rejected': dict(self.rejected)}
+
+admission = MemorySemaphore(app.config['ADMISSION_MEMORY_BYTES'] or 0, app.config['ADMISSION_QUEUE_LENGTH'])
+admission_wait_seconds = Histogram('dataviz_admission_wait_seconds',
+                                   'Time chart requests waited for memory, per outcome.', ('outcome',))
+
+class Overloaded(Exception):
+    """Raised when a chart request cannot get the memory it needs in time"""
+
+def admit(cost, blocking=False):
+    """Reserve cost bytes of the chart memory budget, waiting up to ADMISSION_WAIT_SECONDS.
+
+    Returns a function giving them back, which may be called more than once.
+    Raises Overloaded when the queue is full or the wait times out. Blocking
+    callers, which have no response to refuse, wait as long as it takes.
+    """
+    if not cost or not app.config['ADMISSION_MEMORY_BYTES']:
+        return lambda: None
+    started = time.perf_counter()
+    taken = admission.acquire(cost, None if blocking else app.config['ADMISSION_WAIT_SECONDS'])
+    admission_wait_seconds.observe(time.perf_counter() - started, 'admitted' if taken else 'rejected')
+    if not taken:
+        raise Overloaded()
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            admission.release(cost)
+    return release
+
+@contextmanager
+def admitted(cost, blocking=False):
+    release = admit(cost, blocking)
+    try:
+        yield
+    finally:
+        release()
+
+def overloaded_response():
+    """429 response asking the client to retry once other charts have been built"""
+    response = jsonify({'error': 'The server is busy building other charts; retry shortly'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(int(np.ceil(app.config['ADMISSION_WAIT_SECONDS'])))
+    return response
+
+def chart_request_data():
+    """Chart spec fields from the query string, with max_points as an integer"""
+    data = request.args.to_dict()
+    if 'max_points' in data:
+        data['max_points'] = request.args.get('max_points', type=int)
+    return data
+
+@app.route('/api/generate_chart/<filename>', methods=['GET', 'POST'])
 def generate_chart(filename):
-    data = request.get_json()
-    chart_type = data.get('chart_type')
-    x_column = data.get('x_column')
-    y_column = data.get('y_column')
-    color_column = data.get('color_column')
+    try:
+        # GET requests let the browser cache charts and revalidate them by ETag
+        data = chart_request_data() if request.method == 'GET' else request.get_json()
+        spec = chart_spec(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(file_path):
+    file_path = existing_upload(filename)
+    if file_path is None:
         return jsonify({'error': 'File not found'}), 404
 
     try:
         file_ext = filename.rsplit('.', 1)[1].lower()
-        df = load_data(file_path, file_ext)
+        profile = get_profile(file_path, file_ext)
+        try:
+            validate_chart_columns(spec, profile)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        g.chart_labels = (spec['chart_type'], file_ext)
+
+        cache_key = chart_cache_key(file_path, spec)
+        etag = chart_etag(cache_key)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            # Charts in the figure cache are served without building anything
+            cost = 0 if cache_key in figure_cache else chart_memory_estimate(file_path, file_ext, [spec], profile)
+            with admitted(cost):
+                body = cached_chart(file_path, file_ext, spec, cache_key)
+            response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except Overloaded:
+        return overloaded_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def render_chart_batch(file_path, file_type, specs):
+    """Build the charts of a dashboard, yielding (index, body) as each is ready.
+
+    The union of the columns of charts that need raw data is loaded once
+    and groupbys shared by several charts are computed once, through the
+    upload's AggregateStore. Charts missing from the figure cache are built
+    in parallel on a thread pool. Specs that failed validation are passed
+    as ValueError instances and reported in place.
+    """
+    pending = []
+    for index, spec in enumerate(specs):
+        if isinstance(spec, ValueError):
+            yield index, json.dumps({'error': str(spec)})
+            continue
+        cache_key = chart_cache_key(file_path, spec)
+        body = figure_cache.get(cache_key)
+        if body is not None:
+            yield index, body
+        else:
+            pending.append((index, spec, cache_key))
+    if not pending:
+        return
+
+    df = None
+    memo = AggregateStore(file_fingerprint(file_path))
+    profile = get_profile(file_path, file_type)
+    # Filtered charts are built from their own rows
+    needs_data = [spec for _, spec, _ in pending if not spec['filters'] and loads_data(spec, profile, memo)]
+    if needs_data and not is_streamed(file_path, file_type):
+        columns = chart_columns(*(spec[role] for spec in needs_data
+                                  for role in ('x_column', 'y_column', 'color_column')))
+        with timed('load'):
+            df = load_cached_data(file_path, file_type, columns)
+
+    with ThreadPoolExecutor(max_workers=app.config['BATCH_CHART_WORKERS']) as pool:
+        futures = {pool.submit(cached_chart, file_path, file_type, spec, cache_key, df, memo): index
+                   for index, spec, cache_key in pending}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], json.dumps({'error': str(e)})
+
+@app.route('/api/generate_charts/<filename>', methods=['POST'])
+def generate_charts(filename):
+    """Render several charts of one dataset in a single request.
+
+    Returns {"charts": [...]} in request order, or with ?stream=1 (or an
+    Accept: application/x-ndjson header) one {"index", "result"} line per
+    chart as soon as it is ready.
+    """
+    data = request.get_json(silent=True) or {}
+    charts = data.get('charts')
+    if not isinstance(charts, list) or not charts:
+        return jsonify({'error': 'charts must be a non-empty list of chart specs'}), 400
+    if len(charts) > app.config['BATCH_MAX_CHARTS']:
+        return jsonify({'error': f"At most {app.config['BATCH_MAX_CHARTS']} charts per request"}), 400
+
+    file_path = existing_upload(filename)
+    if file_path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        profile = get_profile(file_path, file_ext)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    specs = []
+    for chart in charts:
+        try:
+            spec = chart_spec(chart)
+            validate_chart_columns(spec, profile)
+            specs.append(spec)
+        except ValueError as e:
+            specs.append(e)
+
+    uncached = [spec for spec in specs
+                if not isinstance(spec, ValueError) and chart_cache_key(file_path, spec) not in figure_cache]
+    try:
+        release = admit(chart_memory_estimate(file_path, file_ext, uncached, profile))
+    except Overloaded:
+        return overloaded_response()
+
+    stream = (request.args.get('stream') == '1'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    if stream:
+        def generate():
+            try:
+                for index, body in render_chart_batch(file_path, file_ext, specs):
+                    yield f'{{"index":{index},"result":{body}}}\n'
+            finally:
+                release()
+        response = app.response_class(generate(), mimetype='application/x-ndjson')
+        # Also release when the client goes away before the stream starts
+        response.call_on_close(release)
+        return response
+
+    try:
+        bodies = dict(render_chart_batch(file_path, file_ext, specs))
+    finally:
+        release()
+    body = '{"charts":[' + ','.join(bodies[index] for index in range(len(specs))) + ']}'
+    return app.response_class(body, mimetype='application/json')
+
+ZOOM_CHART_TYPES = {'line', 'scatter'}
+
+class ZoomPyramid:
+    """Points of a line or scatter chart sorted by x, with coarser levels for zoomed out views.
+
+    Level 0 holds every row with an x value. Each level above keeps about
+    1/ZOOM_PYRAMID_FACTOR of the rows of the level below: for line charts
+    the min and max row of each bucket of consecutive x values per color
+    group, picked from the level below so peaks survive at every zoom, and
+    for scatter plots a nested random sample. A view of an x range is
+    served from the finest level whose points in range fit the point
+    budget, so its size does not grow with the dataset.
+    """
 
-        # Generate chart based on type
-        if chart_type == 'bar':
-            if y_column:
-                fig = px.bar(df, x=x_column, y=y_column, color=color_column, title=f"{y_column} by {x_column}")
+    def __init__(self, df, spec):
+        x_column, y_column, color_column = spec['x_column'], spec['y_column'], spec['color_column']
+        self.line = spec['chart_type'] == 'line'
+        x = df[x_column]
+        if pd.api.types.is_numeric_dtype(x):
+            self.x_kind = 'numeric'
+            keys = x.to_numpy(dtype='float64', na_value=np.nan)
+            valid = ~np.isnan(keys)
+        else:
+            if not pd.api.types.is_datetime64_any_dtype(x):
+                # Dates kept as text zoom as dates
+                try:
+                    x = pd.to_datetime(x, format='ISO8601')
+                except (ValueError, TypeError):
+                    raise ValueError(f"Column '{x_column}' must hold numbers or dates to zoom into")
+            if x.dt.tz is not None:
+                x = x.dt.tz_localize(None)
+            self.x_kind = 'datetime'
+            valid = x.notna().to_numpy()
+            keys = x.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        order = np.argsort(keys[valid], kind='stable')
+        self.keys = keys[valid][order]
+        columns = chart_columns(x_column, y_column, color_column)
+        self.rows = df.loc[valid, columns].iloc[order].reset_index(drop=True)
+        y = self.rows[y_column]
+        self.y_values = y.to_numpy(dtype='float64', na_value=np.nan) if pd.api.types.is_numeric_dtype(y) else None
+
+        factor = app.config['ZOOM_PYRAMID_FACTOR']
+        self.levels = [None]  # Level 0 is every row
+        if self.line:
+            groups = (pd.factorize(self.rows[color_column], use_na_sentinel=False)[0] if color_column
+                      else np.zeros(len(self.rows), dtype=np.int64))
+            position = pd.Series(groups).groupby(groups).cumcount().to_numpy()
+            largest = position.max() + 1 if len(position) else 0
+            points, bucket = np.arange(len(self.rows)), factor
+            while bucket // factor < largest:
+                points = self.extremes(points, [groups[points], position[points] // bucket])
+                self.levels.append(points)
+                bucket *= factor
+        else:
+            priority = np.random.default_rng(0).random(len(self.rows))
+            rate = 1 / factor
+            while len(self.rows) * rate >= 1:
+                self.levels.append(np.flatnonzero(priority < rate))
+                rate /= factor
+
+    def extremes(self, points, keys):
+        """Rows among points holding the min and max y of each bucket, in x order"""
+        if self.y_values is None:
+            return first_per_bucket(points, keys)
+        y = self.y_values[points]
+        present = ~np.isnan(y)
+        frame = pd.DataFrame({'group': keys[0][present], 'bucket': keys[1][present], 'y': y[present]})
+        grouped = frame.groupby(['group', 'bucket'], sort=False)['y']
+        return points[present][np.union1d(grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy())]
+
+    @property
+    def size(self):
+        """Approximate memory held by the pyramid in bytes"""
+        arrays = [self.keys] + self.levels[1:] + ([self.y_values] if self.y_values is not None else [])
+        return dataframe_size(self.rows) + sum(array.nbytes for array in arrays)
+
+    def bound(self, value):
+        """An x range bound on the scale of the sorted keys"""
+        try:
+            if self.x_kind == 'numeric':
+                return float(value)
+            stamp = pd.Timestamp(value)
+        except ValueError:
+            stamp = pd.NaT
+        if stamp is pd.NaT:
+            raise ValueError(f"Invalid {self.x_kind} range bound {value!r}")
+        if stamp.tz is not None:
+            stamp = stamp.tz_localize(None)
+        return stamp.as_unit('ns').value
+
+    def points_in_view(self, level, start, stop, y_range):
+        """Positions of the rows of a level between sorted positions start and stop.
+
+        Lines keep the nearest point beyond each end so they run to the
+        edges of the view; scatter plots keep only the points within y_range.
+        """
+        points = self.levels[level]
+        if points is not None:
+            start, stop = np.searchsorted(points, start), np.searchsorted(points, stop)
+        if self.line:
+            start, stop = max(start - 1, 0), min(stop + 1, len(self.keys) if points is None else len(points))
+        picked = np.arange(start, stop) if points is None else points[start:stop]
+        if y_range is not None and not self.line and self.y_values is not None:
+            y = self.y_values[picked]
+            picked = picked[(y >= y_range[0]) & (y <= y_range[1])]
+        return picked
+
+    def view(self, x_range, y_range, max_points):
+        """Rows shown for an x range (and y range for scatter plots).
+
+        Either bound may be None for an open end. Returns the rows, the
+        pyramid level they come from and the number of rows in the x range.
+        """
+        start = 0 if x_range[0] is None else np.searchsorted(self.keys, self.bound(x_range[0]), 'left')
+        stop = len(self.keys) if x_range[1] is None else np.searchsorted(self.keys, self.bound(x_range[1]), 'right')
+        if y_range is not None:
+            try:
+                y_range = [float(value) for value in y_range]
+            except ValueError:
+                raise ValueError(f"Invalid y range {list(y_range)!r}")
+
+        # Go from the coarsest level down while the view fits the budget
+        chosen = None
+        for level in reversed(range(len(self.levels))):
+            picked = self.points_in_view(level, start, stop, y_range)
+            if chosen is not None and len(picked) > max_points:
+                break
+            chosen = level, picked
+        level, picked = chosen
+        if len(picked) > max_points:
+            # Even the coarsest level is over budget, e.g. a line with many color groups
+            picked = picked[np.linspace(0, len(picked) - 1, max_points).astype(np.int64)]
+        return self.rows.iloc[picked], level, int(max(stop - start, 0))
+
+zoom_cache = LRUCache(app.config['ZOOM_CACHE_BYTES'], weigher=lambda pyramid: pyramid.size)
+
+def zoom_cache_key(file_path, spec):
+    """Cache key of a zoom pyramid: the upload version plus the fields the pyramid depends on"""
+    fields = [spec[field] for field in ('chart_type', 'x_column', 'y_column', 'color_column', 'filters')]
+    return file_fingerprint(file_path) + (json.dumps(fields, sort_keys=True),)
+
+def zoom_pyramid(file_path, file_type, spec):
+    """Zoom pyramid of a line or scatter chart, built on its first zoom and kept per file version"""
+    key = zoom_cache_key(file_path, spec)
+    pyramid = zoom_cache.get(key)
+    if pyramid is None:
+        columns = chart_columns(spec['x_column'], spec['y_column'], spec['color_column'])
+        with timed('load'):
+            if spec['filters']:
+                df = load_filtered(file_path, file_type, columns, spec['filters'])
             else:
-                # Count plot for categorical data
-                fig = px.bar(df[x_column].value_counts().reset_index(), x='index', y=x_column,
-                           title=f"Count of {x_column}")
-        elif chart_type == 'line':
-            fig = px.line(df, x=x_column, y=y_column, color=color_column, title=f"{y_column} over {x_column}")
-        elif chart_type == 'scatter':
-            fig = px.scatter(df, x=x_column, y=y_column, color=color_column, title=f"{x_column} vs {y_column}")
-        elif chart_type == 'pie':
-            fig = px.pie(df, names=x_column, title=f"Distribution of {x_column}")
-        elif chart_type == 'histogram':
-            fig = px.histogram(df, x=x_column, color=color_column, title=f"Distribution of {x_column}")
+                df = load_cached_data(file_path, file_type, columns)
+        with timed('build'):
+            pyramid = ZoomPyramid(df, spec)
+        zoom_cache.put_version(key, pyramid)
+    return pyramid
+
+@app.route('/api/zoom/<filename>')
+def zoom_chart(filename):
+    """Points of a line or scatter chart within its visible range, at the chart's resolution.
+
+    Takes the chart spec in the query string like GET /api/generate_chart,
+    plus the visible range as x_start and x_end, and y_start and y_end for
+    scatter plots. Returns the trace data for Plotly.react, without the layout.
+    """
+    try:
+        data = chart_request_data()
+        spec = chart_spec(data)
+        if spec['chart_type'] not in ZOOM_CHART_TYPES:
+            raise ValueError('Only line and scatter charts can be zoomed')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    file_path = existing_upload(filename)
+    if file_path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    x_range = (data.get('x_start') or None, data.get('x_end') or None)
+    y_range = (data['y_start'], data['y_end']) if data.get('y_start') and data.get('y_end') else None
+    try:
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        profile = get_profile(file_path, file_ext)
+        g.chart_labels = (spec['chart_type'], file_ext)
+        with chart_stages(spec['chart_type'], file_ext):
+            try:
+                validate_chart_columns(spec, profile)
+                # Only building a pyramid loads data; it holds every row of the chart's columns
+                cost = 0
+                if zoom_cache_key(file_path, spec) not in zoom_cache:
+                    columns = chart_columns(spec['x_column'], spec['y_column'], spec['color_column'],
+                                            *(predicate['column'] for predicate in spec['filters']))
+                    cost = columns_memory(file_path, profile, columns, profile.rows)
+                with admitted(cost):
+                    pyramid = zoom_pyramid(file_path, file_ext, spec)
+                view, level, in_view = pyramid.view(x_range, y_range, spec['max_points'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            with timed('build'):
+                fig, _ = build_figure(view, spec)
+            with timed('serialize'):
+                traces = pio.json.to_json_plotly(fig.to_plotly_json()['data'], engine=JSON_ENGINE)
+        reduction = {'method': 'zoom', 'level': level, 'input_points': in_view, 'output_points': len(view)}
+        return app.response_class('{"data":' + traces + ',"reduction":' + json.dumps(reduction) + '}',
+                                  mimetype='application/json')
+
+    except Overloaded:
+        return overloaded_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+class JobCancelled(Exception):
+    """Raised in a chart job whose cancel marker file has been created"""
+
+# Cancel marker file of the chart job running in this process, if any
+job_cancel_path = None
+
+def check_cancelled():
+    if job_cancel_path is not None and os.path.exists(job_cancel_path):
+        raise JobCancelled()
+
+def cancellable(chunks):
+    """Check for cancellation of the current job before each chunk"""
+    for chunk in chunks:
+        check_cancelled()
+        yield chunk
+
+def job_config():
+    """Settings a job worker process copies from the app that submitted the job.
+
+    Every plain setting is copied rather than a list of the ones the chart
+    path reads, so a new limit cannot be left at its default in the workers.
+    """
+    return {key: value for key, value in app.config.items() if isinstance(value, (bool, int, float, str))}
+
+def run_chart_job(file_path, file_type, spec, config, cancel_path):
+    """Render a chart in a job worker process"""
+    global job_cancel_path
+    app.config.update(config)
+    job_cancel_path = cancel_path
+    try:
+        check_cancelled()
+        return render_chart(file_path, file_type, spec)
+    finally:
+        job_cancel_path = None
+
+class ChartJob:
+    """A chart built in the background, shared by every request for the same chart"""
+
+    def __init__(self, cache_key, cancel_path):
+        self.id = uuid.uuid4().hex
+        self.cache_key = cache_key
+        self.cancel_path = cancel_path
+        self.future = None
+        self.state = 'queued'
+        self.body = None
+        self.error = None
+        self.subscribers = 1
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def status(self):
+        if self.state == 'queued' and self.future is not None and self.future.running():
+            return 'running'
+        return self.state
+
+    def finish(self, state, body=None, error=None):
+        self.state, self.body, self.error = state, body, error
+        self.finished_at = time.time()
+        self.done.set()
+
+    def to_json(self):
+        meta = json.dumps({'job_id': self.id, 'status': self.status, 'error': self.error})
+        if self.body is None:
+            return meta
+        return meta[:-1] + ',"result":' + self.body + '}'
+
+chart_jobs = {}
+active_jobs = {}  # cache key -> id of the unfinished job building that chart
+jobs_lock = threading.Lock()
+job_executor = None
+
+def job_pool():
+    """Process pool running chart jobs, started on first use (call with jobs_lock held)"""
+    global job_executor
+    if job_executor is None:
+        # Spawned workers do not inherit locks held by the server's other threads
+        job_executor = ProcessPoolExecutor(max_workers=app.config['CHART_JOB_WORKERS'],
+                                           mp_context=multiprocessing.get_context('spawn'))
+    return job_executor
+
+def expire_jobs():
+    """Forget jobs finished more than CHART_JOB_TTL ago (call with jobs_lock held)"""
+    cutoff = time.time() - app.config['CHART_JOB_TTL']
+    for job_id in [job_id for job_id, job in chart_jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]:
+        del chart_jobs[job_id]
+
+def submit_chart_job(file_path, file_type, spec, cache_key):
+    """Start building a chart in the background, joining the job already building it if any"""
+    global job_executor
+    cancel_folder = os.path.join(app.config['UPLOAD_FOLDER'], '.jobs')
+    os.makedirs(cancel_folder, exist_ok=True)
+    with jobs_lock:
+        expire_jobs()
+        job_id = active_jobs.get(cache_key)
+        if job_id is not None:
+            job = chart_jobs[job_id]
+            job.subscribers += 1
+            return job
+
+        job = ChartJob(cache_key, None)
+        job.cancel_path = os.path.join(cancel_folder, f"{job.id}.cancel")
+        chart_jobs[job.id] = job
+        body = figure_cache.get(cache_key)
+        if body is not None:
+            job.finish('done', body=body)
+            return job
+
+        config = job_config()
+        try:
+            job.future = job_pool().submit(run_chart_job, file_path, file_type, spec, config, job.cancel_path)
+        except BrokenProcessPool:
+            # A worker died; replace the pool
+            job_executor = None
+            job.future = job_pool().submit(run_chart_job, file_path, file_type, spec, config, job.cancel_path)
+        active_jobs[cache_key] = job.id
+    job.future.add_done_callback(lambda future: finish_chart_job(job, future))
+    return job
+
+def finish_chart_job(job, future):
+    state, body, error = 'done', None, None
+    if future.cancelled():
+        state = 'cancelled'
+    else:
+        try:
+            body = future.result()
+        except JobCancelled:
+            state = 'cancelled'
+        except Exception as e:
+            state, error = 'failed', str(e) or type(e).__name__
         else:
-            return jsonify({'error': 'Invalid chart type'}), 400
+            store_chart(job.cache_key, body)
 
-        # Update layout for better appearance
-        fig.update_layout(
-            template='plotly_white',
-            font_family="Arial",
-            title_font_size=16
-        )
+    with jobs_lock:
+        if active_jobs.get(job.cache_key) == job.id:
+            del active_jobs[job.cache_key]
+    if os.path.exists(job.cancel_path):
+        os.remove(job.cancel_path)
+    job.finish(state, body, error)
+
+def cancel_chart_job(job):
+    """Drop one subscriber of a job, stopping the work when none are left"""
+    with jobs_lock:
+        if job.done.is_set():
+            return
+        job.subscribers -= 1
+        if job.subscribers > 0:
+            return
+        # Later requests for the chart start a new job
+        if active_jobs.get(job.cache_key) == job.id:
+            del active_jobs[job.cache_key]
+    if not job.future.cancel():
+        # Already running: the worker stops at its next cancellation check
+        open(job.cancel_path, 'w').close()
 
-        return jsonify({'chart': fig.to_json()})
+def job_response(job, status=200):
+    return app.response_class(job.to_json(), status=status, mimetype='application/json')
+
+@app.route('/api/jobs/<filename>', methods=['POST'])
+def start_chart_job(filename):
+    """Build a chart in the background; returns the job to poll or subscribe to"""
+    try:
+        spec = chart_spec(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    file_path = existing_upload(filename)
+    if file_path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        try:
+            validate_chart_columns(spec, get_profile(file_path, file_ext))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        job = submit_chart_job(file_path, file_ext, spec, chart_cache_key(file_path, spec))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    response = job_response(job, 200 if job.done.is_set() else 202)
+    response.headers['Location'] = url_for('chart_job_status', job_id=job.id)
+    return response
+
+def find_chart_job(job_id):
+    with jobs_lock:
+        return chart_jobs.get(job_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def chart_job_status(job_id):
+    job = find_chart_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return job_response(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_chart_job_route(job_id):
+    job = find_chart_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    cancel_chart_job(job)
+    return job_response(job)
+
+def polled_events(poll, wait, interval):
+    """Server-sent events of a polled source, with keepalives while it is quiet.
+
+    poll() returns the events due since its last call, possibly none, or
+    None once the stream has ended; wait(interval) pauses between calls.
+    """
+    idle = 0
+    while True:
+        events = poll()
+        if events is None:
+            return
+        sent = False
+        for event in events:
+            sent = True
+            yield event
+        if sent:
+            idle = 0
+        elif idle >= 15:
+            # Comment line keeping proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            idle = 0
+        wait(interval)
+        idle += interval
+
+def event_stream_response(events, release=None):
+    """Response streaming server-sent events.
+
+    release, if given, is called once when the stream ends or the client
+    goes away, including before the stream has started.
+    """
+    if release is not None:
+        released = []
+
+        def release_once():
+            if not released:
+                released.append(True)
+                release()
+
+        def stream(events):
+            try:
+                yield from events
+            finally:
+                release_once()
+
+        events = stream(events)
+    response = app.response_class(events, mimetype='text/event-stream')
+    if release is not None:
+        response.call_on_close(release_once)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/jobs/<job_id>/events')
+def chart_job_events(job_id):
+    """Server-sent events with the job's status, ending once it has finished"""
+    job = find_chart_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    last_status = None
+    ended = False
+
+    def poll():
+        nonlocal last_status, ended
+        if ended:
+            return None
+        ended = job.done.is_set()
+        status = job.status
+        if status == last_status:
+            return ()
+        last_status = status
+        return (f"event: {status}\ndata: {job.to_json()}\n\n",)
+
+    return event_stream_response(polled_events(poll, job.done.wait, 1))
+
+def can_extend_chart(spec, rows_seen, rows):
+    """Whether a line or scatter chart drawn from rows_seen rows still plots every row at rows.
+
+    Such charts are brought up to date by appending the new points to their
+    traces. Past max_points lines are downsampled and scatter plots switch
+    to WebGL, so those charts are redrawn instead, like resampled lines
+    whose last bucket may change.
+    """
+    if (spec['chart_type'] not in ('line', 'scatter') or spec['filters'] or spec['resample']
+            or not 0 < rows_seen < rows):
+        return False
+    max_points = spec['max_points']
+    if rows <= max_points:
+        return True
+    webgl_budget = max(max_points, app.config['WEBGL_POINT_BUDGET'])
+    return spec['chart_type'] == 'scatter' and rows_seen > max_points and rows <= webgl_budget
+
+def trace_extensions(new_rows, spec):
+    """New points of each trace of a line or scatter chart.
+
+    Plotly Express names the traces of a colored chart after their color
+    value; a chart without color has a single trace, sent with name None.
+    """
+    x_column, y_column, color_column = spec['x_column'], spec['y_column'], spec['color_column']
+    if not color_column:
+        return [{'name': None, 'x': new_rows[x_column].to_numpy(), 'y': new_rows[y_column].to_numpy()}]
+    return [{'name': str(name), 'x': group[x_column].to_numpy(), 'y': group[y_column].to_numpy()}
+            for name, group in new_rows.groupby(color_column, sort=False, observed=True)]
+
+def chart_update(file_path, file_type, spec, rows_seen, profile):
+    """JSON text of the smallest update bringing a chart drawn from rows_seen rows up to date.
+
+    Line and scatter charts that plot every row get only the new points
+    ("extend", for Plotly.extendTraces). Other charts get their new trace
+    data without the layout ("react", for Plotly.react); for bar, pie and
+    histogram charts that is one row per category or bin, built from the
+    incrementally updated aggregates.
+
+    An append makes every open dashboard of the dataset update at once, so
+    each update waits for its share of the admission budget first.
+    """
+    cost = chart_memory_estimate(file_path, file_type, [spec], profile)
+    with chart_stages(spec['chart_type'], file_type), admitted(cost, blocking=True):
+        reduction = {'method': 'none', 'input_points': profile.rows, 'output_points': profile.rows}
+        if can_extend_chart(spec, rows_seen, profile.rows):
+            columns = chart_columns(spec['x_column'], spec['y_column'], spec['color_column'])
+            with timed('load'):
+                new_rows = load_cached_data(file_path, file_type, columns).iloc[rows_seen:]
+            if spec['chart_type'] == 'scatter' and profile.rows > spec['max_points']:
+                reduction['method'] = 'webgl'
+            with timed('serialize'):
+                return pio.json.to_json_plotly({'type': 'extend', 'traces': trace_extensions(new_rows, spec),
+                                                'reduction': reduction}, engine=JSON_ENGINE)
+
+        fig, reduction = build_chart(file_path, file_type, spec)
+        with timed('serialize'):
+            data = pio.json.to_json_plotly(fig.to_plotly_json()['data'], engine=JSON_ENGINE)
+            return '{"type":"react","data":' + data + ',"reduction":' + json.dumps(reduction) + '}'
+
+def live_updates(filename, file_type, charts):
+    """Server-sent events keeping the charts of a dashboard up to date as its dataset grows.
+
+    charts lists the specs of the charts on screen, each with the number of
+    rows it was drawn from. The upload is checked every LIVE_POLL_SECONDS,
+    following its alias to the dataset it is appended to; when it has
+    changed, a "dataset" event carries the new row count and an "update"
+    event per chart carries what chart_update computed for it.
+    """
+    fingerprint = None
+
+    def updates(file_path):
+        profile = get_profile(file_path, file_type)
+        yield f"event: dataset\ndata: {json.dumps({'rows': profile.rows})}\n\n"
+        for index, (spec, rows_seen) in enumerate(charts):
+            if rows_seen == profile.rows:
+                continue
+            try:
+                update = chart_update(file_path, file_type, spec, rows_seen, profile)
+            except Exception as e:
+                update = json.dumps({'type': 'error', 'error': str(e)})
+            charts[index] = (spec, profile.rows)
+            yield f'event: update\ndata: {{"index":{index},"update":{update}}}\n\n'
+
+    def poll():
+        nonlocal fingerprint
+        file_path = upload_path(filename)
+        try:
+            current = file_fingerprint(file_path)
+        except OSError:
+            return None
+        if current == fingerprint:
+            return ()
+        fingerprint = current
+        return updates(file_path)
+
+    yield from polled_events(poll, time.sleep, app.config['LIVE_POLL_SECONDS'])
+
+# Each open stream holds a request thread for as long as the dashboard stays open
+live_streams = threading.BoundedSemaphore(app.config['LIVE_MAX_STREAMS'])
+
+@app.route('/api/live/<filename>')
+def live_dashboard(filename):
+    """Push updates of a dashboard's charts while its dataset grows.
+
+    charts is a JSON list of chart specs, each with a "rows" field giving
+    the row count the chart on screen was drawn from. At most
+    LIVE_MAX_STREAMS streams are served at once; more get 503 with
+    Retry-After, so live dashboards cannot take every request thread.
+    """
+    file_path = existing_upload(filename)
+    if file_path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        items = json.loads(request.args.get('charts', '[]'))
+        if not isinstance(items, list) or len(items) > app.config['BATCH_MAX_CHARTS']:
+            raise ValueError(f"charts must be a list of at most {app.config['BATCH_MAX_CHARTS']} chart specs")
+        profile = get_profile(file_path, file_ext)
+        charts = []
+        for item in items:
+            spec = chart_spec(item)
+            validate_chart_columns(spec, profile)
+            rows = item.get('rows')
+            if not isinstance(rows, int) or rows < 0:
+                raise ValueError('Every chart needs the non-negative row count it was drawn from')
+            charts.append((spec, rows))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not live_streams.acquire(blocking=False):
+        response = jsonify({'error': 'Too many live dashboards are open; try again later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    return event_stream_response(live_updates(filename, file_ext, charts), release=live_streams.release)
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def partial_upload_paths(upload_id):
+    """Data and metadata files of an in-progress resumable upload"""
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], '.partial')
+    data_path = os.path.join(folder, upload_id)
+    if not os.path.exists(f"{data_path}.json"):
+        return None
+    return data_path, f"{data_path}.json"
+
+def expire_partial_uploads(folder):
+    """Remove resumable uploads that received no part for UPLOAD_PARTIAL_TTL seconds"""
+    cutoff = time.time() - app.config['UPLOAD_PARTIAL_TTL']
+    for name in os.listdir(folder):
+        if not name.endswith('.json'):
+            continue
+        meta_path = os.path.join(folder, name)
+        data_path = meta_path[:-len('.json')]
+        try:
+            last_part = max(os.path.getmtime(path) for path in (meta_path, data_path) if os.path.exists(path))
+            if last_part < cutoff:
+                for path in (meta_path, data_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except (OSError, ValueError):
+            # Completed or expired by another worker meanwhile
+            pass
+
+@app.route('/api/uploads', methods=['POST'])
+def start_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type. Please upload CSV, Excel, or JSON files.'}), 400
+    if not isinstance(size, int) or size < 0:
+        return jsonify({'error': 'size must be a non-negative integer'}), 400
+
+    upload_id = uuid.uuid4().hex
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], '.partial')
+    os.makedirs(folder, exist_ok=True)
+    expire_partial_uploads(folder)
+    data_path = os.path.join(folder, upload_id)
+    open(data_path, 'wb').close()
+    with open(f"{data_path}.json", 'w') as f:
+        json.dump({'filename': filename, 'size': size}, f)
+
+    return jsonify({'upload_id': upload_id, 'offset': 0, 'chunk_size': app.config['UPLOAD_CHUNK_BYTES']}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    paths = partial_upload_paths(upload_id)
+    if paths is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    with open(paths[1]) as f:
+        meta = json.load(f)
+    return jsonify({'upload_id': upload_id, 'offset': os.path.getsize(paths[0]), 'size': meta['size']})
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append one part of a resumable upload, streamed straight to disk.
+
+    Parts reaching past the size declared when the upload started are
+    rejected with 413 and leave the upload as it was.
+    """
+    paths = partial_upload_paths(upload_id)
+    if paths is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    with open(paths[1]) as f:
+        meta = json.load(f)
+
+    offset = request.args.get('offset', type=int)
+    received = os.path.getsize(paths[0])
+    if offset != received:
+        # The client resumes from the offset the server actually has
+        return jsonify({'error': 'Offset mismatch', 'offset': received}), 409
+
+    def too_large():
+        return jsonify({'error': 'Part extends past the declared upload size', 'offset': received,
+                        'size': meta['size']}), 413
+
+    remaining = meta['size'] - received
+    if request.content_length is not None and request.content_length > remaining:
+        return too_large()
+    with open(paths[0], 'ab') as f:
+        while True:
+            block = request.stream.read(1024 * 1024)
+            if not block:
+                break
+            if len(block) > remaining:
+                # Sent without a Content-Length; drop what this part wrote
+                f.truncate(received)
+                return too_large()
+            remaining -= len(block)
+            f.write(block)
+    return jsonify({'upload_id': upload_id, 'offset': os.path.getsize(paths[0])})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    paths = partial_upload_paths(upload_id)
+    if paths is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    with open(paths[1]) as f:
+        meta = json.load(f)
+    received = os.path.getsize(paths[0])
+    if received != meta['size']:
+        return jsonify({'error': 'Upload incomplete', 'offset': received, 'size': meta['size']}), 409
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_filename = f"{timestamp}_{meta['filename']}"
+    # Parts may arrive in different requests and processes, so the file is hashed once complete
+    store_upload(paths[0], unique_filename, hash_file(paths[0]))
+    os.remove(paths[1])
+
+    return jsonify({'filename': unique_filename,
+                    'dashboard_url': url_for('dashboard', filename=unique_filename)})
+
+def conform_rows(new_rows, profile):
+    """Check appended rows have the dataset's columns and convert them to its column types"""
+    if new_rows.empty:
+        raise ValueError("No rows to append")
+    missing = [name for name in profile.columns if name not in new_rows.columns]
+    extra = [name for name in new_rows.columns if name not in profile.columns]
+    if missing or extra:
+        raise ValueError(f"Appended rows must have the dataset's columns (missing: {missing}, unexpected: {extra})")
+
+    new_rows = new_rows[list(profile.columns)].reset_index(drop=True)
+    for name in profile.columns:
+        kind = profile.kind(name)
+        try:
+            if kind == 'numeric':
+                new_rows[name] = pd.to_numeric(new_rows[name])
+            elif kind == 'datetime':
+                new_rows[name] = pd.to_datetime(new_rows[name])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Column '{name}' expects {kind} values: {e}")
+    return new_rows
+
+def append_to_original(file_path, file_type, new_rows):
+    """Add rows to the uploaded file itself.
+
+    CSVs are appended to in place; JSON and Excel files have no appendable
+    layout, so they are rewritten.
+    """
+    if file_type == 'csv':
+        with open(file_path, 'rb') as f:
+            # Files saved without a trailing newline would join the first new row to the last one
+            terminated = f.seek(0, os.SEEK_END) == 0 or (f.seek(-1, os.SEEK_END) and f.read(1) in b'\r\n')
+        with open(file_path, 'a', newline='') as f:
+            if not terminated:
+                f.write('\n')
+            new_rows.to_csv(f, header=False, index=False)
+        return
+    if file_type not in ('xlsx', 'json'):
+        raise ValueError(f"Rows cannot be appended to .{file_type} files")
+
+    df = pd.concat([parse_file(file_path, file_type), new_rows], ignore_index=True)
+    # Writers pick their format from the extension, so keep it last
+    temp_path = f"{file_path}.{os.getpid()}.partial.{file_type}"
+    if file_type == 'xlsx':
+        df.to_excel(temp_path, index=False, engine='openpyxl')
+    else:
+        df.to_json(temp_path, orient='records', date_format='iso')
+    os.replace(temp_path, file_path)
+
+def append_to_columnar(file_path, new_rows):
+    """Add rows to the columnar copy of an upload, keeping its stored types.
+
+    The copy is rewritten from its memory map with the new rows as an extra
+    record batch, without parsing the original. Returns False when the rows
+    do not fit the stored types (say a category outgrowing its int8 codes),
+    in which case the copy has to be rebuilt.
+    """
+    target = columnar_path(file_path)
+    temp_path = columnar_temp_path(file_path)
+    try:
+        with pa.memory_map(target) as source:
+            table = pa.ipc.open_file(source).read_all()
+            appended = pa.Table.from_pandas(new_rows, preserve_index=False).cast(table.schema)
+            # The IPC file format needs one dictionary per column for all batches
+            table = pa.concat_tables([table, appended]).unify_dictionaries()
+            options = pa.ipc.IpcWriteOptions(compression=None)
+            with pa.ipc.new_file(temp_path, table.schema, options=options) as writer:
+                writer.write_table(table)
+    except pa.ArrowException as e:
+        app.logger.info("Rebuilding the columnar copy of %s: %s", file_path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    os.replace(temp_path, target)
+    return True
+
+append_thread_lock = threading.RLock()
+append_lock_state = threading.local()
+
+@contextmanager
+def append_lock():
+    """Hold the lock serializing appends across threads and worker processes.
+
+    An append renames or copies the dataset, then rewrites the upload, its
+    columnar copy and its profile; gunicorn workers interleaving those steps
+    lose rows, so the lock is an flock on .append.lock in the upload folder.
+    Re-entrant within a thread.
+    """
+    with append_thread_lock:
+        if getattr(append_lock_state, 'held', False):
+            yield
+            return
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], '.append.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            append_lock_state.held = True
+            try:
+                yield
+            finally:
+                append_lock_state.held = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def detach_alias(filename):
+    """Give an upload filename a dataset of its own before rows are appended to it.
+
+    Once appended to, a content-addressed dataset no longer holds the
+    content of its name, and other aliases of it must keep their rows. The
+    dataset moves to a random name, renamed when no other alias refers to
+    it and copied otherwise, together with its derived files and chart
+    aggregates. Returns the path to append to.
+    """
+    dataset = read_alias(filename)
+    if dataset is None or not CONTENT_NAME_PATTERN.match(dataset):
+        return upload_path(filename)
+
+    folder = app.config['UPLOAD_FOLDER']
+    aliases = os.listdir(os.path.join(folder, '.aliases'))
+    shared = any(name != filename and read_alias(name) == dataset for name in aliases)
+    source = os.path.join(folder, dataset)
+    target = os.path.join(folder, f"{uuid.uuid4().hex}.{dataset.rsplit('.', 1)[1]}")
+    old_fingerprint = file_fingerprint(source)
+    # Copies get new modification times, so the upload goes first to keep its derived files fresh
+    move = shutil.copyfile if shared else os.replace
+    for derived in (lambda path: path, columnar_path, evicted_marker_path, profile_path):
+        if os.path.exists(derived(source)):
+            move(derived(source), derived(target))
+    write_alias(filename, os.path.basename(target))
+
+    new_fingerprint = file_fingerprint(target)
+    for cache_key, partial in aggregate_cache.items():
+        if cache_key[:3] == old_fingerprint:
+            aggregate_cache.put(new_fingerprint + cache_key[3:], partial)
+    if not shared:
+        aggregate_cache.discard(lambda k: k[:3] == old_fingerprint)
+    app.logger.info("%s %s to %s before appending to %s", 'Copied' if shared else 'Moved',
+                    dataset, os.path.basename(target), filename)
+    return target
+
+def append_to_dataset(file_path, file_type, new_rows):
+    """Append rows to an upload and update its derived files incrementally.
+
+    The profile is updated with the new rows only, the columnar copy gets
+    them as an extra record batch and stored chart aggregates are merged
+    with the aggregates of the new rows. Returns the updated profile and the
+    number of aggregates carried over.
+    """
+    with append_lock():
+        old_fingerprint = file_fingerprint(file_path)
+        profile = get_profile(file_path, file_type)
+        new_rows = conform_rows(new_rows, profile)
+        has_columnar = has_fresh_columnar(file_path)
+
+        append_to_original(file_path, file_type, new_rows)
+        profile = DatasetProfile.from_dict(copy.deepcopy(profile.to_dict())).update(new_rows)
+        if has_columnar and not append_to_columnar(file_path, new_rows):
+            if is_streamed(file_path, file_type):
+                convert_csv_to_columnar_chunked(file_path, profile)
+            else:
+                convert_to_columnar(file_path, file_type)
+        save_profile(file_path, profile)
+
+        new_fingerprint = file_fingerprint(file_path)
+        profile_cache.put_version(new_fingerprint, profile)
+        updated = update_aggregates(old_fingerprint, new_fingerprint, new_rows)
+    app.logger.info("Appended %d rows to %s, %d chart aggregates updated", len(new_rows), file_path, updated)
+    return profile, updated
+
+def appended_rows():
+    """Rows sent to the append endpoint, as {"rows": [...]} or an uploaded CSV or JSON file"""
+    upload = request.files.get('file')
+    if upload is not None:
+        extension = upload.filename.rsplit('.', 1)[-1].lower()
+        if extension == 'csv':
+            return pd.read_csv(upload.stream)
+        if extension == 'json':
+            return pd.read_json(upload.stream)
+        raise ValueError("Appended rows must be sent as a CSV or JSON file")
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('rows'), list):
+        raise ValueError('Request body must be {"rows": [...]} or a CSV or JSON file')
+    return pd.DataFrame(data['rows'])
+
+@app.route('/api/append/<filename>', methods=['POST'])
+def append_rows(filename):
+    """Append rows to an existing dataset, keeping its filename"""
+    file_path = existing_upload(filename)
+    if file_path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        file_ext = filename.rsplit('.', 1)[1].lower()
+        new_rows = appended_rows()
+        with append_lock():
+            file_path = detach_alias(filename)
+            profile, updated = append_to_dataset(file_path, file_ext, new_rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'success': True, 'rows_appended': len(new_rows), 'rows': profile.rows,
+                    'aggregates_updated': updated})
+
+@app.route('/api/cache_stats')
+def cache_stats():
+    return jsonify({'dataframes': dataframe_cache.stats(), 'figures': figure_cache.stats(),
+                    'aggregates': aggregate_cache.stats(), 'zoom': zoom_cache.stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Request, chart and stage timings, admission queue and cache counters in the Prometheus text format"""
+    lines = []
+    for histogram in (request_seconds, chart_seconds, stage_seconds, admission_wait_seconds):
+        lines.extend(histogram.exposition())
+
+    stats = admission.stats()
+    lines.extend(['# HELP dataviz_admission_queue_depth Chart requests waiting for memory.',
+                  '# TYPE dataviz_admission_queue_depth gauge',
+                  f"dataviz_admission_queue_depth {stats['waiting']}",
+                  '# HELP dataviz_admission_memory_bytes Estimated memory held by chart requests being built.',
+                  '# TYPE dataviz_admission_memory_bytes gauge',
+                  f"dataviz_admission_memory_bytes {stats['in_use']}",
+                  '# HELP dataviz_admission_rejected_total Chart requests refused with 429, per reason.',
+                  '# TYPE dataviz_admission_rejected_total counter'])
+    lines.extend(f'dataviz_admission_rejected_total{{reason="{reason}"}} {count}'
+                 for reason, count in stats['rejected'].items())
+
+    caches = {'dataframes': dataframe_cache.stats(), 'figures': figure_cache.stats(),
+              'aggregates': aggregate_cache.stats(), 'zoom': zoom_cache.stats()}
+    for stat, kind, description in (('hits', 'counter', 'Cache hits.'),
+                                    ('misses', 'counter', 'Cache misses.'),
+                                    ('evictions', 'counter', 'Entries evicted to stay within the memory budget.'),
+                                    ('weight', 'gauge', 'Bytes held in the cache.')):
+        name = f"dataviz_cache_{stat}" + ('_total' if kind == 'counter' else '_bytes')
+        lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {kind}"])
+        lines.extend(f'{name}{{cache="{cache}"}} {stats[stat]}' for cache, stats in caches.items())
+
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Load pandas and plotly while the reloader's server process starts listening
+        threading.Thread(target=warm_imports, daemon=True).start()
     app.run(debug=True)
\ No newline at end of file
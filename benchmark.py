@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Data Visualization Dashboard
+Times data loading, the dashboard and every chart type on synthetic datasets,
+and stores the results as JSON so runs can be compared between commits
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource  # peak RSS, not available on Windows
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = ('csv', 'xlsx', 'json')
+XLSX_MAX_ROWS = 1048575  # Excel sheet limit, excluding the header row
+
+CHART_SPECS = {
+    'bar_count': {'chart_type': 'bar', 'x_column': 'Region'},
+    'bar_sum': {'chart_type': 'bar', 'x_column': 'Product', 'y_column': 'Sales', 'color_column': 'Region'},
+    'line': {'chart_type': 'line', 'x_column': 'Date', 'y_column': 'Sales'},
+    'scatter': {'chart_type': 'scatter', 'x_column': 'Sales', 'y_column': 'Profit'},
+    'scatter_color': {'chart_type': 'scatter', 'x_column': 'Sales', 'y_column': 'Profit', 'color_column': 'Region'},
+    'pie': {'chart_type': 'pie', 'x_column': 'Category'},
+    'histogram': {'chart_type': 'histogram', 'x_column': 'Sales'},
+}
+
+def parse_size(text):
+    """Parse a row count such as 5000, 10k or 1m"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+def generate_dataset(rows, seed=0):
+    """Synthetic sales data with low, medium and high cardinality columns"""
+    rng = np.random.default_rng(seed)
+    sales = rng.lognormal(6, 1, rows).round(2)
+    profit = (sales * rng.normal(0.15, 0.1, rows)).round(2)
+    profit[rng.random(rows) < 0.01] = np.nan
+
+    return pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=rows, freq='min'),
+        'Region': rng.choice(['North', 'South', 'East', 'West', 'Central'], rows),
+        'Category': rng.choice([f'Category {i}' for i in range(20)], rows),
+        'Product': rng.choice([f'Product {i}' for i in range(1000)], rows),
+        'Customer': [f'C{i}' for i in rng.integers(0, max(rows // 10, 1), rows)],
+        'Sales': sales,
+        'Quantity': rng.integers(1, 100, rows),
+        'Profit': profit,
+    })
+
+def dataset_path(data_dir, rows, file_type, seed):
+    path = os.path.join(data_dir, f"bench_{rows}_{seed}.{file_type}")
+    if not os.path.exists(path):
+        df = generate_dataset(rows, seed)
+        partial = os.path.join(data_dir, f"bench_{rows}_{seed}.partial.{file_type}")
+        if file_type == 'csv':
+            df.to_csv(partial, index=False)
+        elif file_type == 'xlsx':
+            df.to_excel(partial, index=False, engine='openpyxl')
+        else:
+            df.to_json(partial, orient='records', date_format='iso')
+        os.replace(partial, path)
+    return path
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def summarize(samples):
+    """Latency percentiles in milliseconds"""
+    values = np.array(samples) * 1000
+    return {
+        'runs': len(samples),
+        'mean_ms': round(float(values.mean()), 2),
+        'min_ms': round(float(values.min()), 2),
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p90_ms': round(float(np.percentile(values, 90)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2),
+    }
+
+def measure(run, repeat, before=None):
+    """Time run() repeat times, calling before() untimed ahead of each run"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - started)
+    stats = summarize(samples)
+    stats['peak_rss_mb'] = peak_rss_mb()
+    return stats, result
+
+def benchmark_dataset(source, rows, file_type, repeat):
+    """Benchmark one dataset in this process; returns a dict of timings per case"""
+    import app
+
+    upload_folder = tempfile.mkdtemp(prefix='dataviz_bench_')
+    app.app.config['UPLOAD_FOLDER'] = upload_folder
+    filename = os.path.basename(source)
+    file_path = os.path.join(upload_folder, filename)
+    try:
+        os.link(source, file_path)  # avoids copying multi-GB datasets
+    except OSError:
+        shutil.copy(source, file_path)
+
+    def clear_caches():
+        # Every cache a chart can be answered from, so cold cases read the data again
+        for cache in (app.dataframe_cache, app.figure_cache, app.profile_cache, app.aggregate_cache,
+                      app.zone_cache, app.zoom_cache):
+            cache.clear()
+
+    results = {'rows': rows, 'format': file_type, 'file_bytes': os.path.getsize(source), 'cases': {}}
+    cases = results['cases']
+
+    # Single-threaded pandas readers against the pyarrow CSV reader and calamine
+    app.app.config['PARALLEL_INGEST'] = False
+    cases['parse_file_serial'], _ = measure(lambda: app.parse_file(file_path, file_type), repeat)
+    app.app.config['PARALLEL_INGEST'] = True
+    cases['parse_file'], _ = measure(lambda: app.parse_file(file_path, file_type), repeat)
+    results['parse_speedup'] = round(cases['parse_file_serial']['p50_ms'] / cases['parse_file']['p50_ms'], 2)
+    # Ingest writes the profile and columnar copy that the remaining cases use
+    cases['ingest_upload'], _ = measure(lambda: app.ingest_upload(file_path, file_type), 1)
+    cases['load_data'], _ = measure(lambda: app.load_data(file_path, file_type), repeat)
+
+    client = app.app.test_client()
+    cases['dashboard'], response = measure(lambda: client.get(f'/dashboard/{filename}'), repeat, clear_caches)
+    cases['dashboard']['response_bytes'] = len(response.data)
+
+    for name, spec in CHART_SPECS.items():
+        post = lambda: client.post(f'/api/generate_chart/{filename}', json=spec)
+        cold, response = measure(post, repeat, clear_caches)
+        if response.status_code != 200:
+            cases[f'chart_{name}'] = {'error': response.get_json().get('error')}
+            continue
+        cold['response_bytes'] = len(response.data)
+        cold['reduction'] = response.get_json()['reduction']['method']
+        cases[f'chart_{name}'] = cold
+
+        cached, _ = measure(post, repeat)
+        cases[f'chart_{name}_cached'] = cached
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    shutil.rmtree(upload_folder, ignore_errors=True)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    import plotly
+    import app
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+        'pyarrow': app.pa.__version__ if app.HAS_PYARROW else None,
+        'excel_engine': app.EXCEL_ENGINE or 'openpyxl',
+    }
+
+def compare(results, baseline, threshold):
+    """Print cases whose median latency changed by more than threshold; returns the regressions"""
+    previous = {(r['rows'], r['format']): r['cases'] for r in baseline['datasets']}
+    regressions = []
+    print(f"\nComparison with {baseline.get('commit') or 'baseline'} (p50, threshold {threshold:.0%})")
+    for dataset in results['datasets']:
+        old_cases = previous.get((dataset['rows'], dataset['format']))
+        if old_cases is None:
+            continue
+        for name, stats in dataset['cases'].items():
+            old = old_cases.get(name)
+            if not old or 'p50_ms' not in old or 'p50_ms' not in stats or not old['p50_ms']:
+                continue
+            change = stats['p50_ms'] / old['p50_ms'] - 1
+            if abs(change) > threshold:
+                label = 'SLOWER' if change > 0 else 'faster'
+                print(f"  [{label}] {dataset['format']} {dataset['rows']:>10,} {name}: "
+                      f"{old['p50_ms']:.1f} -> {stats['p50_ms']:.1f} ms ({change:+.0%})")
+                if change > 0:
+                    regressions.append((dataset['rows'], dataset['format'], name, change))
+    if not regressions:
+        print("  No regressions")
+    return regressions
+
+def print_dataset(dataset):
+    print(f"\n{dataset['format']} {dataset['rows']:,} rows ({dataset['file_bytes'] / 1e6:.1f} MB), "
+          f"peak RSS {dataset['peak_rss_mb']} MB")
+    if 'parse_speedup' in dataset:
+        print(f"  Parallel parse speedup: {dataset['parse_speedup']:.2f}x over the single-threaded readers")
+    for name, stats in dataset['cases'].items():
+        if 'error' in stats:
+            print(f"  {name:<26} error: {stats['error']}")
+            continue
+        size = f"{stats['response_bytes']:>10,} B" if 'response_bytes' in stats else ''
+        print(f"  {name:<26} p50 {stats['p50_ms']:>9.1f} ms  p90 {stats['p90_ms']:>9.1f} ms  {size}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data loading and chart generation")
+    parser.add_argument('--sizes', default='1k,10k,100k',
+                        help="Comma separated row counts, e.g. 1k,10k,100k,1m,10m (default: %(default)s)")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Comma separated file formats (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per case (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'),
+                        help="Where generated datasets are kept between runs (default: %(default)s)")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results_<commit>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative p50 change reported when comparing (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    formats = [fmt.strip() for fmt in args.formats.split(',')]
+    for file_type in formats:
+        if file_type not in FORMATS:
+            sys.exit(f"Unsupported format: {file_type}")
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'repeat': args.repeat,
+        'datasets': [],
+    }
+
+    for rows in sizes:
+        for file_type in formats:
+            if file_type == 'xlsx' and rows > XLSX_MAX_ROWS:
+                print(f"\nSkipping xlsx {rows:,} rows: over the Excel sheet limit")
+                continue
+            source = dataset_path(args.data_dir, rows, file_type, args.seed)
+            # A fresh process per dataset keeps caches and peak RSS separate
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                dataset = pool.submit(benchmark_dataset, os.path.abspath(source), rows, file_type, args.repeat).result()
+            results['datasets'].append(dataset)
+            print_dataset(dataset)
+
+    output = args.output or os.path.join('benchmarks', f"results_{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
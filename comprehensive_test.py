@@ -7,6 +7,10 @@ Tests all features end-to-end
 import os
 import sys
 import pandas as pd
+import numpy as np
+import base64
+import hashlib
+import io
 import json
 import tempfile
 import shutil
@@ -274,6 +278,1388 @@ def run_http_tests():
         print(f"[SKIP] HTTP tests (Flask app not running locally): {e}")
         return True  # Skip is not a failure
 
+def temp_upload_folder(app_module):
+    """Point the app at a scratch upload folder seeded with test_data.csv"""
+    folder = tempfile.mkdtemp()
+    shutil.copy('test_data.csv', os.path.join(folder, 'test_data.csv'))
+    app_module.app.config['UPLOAD_FOLDER'] = folder
+    return folder
+
+def restore_upload_folder(app_module, folder):
+    app_module.app.config['UPLOAD_FOLDER'] = 'data'
+    shutil.rmtree(folder, ignore_errors=True)
+
+def test_dataframe_cache():
+    """Test parsed DataFrames are reused across requests"""
+    print("\n=== Test 9: DataFrame Cache ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            app.dataframe_cache.clear()
+            file_path = os.path.join(folder, 'test_data.csv')
+            hits_before = app.dataframe_cache.hits
+
+            first = app.load_cached_data(file_path, 'csv')
+            second = app.load_cached_data(file_path, 'csv')
+            assert first is second, "Second load should be served from cache"
+            assert app.dataframe_cache.hits == hits_before + 1, "Cache hit not counted"
+            print("[PASS] Repeat loads hit the cache")
+
+            # Changing the file must invalidate the cached frame
+            with open(file_path, 'a') as f:
+                f.write("\nNorth,1,1,1,Technology")
+            third = app.load_cached_data(file_path, 'csv')
+            assert len(third) == 11, "Stale DataFrame returned after file change"
+            assert app.dataframe_cache.stats()['entries'] == 1, "Stale entry not discarded"
+            print("[PASS] File changes invalidate cached frames")
+
+            # LRU eviction respects the memory budget
+            cache = app.LRUCache(10, weigher=len)
+            cache.put('a', 'xxxx')
+            cache.put('b', 'xxxx')
+            cache.get('a')
+            cache.put('c', 'xxxx')
+            assert cache.get('b') is None and cache.get('a') == 'xxxx', "LRU order not respected"
+            assert cache.evictions == 1, "Eviction not counted"
+            print("[PASS] LRU eviction within memory budget")
+
+            # Storing a new file version drops the entries of older ones, not newer ones or other files
+            cache = app.LRUCache(100)
+            cache.put(('a.csv', 1, 10, 'x'), 1)
+            cache.put(('a.csv', 3, 10, 'x'), 3)
+            cache.put(('b.csv', 1, 10, 'x'), 1)
+            cache.put_version(('a.csv', 2, 12, 'y'), 2)
+            assert ('a.csv', 1, 10, 'x') not in cache, "Older version kept"
+            assert all(key in cache for key in (('a.csv', 3, 10, 'x'), ('b.csv', 1, 10, 'x'), ('a.csv', 2, 12, 'y')))
+            print("[PASS] Older file versions dropped from the cache")
+
+            response = app.app.test_client().get('/api/cache_stats')
+            assert response.status_code == 200, "Cache stats endpoint failed"
+            assert 'hits' in response.get_json()['dataframes'], "Cache stats missing counters"
+            print("[PASS] Cache statistics endpoint")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] DataFrame cache test failed: {e}")
+        return False
+
+def test_columnar_conversion():
+    """Test uploads are converted once to a columnar file"""
+    print("\n=== Test 10: Columnar Conversion ===")
+
+    try:
+        import app
+        import io
+
+        if not app.HAS_PYARROW:
+            print("[SKIP] pyarrow not installed, uploads are parsed from the original file")
+            return True
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            with open('test_data.csv', 'rb') as f:
+                response = client.post('/upload', data={'file': (io.BytesIO(f.read()), 'sales.csv')},
+                                       content_type='multipart/form-data')
+            assert response.status_code == 302, f"Upload failed with status {response.status_code}"
+            uploaded = response.location.rsplit('/', 1)[-1]
+            file_path = app.upload_path(uploaded)
+            assert os.path.exists(app.columnar_path(file_path)), "Columnar copy not written"
+            print("[PASS] Upload converted to Arrow IPC")
+
+            df = app.load_data(file_path, 'csv', columns=['Region', 'Sales'])
+            assert list(df.columns) == ['Region', 'Sales'], f"Unexpected columns: {list(df.columns)}"
+            assert len(df) == 10, "Columnar copy lost rows"
+            print("[PASS] Only requested columns are read")
+
+            # A newer original must win over a stale columnar copy
+            with open(file_path, 'a') as f:
+                f.write("\nNorth,1,1,1,Technology")
+            os.utime(app.columnar_path(file_path), ns=(0, 0))
+            assert not app.has_fresh_columnar(file_path), "Stale columnar copy treated as fresh"
+            assert len(app.load_data(file_path, 'csv')) == 11, "Stale columnar copy was read"
+            print("[PASS] Stale columnar copies are ignored")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Columnar conversion test failed: {e}")
+        return False
+
+def test_point_budget():
+    """Test large line and scatter charts are reduced to the point budget"""
+    print("\n=== Test 11: Chart Point Budget ===")
+
+    try:
+        import app
+        import numpy as np
+
+        folder = temp_upload_folder(app)
+        try:
+            rows = 20000
+            rng = np.random.default_rng(0)
+            pd.DataFrame({
+                'Step': np.arange(rows),
+                'Value': rng.normal(size=rows).cumsum(),
+                'Noise': rng.normal(size=rows),
+                'Group': rng.choice(['a', 'b'], rows)
+            }).to_csv(os.path.join(folder, 'series.csv'), index=False)
+            client = app.app.test_client()
+
+            response = client.post('/api/generate_chart/series.csv', json={
+                'chart_type': 'line', 'x_column': 'Step', 'y_column': 'Value',
+                'color_column': 'Group', 'max_points': 1000})
+            reduction = response.get_json()['reduction']
+            assert response.status_code == 200, "Line chart failed"
+            assert reduction['method'] == 'minmax', f"Unexpected reduction: {reduction}"
+            assert reduction['output_points'] <= 1000, "Line chart exceeds point budget"
+            chart = response.get_json()['chart']
+            assert len(chart['data']) == 2, "Color groups lost during downsampling"
+            print(f"[PASS] Line downsampled {reduction['input_points']} -> {reduction['output_points']} points")
+
+            # The global extreme must survive min/max bucketing
+            df = pd.read_csv(os.path.join(folder, 'series.csv'))
+            kept = app.downsample_minmax(df, 'Value', 100)
+            assert df['Value'].max() in kept['Value'].values, "Maximum lost during downsampling"
+            assert kept.index.is_monotonic_increasing, "Row order not preserved"
+            print("[PASS] Min/max downsampling keeps extremes and order")
+
+            # Text values have no extremes; the first row of each bucket is kept
+            labels = pd.DataFrame({'Label': [f"row {i}" for i in range(100)]})
+            kept = app.downsample_minmax(labels, 'Label', 20)
+            assert kept.index.tolist() == list(range(0, 100, 10)), kept.index.tolist()
+            print("[PASS] Text series downsampled to the first row of each bucket")
+
+            response = client.post('/api/generate_chart/series.csv', json={
+                'chart_type': 'scatter', 'x_column': 'Value', 'y_column': 'Noise', 'max_points': 1000})
+            assert response.get_json()['reduction']['method'] == 'webgl', "Scatter should switch to WebGL"
+            chart = response.get_json()['chart']
+            assert chart['data'][0]['type'] == 'scattergl', "Scatter not rendered with scattergl"
+            print("[PASS] Scatter over budget uses WebGL")
+
+            app.app.config['WEBGL_POINT_BUDGET'] = 5000
+            app.figure_cache.clear()
+            try:
+                response = client.post('/api/generate_chart/series.csv', json={
+                    'chart_type': 'scatter', 'x_column': 'Value', 'y_column': 'Noise', 'max_points': 1000})
+            finally:
+                app.app.config['WEBGL_POINT_BUDGET'] = 100000
+            assert response.get_json()['reduction']['method'] == 'density', "Scatter should be binned"
+            print("[PASS] Very large scatter binned into density map")
+
+            app.app.config['CHART_MAX_POINTS'] = 1000
+            try:
+                response = client.post('/api/generate_chart/series.csv', json={
+                    'chart_type': 'line', 'x_column': 'Step', 'y_column': 'Value', 'max_points': 10 ** 9})
+            finally:
+                app.app.config['CHART_MAX_POINTS'] = 20000
+            reduction = response.get_json()['reduction']
+            assert reduction['method'] == 'minmax' and reduction['output_points'] <= 1000, reduction
+            print("[PASS] Requested point budget capped at CHART_MAX_POINTS")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Point budget test failed: {e}")
+        return False
+
+def test_preaggregated_charts():
+    """Test bar, pie and histogram figures hold aggregates instead of raw rows"""
+    print("\n=== Test 12: Pre-aggregated Charts ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+
+            def chart(spec):
+                response = client.post('/api/generate_chart/test_data.csv', json=spec)
+                assert response.status_code == 200, f"{spec} failed: {response.get_json()}"
+                return response.get_json()['chart'], response.get_json()['reduction']
+
+            figure, reduction = chart({'chart_type': 'bar', 'x_column': 'Region', 'y_column': ''})
+            assert list(figure['data'][0]['x']) == ['North', 'South', 'East', 'West'], "Count plot categories wrong"
+            assert reduction['method'] == 'aggregate' and reduction['output_points'] == 4, "Counts not aggregated"
+            print("[PASS] Count plot aggregated with value counts")
+
+            figure, _ = chart({'chart_type': 'bar', 'x_column': 'Region', 'y_column': 'Sales',
+                               'color_column': 'Category'})
+            bars = sum(len(trace['x']) for trace in figure['data'])
+            assert bars == 4, f"Expected one bar per (Region, Category), got {bars}"
+            print("[PASS] Bar chart aggregated with groupby sum")
+
+            figure, _ = chart({'chart_type': 'pie', 'x_column': 'Category'})
+            assert len(figure['data'][0]['labels']) == 4, "Pie not aggregated per category"
+            print("[PASS] Pie chart aggregated per category")
+
+            df = pd.read_csv('test_data.csv')
+            agg, widths = app.aggregate_histogram(df, 'Sales', 'Region')
+            assert agg['count'].sum() == len(df), "Histogram lost rows"
+            assert agg.groupby('Region').size().nunique() == 1, "Color groups use different bins"
+            assert len(widths) == len(agg) // 4, "Bin widths do not match bins"
+            print("[PASS] Histogram binned with shared edges per color")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Pre-aggregated charts test failed: {e}")
+        return False
+
+def test_streaming_ingest():
+    """Test resumable uploads and chunked processing of large CSVs"""
+    print("\n=== Test 13: Streaming Ingest ===")
+
+    try:
+        import app
+        import time
+
+        folder = temp_upload_folder(app)
+        # Treat every CSV as large and parse it three rows at a time
+        app.app.config.update(STREAMING_INGEST_BYTES=1, CSV_CHUNK_ROWS=3)
+        try:
+            client = app.app.test_client()
+            with open('test_data.csv', 'rb') as f:
+                content = f.read()
+
+            response = client.post('/api/uploads', json={'filename': 'large.csv', 'size': len(content)})
+            assert response.status_code == 201, "Resumable upload not started"
+            upload_id = response.get_json()['upload_id']
+
+            client.put(f'/api/uploads/{upload_id}?offset=0', data=content[:100])
+            response = client.put(f'/api/uploads/{upload_id}?offset=0', data=content[100:])
+            assert response.status_code == 409, "Wrong offset should be rejected"
+            assert response.get_json()['offset'] == 100, "Resume offset not reported"
+            response = client.post(f'/api/uploads/{upload_id}/complete')
+            assert response.status_code == 409, "Incomplete upload should not complete"
+            response = client.put(f'/api/uploads/{upload_id}?offset=100', data=content[100:] + b'extra')
+            assert response.status_code == 413, "Part past the declared size accepted"
+            # Chunked transfer encoding, without a Content-Length
+            response = client.put(f'/api/uploads/{upload_id}?offset=100', input_stream=io.BytesIO(content[100:] + b'extra'),
+                                  headers={'Transfer-Encoding': 'chunked'},
+                                  environ_overrides={'wsgi.input_terminated': True})
+            assert response.status_code == 413, "Streamed part past the declared size accepted"
+            assert client.get(f'/api/uploads/{upload_id}').get_json()['offset'] == 100, "Rejected part kept"
+            client.put(f'/api/uploads/{upload_id}?offset=100', data=content[100:])
+            response = client.post(f'/api/uploads/{upload_id}/complete')
+            assert response.status_code == 200, "Upload not completed"
+            filename = response.get_json()['filename']
+            file_path = app.upload_path(filename)
+            with open(file_path, 'rb') as f:
+                assert f.read() == content, "Reassembled upload differs from original"
+            print("[PASS] Resumable upload in parts")
+
+            stale_id = client.post('/api/uploads', json={'filename': 'stale.csv', 'size': 10}).get_json()['upload_id']
+            stale_path = os.path.join(folder, '.partial', stale_id)
+            old = time.time() - app.app.config['UPLOAD_PARTIAL_TTL'] - 60
+            for path in (stale_path, f"{stale_path}.json"):
+                os.utime(path, (old, old))
+            client.post('/api/uploads', json={'filename': 'fresh.csv', 'size': 10})
+            assert client.get(f'/api/uploads/{stale_id}').status_code == 404, "Stale upload not expired"
+            assert not os.path.exists(stale_path), "Stale upload data left behind"
+            print("[PASS] Parts past the declared size rejected and stale uploads expired")
+
+            profile = app.load_profile(file_path)
+            assert profile is not None and profile.rows == 10, "Profile not built at ingest"
+            assert profile.columns_of_kind('numeric') == ['Sales', 'Profit', 'Employees'], "Numeric columns wrong"
+            assert profile.value_range('Sales') == [23456, 87654], "Numeric range wrong"
+            response = client.get(f'/dashboard/{filename}')
+            assert response.status_code == 200 and b'Employees' in response.data, "Dashboard not rendered"
+            print("[PASS] Column metadata built chunk by chunk")
+
+            expected = app.aggregate_counts(pd.read_csv('test_data.csv'), 'Region', 'Category')
+            streamed = app.aggregate_counts(app.iter_chunks(file_path, 'csv'), 'Region', 'Category')
+            assert streamed.equals(expected), "Chunked counts differ from in-memory counts"
+            response = client.post(f'/api/generate_chart/{filename}', json={
+                'chart_type': 'histogram', 'x_column': 'Sales', 'color_column': 'Region'})
+            assert response.status_code == 200, "Streamed histogram failed"
+            spec = app.chart_spec({'chart_type': 'histogram', 'x_column': 'Sales', 'color_column': 'Region'})
+            figure, _ = app.build_streamed_figure(app.iter_chunks(file_path, 'csv'), spec, profile)
+            total = sum(sum(trace.y) for trace in figure.data)
+            assert total == 10, "Streamed histogram lost rows"
+            print("[PASS] Chart aggregates folded over chunks")
+        finally:
+            app.app.config.update(STREAMING_INGEST_BYTES=64 * 1024 * 1024, CSV_CHUNK_ROWS=250000)
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Streaming ingest test failed: {e}")
+        return False
+
+def test_figure_cache():
+    """Test chart responses are cached and revalidated by ETag"""
+    print("\n=== Test 14: Figure Cache ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            app.figure_cache.clear()
+            client = app.app.test_client()
+            spec = {'chart_type': 'bar', 'x_column': 'Region', 'y_column': 'Sales', 'color_column': ''}
+
+            first = client.post('/api/generate_chart/test_data.csv', json=spec)
+            etag = first.headers.get('ETag')
+            assert first.status_code == 200 and etag, "Chart response has no ETag"
+            assert 'no-cache' in first.headers.get('Cache-Control', ''), "Cache-Control header missing"
+
+            hits_before = app.figure_cache.hits
+            # Same spec with fields in another order and an explicit empty color
+            second = client.get('/api/generate_chart/test_data.csv?y_column=Sales&x_column=Region&chart_type=bar')
+            assert second.headers.get('ETag') == etag, "Equivalent specs produce different ETags"
+            assert second.data == first.data, "Cached response differs"
+            assert app.figure_cache.hits == hits_before + 1, "Figure cache not hit"
+            print("[PASS] Equivalent chart specs share one cached figure")
+
+            response = client.get('/api/generate_chart/test_data.csv?y_column=Sales&x_column=Region&chart_type=bar',
+                                  headers={'If-None-Match': etag})
+            assert response.status_code == 304 and not response.data, "ETag revalidation should return 304"
+            print("[PASS] Matching If-None-Match returns 304")
+
+            with open(os.path.join(folder, 'test_data.csv'), 'a') as f:
+                f.write("\nNorth,1,1,1,Technology")
+            response = client.post('/api/generate_chart/test_data.csv', json=spec)
+            assert response.headers.get('ETag') != etag, "ETag unchanged after upload changed"
+            assert app.figure_cache.stats()['entries'] == 1, "Figures of the old upload not invalidated"
+            print("[PASS] Upload changes invalidate cached figures")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Figure cache test failed: {e}")
+        return False
+
+def test_upload_profile():
+    """Test the profile sidecar drives the dashboard and column validation"""
+    print("\n=== Test 15: Upload Profile ===")
+
+    try:
+        import app
+        import io
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            csv = b"Region,Sales,Day\nNorth,10,2024-01-01\nSouth,,2024-01-02\nNorth,30,2024-01-03"
+            response = client.post('/upload', data={'file': (io.BytesIO(csv), 'profiled.csv')},
+                                   content_type='multipart/form-data')
+            filename = response.location.rsplit('/', 1)[-1]
+            file_path = app.upload_path(filename)
+            assert os.path.exists(app.profile_path(file_path)), "Profile sidecar not written at upload"
+
+            profile = app.load_profile(file_path)
+            sales, region = profile.columns['Sales'], profile.columns['Region']
+            assert profile.rows == 3 and sales['nulls'] == 1, "Row or null counts wrong"
+            assert (sales['min'], sales['max']) == (10.0, 30.0), "Numeric min/max wrong"
+            assert region['distinct'] == 2 and region['distinct_exact'], "Cardinality wrong"
+            print("[PASS] Profile computed once at upload")
+
+            # Concurrent writers each use their own temporary file
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(8) as pool:
+                list(pool.map(lambda _: app.save_profile(file_path, profile), range(32)))
+            assert app.load_profile(file_path).rows == 3, "Profile corrupted by concurrent writers"
+            assert not [name for name in os.listdir(folder) if name.endswith('.tmp')], "Temporary profile left"
+            print("[PASS] Concurrent profile writes do not collide")
+
+            app.dataframe_cache.clear()
+            misses = app.dataframe_cache.misses
+            response = client.get(f'/dashboard/{filename}')
+            assert response.status_code == 200, "Dashboard failed to render"
+            assert app.dataframe_cache.misses == misses, "Dashboard loaded the data"
+            print("[PASS] Dashboard renders from the profile alone")
+
+            response = client.post(f'/api/generate_chart/{filename}', json={
+                'chart_type': 'bar', 'x_column': 'Missing', 'y_column': 'Sales'})
+            assert response.status_code == 400 and 'Missing' in response.get_json()['error'], \
+                "Unknown column not rejected"
+            response = client.post(f'/api/generate_chart/{filename}', json={
+                'chart_type': 'bar', 'x_column': 'Sales', 'y_column': 'Region'})
+            assert response.status_code == 400, "Non-numeric bar value not rejected"
+            assert app.dataframe_cache.misses == misses, "Invalid requests loaded the data"
+            print("[PASS] Invalid columns rejected before loading data")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Upload profile test failed: {e}")
+        return False
+
+def test_batch_charts():
+    """Test a whole dashboard is rendered by one batch request"""
+    print("\n=== Test 16: Batch Chart Endpoint ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            app.figure_cache.clear()
+            misses = app.dataframe_cache.misses
+            client = app.app.test_client()
+            charts = [
+                {'chart_type': 'bar', 'x_column': 'Region', 'y_column': ''},
+                {'chart_type': 'pie', 'x_column': 'Region'},
+                {'chart_type': 'scatter', 'x_column': 'Sales', 'y_column': 'Profit', 'color_column': 'Category'},
+                {'chart_type': 'bar', 'x_column': 'Unknown'},
+            ]
+
+            response = client.post('/api/generate_charts/test_data.csv', json={'charts': charts})
+            results = response.get_json()['charts']
+            assert response.status_code == 200 and len(results) == 4, "Batch response incomplete"
+            assert all('chart' in result for result in results[:3]), "Valid charts missing from batch"
+            assert 'error' in results[3], "Invalid chart not reported in place"
+            assert app.dataframe_cache.misses - misses == 1, "Batch should load the data once"
+            print("[PASS] Batch renders every chart from one load")
+
+            # Count bar and pie share the same value counts
+            memo = {}
+            df = pd.read_csv('test_data.csv')
+            for chart in charts[:2]:
+                app.build_figure(df, app.chart_spec(chart), memo)
+            assert list(memo) == [('counts', 'Region', None)], "Shared groupby computed twice"
+            print("[PASS] Shared groupbys computed once")
+
+            response = client.post('/api/generate_charts/test_data.csv?stream=1', json={'charts': charts})
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert response.mimetype == 'application/x-ndjson', "Stream is not NDJSON"
+            assert sorted(line['index'] for line in lines) == [0, 1, 2, 3], "Streamed charts missing"
+            print("[PASS] Charts streamed as NDJSON")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Batch chart test failed: {e}")
+        return False
+
+def test_figure_serialization():
+    """Test figures are sent as objects with typed arrays and compressed"""
+    print("\n=== Test 17: Figure Serialization ===")
+
+    try:
+        import app
+        import gzip
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            spec = {'chart_type': 'scatter', 'x_column': 'Sales', 'y_column': 'Profit'}
+
+            response = client.post('/api/generate_chart/test_data.csv', json=spec)
+            chart = response.get_json()['chart']
+            assert isinstance(chart, dict), "Figure should not be a JSON-encoded string"
+            assert 'bdata' in chart['data'][0]['x'], "Numeric data not sent as a typed array"
+            print("[PASS] Figure embedded as an object with typed arrays")
+
+            app.app.config['COMPRESS_MIN_BYTES'] = 1
+            try:
+                response = client.post('/api/generate_chart/test_data.csv', json=spec,
+                                       headers={'Accept-Encoding': 'gzip'})
+            finally:
+                app.app.config['COMPRESS_MIN_BYTES'] = 1024
+            assert response.headers.get('Content-Encoding') in ('gzip', 'br'), "Response not compressed"
+            if response.headers['Content-Encoding'] == 'gzip':
+                assert json.loads(gzip.decompress(response.data))['chart'] == chart, "Compressed body differs"
+            assert 'Accept-Encoding' in response.headers.get('Vary', ''), "Vary header missing"
+            print("[PASS] Large responses compressed")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Figure serialization test failed: {e}")
+        return False
+
+def test_production_server():
+    """Test production server settings and first request timing"""
+    print("\n=== Test 18: Production Server ===")
+
+    try:
+        import app
+        import serve
+
+        options = serve.server_options(app.app.config, serve.parse_args([]))
+        assert options['preload_app'], "App must be loaded before forking workers"
+        assert options['workers'] == app.app.config['SERVER_WORKERS'], "Worker count not taken from config"
+        assert options['bind'] == '0.0.0.0:8000', f"Unexpected bind address {options['bind']}"
+
+        options = serve.server_options(app.app.config, serve.parse_args(['--workers', '3', '--threads', '2', '--timeout', '30']))
+        assert (options['workers'], options['threads'], options['timeout']) == (3, 2, 30), "Command line overrides ignored"
+        print("[PASS] Server options built from config and arguments")
+
+        calls = []
+        timer = serve.FirstRequestTimer(lambda environ, start_response: calls.append(environ['PATH_INFO']) or [b''])
+        timer({'PATH_INFO': '/'}, None)
+        first = timer.first_request_ms
+        timer({'PATH_INFO': '/other'}, None)
+        assert calls == ['/', '/other'], "Requests not passed through"
+        assert first is not None and timer.first_request_ms == first, "Only the first request should be timed"
+        print(f"[PASS] First request timed ({first:.2f} ms)")
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Production server test failed: {e}")
+        return False
+
+def test_benchmark_suite():
+    """Test the benchmark harness on a tiny dataset"""
+    print("\n=== Test 19: Benchmark Suite ===")
+
+    try:
+        import benchmark
+
+        assert [benchmark.parse_size(s) for s in ('500', '10k', '1m')] == [500, 10000, 1000000], "Size parsing failed"
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(work_dir, 'results.json')
+            status = benchmark.main(['--sizes', '200', '--formats', 'csv', '--repeat', '2',
+                                     '--data-dir', work_dir, '--output', output])
+            assert status == 0, "Benchmark run failed"
+            with open(output) as f:
+                results = json.load(f)
+
+            cases = results['datasets'][0]['cases']
+            for name in benchmark.CHART_SPECS:
+                assert 'error' not in cases[f'chart_{name}'], f"Chart {name} failed: {cases[f'chart_{name}']}"
+                assert cases[f'chart_{name}']['response_bytes'] > 0, f"No response size for {name}"
+            assert cases['load_data']['runs'] == 2 and 'p99_ms' in cases['load_data'], "Percentiles missing"
+            assert results['datasets'][0]['parse_speedup'] > 0, "Parse speedup not reported"
+            assert benchmark.compare(results, results, 0.2) == [], "Run should not regress against itself"
+            print(f"[PASS] Benchmarked {len(cases)} cases and compared results")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Benchmark suite test failed: {e}")
+        return False
+
+def test_request_metrics():
+    """Test Server-Timing headers, /metrics and slow request profiles"""
+    print("\n=== Test 20: Request Metrics ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        profile_folder = tempfile.mkdtemp()
+        try:
+            client = app.app.test_client()
+            app.figure_cache.clear()
+            before = app.chart_seconds.count('histogram', 'csv')
+
+            response = client.post('/api/generate_chart/test_data.csv',
+                                   json={'chart_type': 'histogram', 'x_column': 'Sales'})
+            stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+            for stage in ('load', 'build', 'layout', 'serialize', 'total'):
+                assert stage in stages, f"Stage {stage} missing from Server-Timing: {stages}"
+            print("[PASS] Server-Timing reports each stage")
+
+            metrics = client.get('/metrics').get_data(as_text=True)
+            assert app.chart_seconds.count('histogram', 'csv') == before + 1, "Chart request not recorded"
+            assert 'dataviz_chart_request_seconds_bucket{chart_type="histogram",file_format="csv",le="+Inf"}' in metrics, \
+                "Chart histogram missing from /metrics"
+            assert 'dataviz_stage_seconds_count{stage="serialize",chart_type="histogram",file_format="csv"}' in metrics, \
+                "Stage histogram missing from /metrics"
+            assert 'dataviz_cache_hits_total{cache="figures"}' in metrics, "Cache counters missing from /metrics"
+            print("[PASS] /metrics exposes histograms and cache counters")
+
+            app.app.config.update(PROFILE_SLOW_REQUESTS_MS=0, PROFILE_FOLDER=profile_folder, PROFILE_KEEP=2)
+            for _ in range(3):
+                client.get('/api/cache_stats')
+            profiles = os.listdir(profile_folder)
+            assert len(profiles) == 2 and all(p.endswith('.prof') for p in profiles), f"Unexpected profiles: {profiles}"
+            print("[PASS] Slow request profiles saved and pruned")
+        finally:
+            app.app.config.update(PROFILE_SLOW_REQUESTS_MS=None, PROFILE_FOLDER='profiles', PROFILE_KEEP=20)
+            shutil.rmtree(profile_folder, ignore_errors=True)
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Request metrics test failed: {e}")
+        return False
+
+def test_chart_jobs():
+    """Test charts built as background jobs"""
+    print("\n=== Test 21: Chart Jobs ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            app.figure_cache.clear()
+            spec = {'chart_type': 'bar', 'x_column': 'Region', 'y_column': 'Sales'}
+
+            first = client.post('/api/jobs/test_data.csv', json=spec)
+            second = client.post('/api/jobs/test_data.csv', json=spec)
+            assert first.status_code == 202, f"Expected 202, got {first.status_code}"
+            job_id = first.get_json()['job_id']
+            assert second.get_json()['job_id'] == job_id, "Concurrent requests for a chart should share a job"
+            print("[PASS] Job started and deduplicated")
+
+            events = client.get(f'/api/jobs/{job_id}/events').get_data(as_text=True)
+            assert 'event: done' in events, f"No done event in: {events[:200]}"
+            result = client.get(f'/api/jobs/{job_id}').get_json()
+            assert result['status'] == 'done' and 'data' in result['result']['chart'], "Job result missing"
+            again = client.post('/api/jobs/test_data.csv', json=spec)
+            assert again.status_code == 200 and again.get_json()['status'] == 'done', "Finished chart not reused"
+            print("[PASS] Job result delivered by events, polling and the figure cache")
+
+            app.app.config['CATEGORY_MAX_RATIO'] = 0.25
+            try:
+                config = app.job_config()
+            finally:
+                app.app.config['CATEGORY_MAX_RATIO'] = 0.5
+            assert config['CATEGORY_MAX_RATIO'] == 0.25, "Changed setting not copied to job workers"
+            missing = [key for key in ('CHART_MAX_POINTS', 'CSV_BLOCK_BYTES', 'PARALLEL_INGEST', 'ZOOM_PYRAMID_FACTOR')
+                       if key not in config]
+            assert not missing, f"Settings not copied to job workers: {missing}"
+            print("[PASS] Job workers use the settings of the submitting app")
+
+            cancel_path = os.path.join(folder, 'job.cancel')
+            open(cancel_path, 'w').close()
+            try:
+                app.run_chart_job(os.path.join(folder, 'test_data.csv'), 'csv', app.chart_spec(spec), {}, cancel_path)
+                assert False, "Cancelled job kept running"
+            except app.JobCancelled:
+                pass
+
+            pie = {'chart_type': 'pie', 'x_column': 'Category'}
+            job_id = client.post('/api/jobs/test_data.csv', json=pie).get_json()['job_id']
+            client.post('/api/jobs/test_data.csv', json=pie)
+            status = client.delete(f'/api/jobs/{job_id}').get_json()['status']
+            assert status != 'cancelled', "Job cancelled while another client still waits for it"
+            client.delete(f'/api/jobs/{job_id}')
+            client.get(f'/api/jobs/{job_id}/events').get_data()
+            status = client.get(f'/api/jobs/{job_id}').get_json()['status']
+            assert status in ('cancelled', 'done'), f"Unexpected status after cancelling: {status}"
+            print(f"[PASS] Jobs cancelled once no client waits for them ({status})")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Chart jobs test failed: {e}")
+        return False
+
+def test_import_time():
+    """Test importing the app does not load pandas or plotly"""
+    print("\n=== Test 22: Import Time ===")
+
+    try:
+        import subprocess
+
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert result.returncode == 0, f"Import failed: {result.stderr[-500:]}"
+
+        # Lines look like "import time:  self [us] | cumulative | module"
+        imports = {}
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if line.startswith('import time:') and fields[1].strip().isdigit():
+                imports[fields[2].strip()] = int(fields[1])
+        for heavy in ('pandas', 'plotly', 'numpy'):
+            assert heavy not in imports, f"{heavy} imported at startup"
+
+        seconds = imports['app'] / 1e6
+        assert seconds < 1.0, f"Importing app took {seconds:.2f}s"
+        print(f"[PASS] App imports in {seconds:.2f}s without pandas, numpy or plotly")
+
+        import app
+        app.warm_imports()
+        assert 'pandas' in sys.modules and 'plotly.express' in sys.modules, "warm_imports did not load libraries"
+        print("[PASS] Libraries loaded by warm_imports")
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Import time test failed: {e}")
+        return False
+
+def test_projected_loading():
+    """Test chart requests parse only their columns with compact dtypes"""
+    print("\n=== Test 23: Projected Loading ===")
+
+    try:
+        import app
+        import numpy as np
+
+        folder = tempfile.mkdtemp()
+        try:
+            rows = 2000
+            wide = pd.DataFrame({f'Metric{i}': np.arange(rows) * i for i in range(30)})
+            wide['Region'] = np.resize(['North', 'South', 'East', 'West'], rows)
+            wide['Label'] = [f'row {i}' for i in range(rows)]
+            file_path = os.path.join(folder, 'wide.csv')
+            wide.to_csv(file_path, index=False)
+
+            full = pd.read_csv(file_path)
+            df = app.load_data(file_path, 'csv', ['Region', 'Metric1'])
+            assert list(df.columns) == ['Region', 'Metric1'], f"Unexpected columns {list(df.columns)}"
+            assert isinstance(df['Region'].dtype, pd.CategoricalDtype), "Low-cardinality strings not categorical"
+            assert df['Metric1'].dtype == np.int16, f"Integers not downcast: {df['Metric1'].dtype}"
+            assert (df['Metric1'].to_numpy() == full['Metric1'].to_numpy()).all(), "Downcast changed values"
+            saved = full.memory_usage(deep=True).sum() / df.memory_usage(deep=True).sum()
+            print(f"[PASS] Two of {full.shape[1]} columns loaded with compact dtypes ({saved:.0f}x less memory)")
+
+            df = app.load_data(file_path, 'csv')
+            assert not isinstance(df['Label'].dtype, pd.CategoricalDtype), "Unique strings should stay strings"
+
+            app.convert_to_columnar(file_path, 'csv')
+            df = app.load_data(file_path, 'csv', ['Region', 'Metric1'])
+            assert isinstance(df['Region'].dtype, pd.CategoricalDtype) and df['Metric1'].dtype == np.int16, \
+                "Columnar copy not stored with compact dtypes"
+            print("[PASS] Columnar copy stores compact dtypes")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Projected loading test failed: {e}")
+        return False
+
+def test_columnar_store():
+    """Test memory-mapped columnar reads and eviction of cold uploads"""
+    print("\n=== Test 24: Columnar Store ===")
+
+    try:
+        import app
+        import time
+
+        folder = temp_upload_folder(app)
+        try:
+            file_path = os.path.join(folder, 'test_data.csv')
+            app.ingest_upload(file_path, 'csv')
+            df = app.load_cached_data(file_path, 'csv', ['Sales', 'Region'])
+            sales = df['Sales'].to_numpy()
+            assert not sales.flags.owndata, "Numeric column copied out of the memory map"
+            assert app.load_cached_data(file_path, 'csv') is not app.load_cached_data(file_path, 'csv'), \
+                "Mapped frames should not be held in the per-process cache"
+            print("[PASS] Columns read zero-copy from the memory-mapped copy")
+
+            app.app.config['DATASET_IDLE_SECONDS'] = 0
+            try:
+                time.sleep(0.01)
+                evicted = app.evict_cold_datasets()
+            finally:
+                app.app.config['DATASET_IDLE_SECONDS'] = 7 * 24 * 3600
+            assert evicted == [file_path], f"Unexpected evictions: {evicted}"
+            assert not os.path.exists(app.columnar_path(file_path)), "Columnar copy not removed"
+
+            df = app.load_cached_data(file_path, 'csv', ['Sales'])
+            assert len(df) == 10, "Evicted dataset not readable"
+            assert app.has_fresh_columnar(file_path), "Columnar copy not rebuilt on read"
+            assert not os.path.exists(app.evicted_marker_path(file_path)), "Eviction marker left behind"
+            assert app.evict_cold_datasets() == [], "Recently read copy evicted"
+            print("[PASS] Cold copies evicted and rebuilt on next read")
+
+            # Rows written by another process leave the copy older than the upload
+            with open(file_path, 'ab') as f:
+                f.write(b"\nWest,30000,1000,50,Office")
+            stat = os.stat(file_path)
+            os.utime(app.columnar_path(file_path), ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+            df = app.load_cached_data(file_path, 'csv', ['Sales'])
+            assert len(df) == 11, "Stale columnar copy read"
+            assert app.has_fresh_columnar(file_path), "Stale columnar copy not rebuilt"
+            print("[PASS] Copies made stale by an external writer rebuilt on next read")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Columnar store test failed: {e}")
+        return False
+
+def test_incremental_append():
+    """Test appending rows with incremental profile and aggregate updates"""
+    print("\n=== Test 25: Incremental Append ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            file_path = os.path.join(folder, 'test_data.csv')
+            app.ingest_upload(file_path, 'csv')
+            client = app.app.test_client()
+            specs = [{'chart_type': 'bar', 'x_column': 'Region'},
+                     {'chart_type': 'bar', 'x_column': 'Region', 'y_column': 'Sales'},
+                     {'chart_type': 'histogram', 'x_column': 'Sales'}]
+            for spec in specs:
+                client.post('/api/generate_chart/test_data.csv', json=spec)
+
+            rows = [{'Region': 'North', 'Sales': 30000, 'Profit': 1000, 'Employees': 50, 'Category': 'Office'},
+                    {'Region': 'Mars', 'Sales': 40000, 'Profit': 2000, 'Employees': 60, 'Category': 'Office'}]
+            response = client.post('/api/append/test_data.csv', json={'rows': rows})
+            result = response.get_json()
+            assert response.status_code == 200, result
+            assert result['rows'] == 12 and result['aggregates_updated'] == 3, result
+            assert app.parse_file(file_path, 'csv')['Region'].tolist()[-2:] == ['North', 'Mars'], \
+                "Rows not appended to the CSV"
+            assert len(app.read_columnar(file_path)) == 12, "Rows not appended to the columnar copy"
+            print("[PASS] Rows appended to the file, columnar copy and profile")
+
+            # Charts must come from the updated aggregates without loading the data
+            load_cached_data = app.load_cached_data
+            app.load_cached_data = None
+            try:
+                incremental = [client.post('/api/generate_chart/test_data.csv', json=spec).get_json()
+                               for spec in specs]
+            finally:
+                app.load_cached_data = load_cached_data
+            app.aggregate_cache.clear()
+            app.figure_cache.clear()
+            for spec, chart in zip(specs, incremental):
+                full = client.post('/api/generate_chart/test_data.csv', json=spec).get_json()
+                assert chart['chart']['data'] == full['chart']['data'], f"Stale {spec} chart after append"
+            print("[PASS] Charts updated from merged aggregates match a full rebuild")
+
+            # Another worker holding the lock file delays the append until it lets go
+            import fcntl
+            import threading
+            with open(os.path.join(folder, '.append.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                appender = threading.Thread(target=client.post, args=('/api/append/test_data.csv',),
+                                            kwargs={'json': {'rows': rows[:1]}})
+                appender.start()
+                appender.join(0.3)
+                assert appender.is_alive(), "Append did not wait for the lock held by another worker"
+                assert len(app.parse_file(file_path, 'csv')) == 12, "Rows appended while the lock was held"
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            appender.join(10)
+            assert app.get_profile(file_path, 'csv').rows == 13, "Append lost after the lock was released"
+            print("[PASS] Appends serialized across workers by the lock file")
+
+            response = client.post('/api/append/test_data.csv', json={'rows': [{'Region': 'East'}]})
+            assert response.status_code == 400, "Rows with missing columns accepted"
+            print("[PASS] Rows not matching the dataset's columns rejected")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Incremental append test failed: {e}")
+        return False
+
+def test_live_updates():
+    """Test live dashboard updates pushed as deltas"""
+    print("\n=== Test 26: Live Updates ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        app.app.config['LIVE_POLL_SECONDS'] = 0
+        try:
+            file_path = os.path.join(folder, 'test_data.csv')
+            app.ingest_upload(file_path, 'csv')
+            client = app.app.test_client()
+            specs = [{'chart_type': 'line', 'x_column': 'Sales', 'y_column': 'Profit', 'color_column': 'Region'},
+                     {'chart_type': 'pie', 'x_column': 'Region'}]
+
+            response = client.get('/api/live/test_data.csv', query_string={'charts': json.dumps(specs)})
+            assert response.status_code == 400, "Charts without a row count accepted"
+
+            events = app.live_updates('test_data.csv', 'csv', [(app.chart_spec(spec), 10) for spec in specs])
+            assert 'data: {"rows": 10}' in next(events), "Missing dataset event"
+            rows = [{'Region': 'West', 'Sales': 30000, 'Profit': 1000, 'Employees': 50, 'Category': 'Office'}]
+            client.post('/api/append/test_data.csv', json={'rows': rows})
+            assert 'data: {"rows": 11}' in next(events), "Append not detected"
+
+            line = json.loads(next(events).split('data: ', 1)[1])
+            assert line['index'] == 0 and line['update']['type'] == 'extend', line
+            assert line['update']['traces'] == [{'name': 'West', 'x': [30000], 'y': [1000]}], \
+                "Line chart update should hold only the new point"
+            print("[PASS] New rows pushed as points to append to the line chart")
+
+            pie = json.loads(next(events).split('data: ', 1)[1])
+            assert pie['update']['type'] == 'react' and set(pie['update']) == {'type', 'data', 'reduction'}, \
+                "Aggregate update should hold only trace data"
+            assert pie['update']['reduction']['input_points'] == 11
+            print("[PASS] Updated aggregates pushed without the chart layout")
+
+            query = {'charts': json.dumps([{'chart_type': 'pie', 'x_column': 'Region', 'rows': 11}])}
+            streams = [client.get('/api/live/test_data.csv', query_string=query, buffered=False)
+                       for _ in range(app.app.config['LIVE_MAX_STREAMS'] + 1)]
+            try:
+                assert [r.status_code for r in streams[:-1]] == [200] * (len(streams) - 1), "Live stream refused"
+                assert streams[-1].status_code == 503 and streams[-1].headers['Retry-After'], "Stream cap not enforced"
+                streams[0].close()
+                reopened = client.get('/api/live/test_data.csv', query_string=query, buffered=False)
+                assert reopened.status_code == 200, "Closed stream did not free its slot"
+                streams[0] = reopened
+            finally:
+                for stream in streams:
+                    stream.close()
+            print("[PASS] Concurrent live streams capped at LIVE_MAX_STREAMS")
+        finally:
+            app.app.config['LIVE_POLL_SECONDS'] = 2
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Live updates test failed: {e}")
+        return False
+
+def test_parallel_ingest():
+    """Test the pyarrow CSV reader against pd.read_csv"""
+    print("\n=== Test 27: Parallel Ingest ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            file_path = os.path.join(folder, 'dates.csv')
+            rows = ['Date,Region,Sales,Units'] + [f"2024-01-{day:02d},{'North' if day % 2 else ''},{day * 1.5},{day}"
+                                                  for day in range(1, 29)]
+            with open(file_path, 'w') as f:
+                f.write('\n'.join(rows) + '\n')
+
+            expected = pd.read_csv(file_path)
+            parsed = app.parse_file(file_path, 'csv')
+            pd.testing.assert_frame_equal(parsed, expected)
+            pd.testing.assert_frame_equal(app.parse_file(file_path, 'csv', ['Units', 'Date']), expected[['Units', 'Date']])
+            print("[PASS] pyarrow reader gives the same frame as pd.read_csv, dates kept as text")
+
+            # Integers in the first block and decimals further down fail the pyarrow reader
+            with open(file_path, 'a') as f:
+                f.write('\n'.join(f"2024-02-01,South,{i},{i}" for i in range(1000)) + '\n')
+                f.write('\n'.join(f"2024-03-01,South,{i},{i + 0.5}" for i in range(1000)) + '\n')
+            app.app.config['CSV_BLOCK_BYTES'] = 4096
+            app.app.config['STREAMING_INGEST_BYTES'] = 0
+            try:
+                assert app.parse_file(file_path, 'csv')['Units'].dtype == 'float64', "No fallback to pandas"
+                assert app.ingest_csv_arrow(file_path) is None, "Mixed-type blocks should use the pandas route"
+                app.ingest_upload(file_path, 'csv')
+                assert app.load_profile(file_path).rows == 2028, "Fallback ingest lost rows"
+            finally:
+                app.app.config['CSV_BLOCK_BYTES'] = 16 * 1024 * 1024
+                app.app.config['STREAMING_INGEST_BYTES'] = 64 * 1024 * 1024
+            print("[PASS] Files with types changing between blocks fall back to pandas")
+
+            # Quoted values spanning lines, cut at block boundaries by the default chunker
+            notes_path = os.path.join(folder, 'notes.csv')
+            with open(notes_path, 'w') as f:
+                f.write('Name,Note,Value\n' + ''.join(f'R{i},"line {i}\nnext {i}",{i}\n' for i in range(2000)))
+            app.app.config['CSV_BLOCK_BYTES'] = 4096
+            try:
+                pd.testing.assert_frame_equal(app.parse_file(notes_path, 'csv'), pd.read_csv(notes_path))
+                profile = app.ingest_csv_arrow(notes_path)
+            finally:
+                app.app.config['CSV_BLOCK_BYTES'] = 16 * 1024 * 1024
+            assert profile is not None and profile.rows == 2000, "Quoted newlines not read by pyarrow"
+            assert len(app.read_columnar(notes_path)) == 2000, "Columnar copy lost rows"
+            print("[PASS] Quoted newlines across blocks read by pyarrow with newlines_in_values")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Parallel ingest test failed: {e}")
+        return False
+
+def test_chart_filters():
+    """Test filters and time windows evaluated before charting"""
+    print("\n=== Test 28: Chart Filters ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            spec = {'chart_type': 'bar', 'x_column': 'Category', 'y_column': 'Sales',
+                    'filters': [{'column': 'Region', 'op': 'in', 'value': ['North', 'South']},
+                                {'column': 'Profit', 'op': '>', 'value': 3500}]}
+            result = client.post('/api/generate_chart/test_data.csv', json=spec).get_json()
+            df = pd.read_csv('test_data.csv')
+            expected = df[df['Region'].isin(['North', 'South']) & (df['Profit'] > 3500)]
+            assert result['reduction']['input_points'] == len(expected), result['reduction']
+            assert result['reduction']['filtered_from'] == len(df), "Dataset size not reported"
+            bars = result['chart']['data'][0]
+            sums = np.frombuffer(base64.b64decode(bars['y']['bdata']), dtype=bars['y']['dtype'])
+            assert dict(zip(bars['x'], sums.tolist())) == expected.groupby('Category')['Sales'].sum().to_dict(), \
+                "Filtered sums differ from pandas"
+            print(f"[PASS] Chart built from the {len(expected)} of {len(df)} rows matching its filters")
+
+            response = client.post('/api/generate_chart/test_data.csv', json={
+                'chart_type': 'pie', 'x_column': 'Region', 'filters': [{'column': 'Sales', 'op': '>', 'value': 'many'}]})
+            assert response.status_code == 400, "Non-numeric value for a numeric column accepted"
+
+            # A time window over sorted dates only reads the record batches that overlap it
+            file_path = os.path.join(folder, 'daily.csv')
+            daily = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=3000, freq='h').astype(str),
+                                  'Sales': range(3000)})
+            daily.to_csv(file_path, index=False)
+            daily.to_feather(app.columnar_path(file_path), chunksize=500)
+            spec = app.chart_spec({'chart_type': 'line', 'x_column': 'Date', 'y_column': 'Sales',
+                                   'time_window': {'column': 'Date', 'start': '2024-01-10', 'end': '2024-01-12'}})
+            chunks = list(app.iter_chunks(file_path, 'csv', ['Date', 'Sales'], spec['filters']))
+            assert len(chunks) == 1 and len(chunks[0]) == 48, [len(chunk) for chunk in chunks]
+            assert chunks[0]['Date'].iloc[0] == '2024-01-10 00:00:00', "Time window start not inclusive"
+            print("[PASS] Time window read 1 of 6 record batches through their zone maps")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Chart filters test failed: {e}")
+        return False
+
+def test_zoom_pyramid():
+    """Test zoomed views of line and scatter charts served from the zoom pyramid"""
+    print("\n=== Test 29: Zoom Pyramid ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            rows = 200000
+            series = pd.DataFrame({'Step': np.arange(rows), 'Value': np.sin(np.arange(rows) / 500.0),
+                                   'Time': pd.date_range('2024-01-01', periods=rows, freq='min').astype(str)})
+            series.loc[123456, 'Value'] = 99.0
+            series.to_csv(os.path.join(folder, 'series.csv'), index=False)
+            client = app.app.test_client()
+
+            def zoom(query):
+                response = client.get('/api/zoom/series.csv?chart_type=line&y_column=Value&max_points=500&' + query)
+                result = response.get_json()
+                return response.status_code, result
+
+            def values(trace, axis):
+                data = trace[axis]
+                if isinstance(data, dict):
+                    return np.frombuffer(base64.b64decode(data['bdata']), dtype=data['dtype'])
+                return np.asarray(data)
+
+            status, overview = zoom('x_column=Step')
+            assert status == 200, overview
+            reduction = overview['reduction']
+            assert reduction['input_points'] == rows and reduction['output_points'] <= 500, reduction
+            assert reduction['level'] > 0, "Whole series served from the raw rows"
+            assert values(overview['data'][0], 'y').max() == 99.0, "Peak lost in the coarsest level"
+
+            status, detail = zoom('x_column=Step&x_start=123300&x_end=123700')
+            steps = values(detail['data'][0], 'x')
+            assert detail['reduction']['level'] == 0 and detail['reduction']['input_points'] == 401, detail['reduction']
+            assert steps.min() == 123299 and steps.max() == 123701, "View does not run to the edges of the range"
+            print(f"[PASS] {rows} rows zoomed at levels {reduction['level']} and 0 within 500 points, keeping the peak")
+
+            status, dated = zoom('x_column=Time&x_start=2024-03-01 00:00&x_end=2024-03-01 05:59')
+            assert status == 200 and dated['reduction']['input_points'] == 360, dated
+
+            scatter = client.get('/api/zoom/series.csv?chart_type=scatter&x_column=Step&y_column=Value'
+                                 '&max_points=500&y_start=0.5&y_end=1').get_json()
+            points = values(scatter['data'][0], 'y')
+            assert 0 < len(points) <= 500 and points.min() >= 0.5 and points.max() <= 1, scatter['reduction']
+            assert app.zoom_cache.stats()['entries'] == 3, app.zoom_cache.stats()
+
+            status, _ = zoom('x_column=Step&x_start=soon')
+            assert status == 400, "Invalid range bound accepted"
+            response = client.get('/api/zoom/series.csv?chart_type=bar&x_column=Step')
+            assert response.status_code == 400, "Bar chart zoom accepted"
+            print("[PASS] Date and scatter ranges served at the point budget, invalid ranges rejected")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Zoom pyramid test failed: {e}")
+        return False
+
+def test_column_sketches():
+    """Test distinct-count and top values sketches kept in the profile"""
+    print("\n=== Test 30: Column Sketches ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            rng = np.random.default_rng(0)
+            rows = 100000
+            visits = pd.DataFrame({'Visitor': [f"v{i}" for i in rng.zipf(1.4, rows)],
+                                   'Session': [f"s{i}" for i in range(rows)]})
+            file_path = os.path.join(folder, 'visits.csv')
+            visits.to_csv(file_path, index=False)
+            profile = app.DatasetProfile()
+            for start in range(0, rows, 25000):
+                profile.update(visits.iloc[start:start + 25000])
+
+            for name in ('Visitor', 'Session'):
+                column, exact = profile.columns[name], visits[name].nunique()
+                assert not column['distinct_exact'] and abs(column['distinct'] - exact) < 0.05 * exact, \
+                    (name, column['distinct'], exact)
+            counts = visits['Visitor'].value_counts()
+            top = profile.columns['Visitor']['top']
+            assert all(top[value] == count for value, count in counts.iloc[:20].items()), "Top counts wrong"
+            print("[PASS] Distinct counts within 5% and exact top counts from sketches")
+
+            app.save_profile(file_path, profile)
+            client = app.app.test_client()
+            app.dataframe_cache.clear()
+            misses = app.dataframe_cache.misses
+            result = client.post('/api/generate_chart/visits.csv', json={'chart_type': 'bar', 'x_column': 'Visitor'}).get_json()
+            bars = result['chart']['data'][0]
+            assert result['reduction']['method'] == 'top_values', result['reduction']
+            order = result['chart']['layout']['xaxis']['categoryarray']
+            assert len(bars['x']) == app.app.config['CHART_MAX_CATEGORIES'] + 1 and order[-1] == 'Other', order[-3:]
+            assert app.dataframe_cache.misses == misses, "Top values chart loaded the data"
+            assert '~' in client.get('/dashboard/visits.csv').get_data(as_text=True), "Estimated cardinality not shown"
+            print("[PASS] Count chart of a high-cardinality column drawn from its sketch with Other")
+
+            nested = [{'Value': i, 'Details': {'x': i}, 'Tags': [i, i + 1]} for i in range(50)]
+            with open(os.path.join(folder, 'nested.json'), 'w') as f:
+                json.dump(nested, f)
+            app.ingest_upload(os.path.join(folder, 'nested.json'), 'json')
+            assert client.get('/dashboard/nested.json').status_code == 200, "Dashboard of nested JSON failed"
+            response = client.post('/api/generate_chart/nested.json', json={'chart_type': 'histogram', 'x_column': 'Value'})
+            assert response.status_code == 200, response.get_json()
+            assert app.get_profile(os.path.join(folder, 'nested.json'), 'json').columns['Details']['distinct'] == 50
+            print("[PASS] Columns of nested JSON objects sketched by their text")
+
+            hours = pd.date_range('2024-01-01', periods=300, freq='h').strftime('%Y-%m-%d %H:%M:%S')
+            pd.DataFrame({'Time': hours, 'Value': range(300)}).to_csv(os.path.join(folder, 'hourly.csv'), index=False)
+            result = client.post('/api/generate_chart/hourly.csv', json={'chart_type': 'histogram', 'x_column': 'Time'}).get_json()
+            assert result['reduction']['method'] == 'aggregate', result['reduction']
+            bins = result['chart']['data'][0]['x']
+            assert 'Other' not in bins and len(bins) < 50 and str(bins[0]).startswith('2024-01-01'), bins[:3]
+            print("[PASS] Histogram of dates kept as text binned by date, not by top values")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Column sketches test failed: {e}")
+        return False
+
+def test_upload_dedup():
+    """Test that identical uploads share one content-addressed dataset"""
+    print("\n=== Test 31: Upload Deduplication ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            client = app.app.test_client()
+            with open('test_data.csv', 'rb') as f:
+                content = f.read()
+            names = []
+            for name in ('first.csv', 'second.csv'):
+                response = client.post('/upload', data={'file': (io.BytesIO(content), name)},
+                                       content_type='multipart/form-data')
+                names.append(response.location.rsplit('/', 1)[-1])
+
+            paths = {app.upload_path(name) for name in names}
+            digest = hashlib.sha256(content).hexdigest()
+            assert paths == {os.path.join(folder, f"{digest}.csv")}, paths
+            stored = [f for f in os.listdir(folder) if f.endswith('.csv') and f != 'test_data.csv']
+            assert stored == [f"{digest}.csv"], stored
+            print("[PASS] Identical uploads stored once under their content hash")
+
+            spec = {'chart_type': 'pie', 'x_column': 'Region'}
+            client.post(f'/api/generate_chart/{names[0]}', json=spec)
+            hits = app.figure_cache.hits
+            assert client.post(f'/api/generate_chart/{names[1]}', json=spec).status_code == 200
+            assert app.figure_cache.hits == hits + 1, "Second alias did not reuse the cached chart"
+            print("[PASS] Aliases of the same content share cached charts")
+
+            row = {'Region': 'West', 'Sales': 1, 'Profit': 1, 'Employees': 1, 'Category': 'Office'}
+            result = client.post(f'/api/append/{names[0]}', json={'rows': [row]}).get_json()
+            assert result['rows'] == 11, result
+            assert app.upload_path(names[0]) != app.upload_path(names[1]), "Append did not detach the alias"
+            assert len(app.load_data(app.upload_path(names[1]), 'csv')) == 10, "Append changed the shared dataset"
+            print("[PASS] Appending to one alias leaves the other untouched")
+
+            # Names that are not stored uploads, such as directories, are not found
+            os.makedirs(os.path.join(folder, '.aliases', 'nested.csv'))
+            for name in ('..', '.aliases', 'nested.csv', '.append.lock'):
+                assert client.post(f'/api/generate_chart/{name}', json=spec).status_code == 404, name
+                assert client.post(f'/api/append/{name}', json={'rows': [row]}).status_code == 404, name
+            assert app.read_alias('nested.csv') is None
+            print("[PASS] Directory and hidden names rejected as not found")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Upload deduplication test failed: {e}")
+        return False
+
+def test_time_resampling():
+    """Test line charts of date columns resampled into time buckets"""
+    print("\n=== Test 32: Time Series Resampling ===")
+
+    try:
+        import app
+
+        folder = temp_upload_folder(app)
+        try:
+            rows = 50000
+            rng = np.random.default_rng(0)
+            times = pd.date_range('2024-01-01', periods=rows, freq='s')
+            readings = pd.DataFrame({'Time': times.strftime('%Y-%m-%d %H:%M:%S'),
+                                     'Host': rng.choice(['a', 'b'], rows), 'Load': rng.random(rows)})
+            readings.to_csv(os.path.join(folder, 'readings.csv'), index=False)
+            client = app.app.test_client()
+            spec = {'chart_type': 'line', 'x_column': 'Time', 'y_column': 'Load', 'color_column': 'Host'}
+
+            result = client.post('/api/generate_chart/readings.csv', json=dict(spec, resample='1h', aggregation='max')).get_json()
+            reduction = result['reduction']
+            assert reduction['method'] == 'resample' and reduction['bucket'] == '1h', reduction
+            expected = readings.assign(Time=times).groupby(['Host', pd.Grouper(key='Time', freq='1h')])['Load'].max()
+            assert reduction['output_points'] == len(expected), reduction
+            trace = result['chart']['data'][0]
+            values = trace['y'] if isinstance(trace['y'], list) else np.frombuffer(
+                base64.b64decode(trace['y']['bdata']), dtype=trace['y']['dtype'])
+            assert np.allclose(values, expected[trace['name']].to_numpy()), "Bucket maxima differ from pandas"
+            print("[PASS] Per-second series resampled to hourly maxima per color group")
+
+            reduction = client.post('/api/generate_chart/readings.csv',
+                                    json=dict(spec, resample='auto', max_points=200)).get_json()['reduction']
+            assert reduction['aggregation'] == 'mean' and reduction['output_points'] <= 200, reduction
+            print(f"[PASS] Automatic bucket of {reduction['bucket']} keeps {reduction['output_points']} points within the budget")
+
+            response = client.post('/api/generate_chart/readings.csv', json=dict(spec, x_column='Host', resample='auto'))
+            assert response.status_code == 400, "Resampling a column without dates was accepted"
+            response = client.post('/api/generate_chart/readings.csv', json=dict(spec, resample='auto', aggregation='median'))
+            assert response.status_code == 400, "Unknown aggregation was accepted"
+            assert not app.can_extend_chart(app.chart_spec(dict(spec, resample='1h')), 10, 20), \
+                "Resampled chart would get raw points appended"
+            print("[PASS] Invalid resample requests rejected")
+        finally:
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Time series resampling test failed: {e}")
+        return False
+
+def test_admission_control():
+    """Test that chart requests wait for memory and are refused with 429 when it stays taken"""
+    print("\n=== Test 33: Admission Control ===")
+
+    try:
+        import app
+        import threading
+        import time
+
+        folder = temp_upload_folder(app)
+        admission = app.admission
+        saved = (admission.capacity, admission.max_waiting, app.app.config['ADMISSION_WAIT_SECONDS'])
+        try:
+            client = app.app.test_client()
+            file_path = app.upload_path('test_data.csv')
+            profile = app.get_profile(file_path, 'csv')
+            spec = app.chart_spec({'chart_type': 'line', 'x_column': 'Sales', 'y_column': 'Profit'})
+            cost = app.chart_memory_estimate(file_path, 'csv', [spec], profile)
+            assert cost == 10 * 16, f"Unexpected estimate {cost} for two numeric columns of 10 rows"
+            print("[PASS] Memory estimated from the profile of the columns a chart loads")
+
+            url = '/api/generate_chart/test_data.csv?chart_type=line&x_column=Sales&y_column=Profit'
+            admission.capacity, admission.max_waiting = cost, 1
+            app.app.config['ADMISSION_WAIT_SECONDS'] = 0.2
+            assert admission.acquire(cost, 0), "Could not take the whole budget"
+            try:
+                response = client.get(url)
+                assert response.status_code == 429 and response.headers['Retry-After'] == '1', response.status_code
+
+                results = []
+                app.app.config['ADMISSION_WAIT_SECONDS'] = 5
+                waiter = threading.Thread(target=lambda: results.append(client.get(url).status_code))
+                waiter.start()
+                deadline = time.time() + 5
+                while admission.stats()['waiting'] == 0 and time.time() < deadline:
+                    time.sleep(0.01)
+                assert 'dataviz_admission_queue_depth 1' in client.get('/metrics').get_data(as_text=True)
+                started = time.perf_counter()
+                assert client.get(url).status_code == 429, "Request beyond the queue length was queued"
+                assert time.perf_counter() - started < 1, "Full queue did not refuse at once"
+            finally:
+                admission.release(cost)
+            waiter.join(5)
+            assert results == [200], results
+            stats = admission.stats()
+            assert stats['in_use'] == 0 and stats['rejected']['queue_full'] >= 1 and stats['rejected']['timeout'] >= 1, stats
+            print("[PASS] Requests queue for memory, time out or overflow the queue with 429 and Retry-After")
+
+            # Live updates wait for memory however long the queue is, rather than being refused
+            admission.max_waiting = 0
+            assert admission.acquire(cost, 0), "Could not take the whole budget"
+            updates = []
+            updater = threading.Thread(target=lambda: updates.append(
+                app.chart_update(file_path, 'csv', spec, 5, profile)))
+            try:
+                updater.start()
+                deadline = time.time() + 5
+                while admission.stats()['waiting'] == 0 and time.time() < deadline:
+                    time.sleep(0.01)
+                assert admission.stats()['waiting'] == 1 and not updates, "Live update did not wait for memory"
+            finally:
+                admission.release(cost)
+            updater.join(5)
+            assert len(updates) == 1 and admission.stats()['in_use'] == 0, "Live update not built after the wait"
+            print("[PASS] Live chart updates wait for memory instead of being refused")
+
+            metrics = client.get('/metrics').get_data(as_text=True)
+            assert 'dataviz_admission_wait_seconds_count{outcome="rejected"}' in metrics
+            assert 'dataviz_admission_rejected_total{reason="queue_full"}' in metrics
+            print("[PASS] Queue depth, wait times and rejections exported in /metrics")
+        finally:
+            admission.capacity, admission.max_waiting, app.app.config['ADMISSION_WAIT_SECONDS'] = saved
+            restore_upload_folder(app, folder)
+
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] Admission control test failed: {e}")
+        return False
+
 def main():
     """Run all comprehensive tests"""
     print("=== COMPREHENSIVE DATA VISUALIZATION DASHBOARD TEST SUITE ===\n")
@@ -287,6 +1673,31 @@ def main():
         test_chart_generation,
         test_error_handling,
         run_http_tests,
+        test_dataframe_cache,
+        test_columnar_conversion,
+        test_point_budget,
+        test_preaggregated_charts,
+        test_streaming_ingest,
+        test_figure_cache,
+        test_upload_profile,
+        test_batch_charts,
+        test_figure_serialization,
+        test_production_server,
+        test_benchmark_suite,
+        test_request_metrics,
+        test_chart_jobs,
+        test_import_time,
+        test_projected_loading,
+        test_columnar_store,
+        test_incremental_append,
+        test_live_updates,
+        test_parallel_ingest,
+        test_chart_filters,
+        test_zoom_pyramid,
+        test_column_sketches,
+        test_upload_dedup,
+        test_time_resampling,
+        test_admission_control,
     ]
 
     results = []
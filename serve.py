@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Production server for Data Visualization Dashboard
+Runs the app under gunicorn with several worker processes, loading pandas and
+plotly once in the master so forked workers share them copy-on-write
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+START_TIME = time.perf_counter()
+
+logger = logging.getLogger('serve')
+
+def preload():
+    """Import the app and warm the libraries it renders charts with"""
+    started = time.perf_counter()
+    import app as dashboard
+
+    # The app imports pandas and plotly on first use; load them now so the
+    # workers inherit them. Plotly also loads its templates and validators on
+    # first use, so build one tiny figure before forking too
+    dashboard.warm_imports()
+    dashboard.serialize_figure(dashboard.px.bar(dashboard.pd.DataFrame({'x': ['a'], 'y': [1]}), x='x', y='y'))
+    return dashboard.app, time.perf_counter() - started
+
+class FirstRequestTimer:
+    """WSGI middleware logging how long each process takes to serve its first request"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.pid = None
+        self.first_request_ms = None
+
+    def __call__(self, environ, start_response):
+        if self.pid == os.getpid():
+            return self.wsgi_app(environ, start_response)
+
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            self.pid = os.getpid()
+            self.first_request_ms = (time.perf_counter() - started) * 1000
+            logger.info("Process %d served its first request (%s) in %.1f ms",
+                        self.pid, environ.get('PATH_INFO'), self.first_request_ms)
+
+def server_options(config, args):
+    """Gunicorn settings from the app config, overridden by command line arguments"""
+    return {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers or config['SERVER_WORKERS'],
+        'threads': args.threads or config['SERVER_THREADS'],
+        'timeout': args.timeout or config['SERVER_TIMEOUT'],
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'when_ready': lambda server: logger.info(
+            "Ready to serve on %s after %.2f s", args.host + ':' + str(args.port),
+            time.perf_counter() - START_TIME),
+    }
+
+def run_gunicorn(wsgi_app, options):
+    from gunicorn.app.base import BaseApplication
+
+    class DashboardServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return wsgi_app
+
+    DashboardServer().run()
+
+def run_fallback(wsgi_app, args, config):
+    """Serve with waitress, or the threaded Werkzeug server, where gunicorn is unavailable"""
+    threads = args.threads or config['SERVER_THREADS']
+    try:
+        from waitress import serve
+    except ImportError:
+        from werkzeug.serving import run_simple
+        logger.warning("gunicorn and waitress are not installed; using the single-process Werkzeug server")
+        logger.info("Ready to serve on %s:%d after %.2f s", args.host, args.port, time.perf_counter() - START_TIME)
+        run_simple(args.host, args.port, wsgi_app, threaded=True)
+        return
+
+    logger.warning("gunicorn is not available; serving with waitress in a single process")
+    logger.info("Ready to serve on %s:%d after %.2f s", args.host, args.port, time.perf_counter() - START_TIME)
+    serve(wsgi_app, host=args.host, port=args.port, threads=threads, channel_timeout=args.timeout or config['SERVER_TIMEOUT'])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the dashboard with a production server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: SERVER_WORKERS)")
+    parser.add_argument('--threads', type=int, help="Threads per worker (default: SERVER_THREADS)")
+    parser.add_argument('--timeout', type=int, help="Seconds before a silent worker is restarted (default: SERVER_TIMEOUT)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(name)s: %(message)s')
+    args = parse_args(argv)
+
+    flask_app, load_seconds = preload()
+    logger.info("Loaded app, pandas and plotly in %.2f s", load_seconds)
+    wsgi_app = FirstRequestTimer(flask_app)
+
+    try:
+        import gunicorn  # noqa: F401 - not available on Windows
+    except ImportError:
+        run_fallback(wsgi_app, args, flask_app.config)
+    else:
+        run_gunicorn(wsgi_app, server_options(flask_app.config, args))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,41 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let chartCounter = 0;
 
+    // Charts of large datasets are built as background jobs that can be cancelled
+    const useJobs = chartsContainer.dataset.useJobs === 'true';
+
+    // Server-sent events bringing the charts up to date as the dataset grows, once switched on
+    let liveEvents = null;
+    let liveTimer = null;
+
+    // Downsampled line and scatter charts fetch the points of their visible range when zoomed
+    const zoomMethods = ['minmax', 'sample', 'density'];
+
+    // Get filename from URL
+    const filename = window.location.pathname.split('/').pop();
+    const storageKey = `dashboard:${filename}`;
+
+    // Live updates hold a server connection open, so each dashboard opts in
+    const liveToggle = document.getElementById('liveToggle');
+    liveToggle.checked = localStorage.getItem(`${storageKey}:live`) === 'true';
+    liveToggle.addEventListener('change', function() {
+        localStorage.setItem(`${storageKey}:live`, this.checked);
+        if (this.checked) {
+            scheduleLive(0);
+        } else {
+            stopLive();
+        }
+    });
+
+    // Line charts of date columns can be resampled into time buckets
+    const resampleGroup = document.getElementById('resampleGroup');
+    const datetimeColumns = JSON.parse(resampleGroup.dataset.datetimeColumns);
+    const xColumnSelect = document.getElementById('xColumn');
+
+    function canResample() {
+        return chartTypeSelect.value === 'line' && datetimeColumns.includes(xColumnSelect.value);
+    }
+
     // Handle chart type changes to show/hide Y column selector
     chartTypeSelect.addEventListener('change', function() {
         const yColumnGroup = document.getElementById('yColumnGroup');
@@ -18,6 +53,11 @@ document.addEventListener('DOMContentLoaded', function() {
         } else {
             yColumnGroup.style.display = 'block';
         }
+        resampleGroup.style.display = canResample() ? 'block' : 'none';
+    });
+
+    xColumnSelect.addEventListener('change', function() {
+        resampleGroup.style.display = canResample() ? 'block' : 'none';
     });
 
     // Handle form submission
@@ -31,12 +71,24 @@ document.addEventListener('DOMContentLoaded', function() {
             y_column: formData.get('yColumn'),
             color_column: formData.get('colorColumn')
         };
+        if (canResample() && formData.get('resample')) {
+            chartData.resample = formData.get('resample');
+            chartData.aggregation = formData.get('aggregation');
+        }
+        // The server evaluates filters before building the chart
+        if (formData.get('filterColumn') && formData.get('filterValue') !== '') {
+            chartData.filters = [{
+                column: formData.get('filterColumn'),
+                op: formData.get('filterOp'),
+                value: formData.get('filterValue')
+            }];
+        }
 
-        // Get filename from URL
-        const urlParams = new URLSearchParams(window.location.search);
-        const filename = window.location.pathname.split('/').pop();
-
-        generateChart(filename, chartData);
+        if (useJobs) {
+            submitChartJob(filename, chartData);
+        } else {
+            generateChart(filename, chartData);
+        }
     });
 
     // Generate chart via AJAX
@@ -50,18 +102,14 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch(`/api/generate_chart/${filename}`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(chartData)
-            });
+            // GET lets the browser reuse cached charts, revalidated by ETag
+            const response = await fetchChart(`/api/generate_chart/${filename}?${chartQuery(chartData)}`);
 
             const result = await response.json();
 
             if (response.ok) {
-                addChart(chartData, result.chart);
+                addChart(chartData, result.chart, result.reduction);
+                saveCharts();
                 showAlert('Chart generated successfully!', 'success');
             } else {
                 showAlert('Error: ' + result.error, 'error');
@@ -75,68 +123,436 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Add chart to container
-    function addChart(chartData, chartJson) {
-        chartCounter++;
+    // Fetch chart data, waiting as long as Retry-After asks while the server is busy with other charts
+    async function fetchChart(url, options) {
+        for (let attempt = 1; ; attempt++) {
+            const response = await fetch(url, options);
+            if (response.status !== 429 || attempt === 3) {
+                return response;
+            }
+            const seconds = Number(response.headers.get('Retry-After')) || 1;
+            await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+        }
+    }
+
+    // Build a chart as a background job, showing a placeholder until it is done
+    async function submitChartJob(filename, chartData) {
+        let job;
+        try {
+            const response = await fetch(`/api/jobs/${filename}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(chartData)
+            });
+            job = await response.json();
+            if (!response.ok) {
+                showAlert('Error: ' + job.error, 'error');
+                return;
+            }
+        } catch (error) {
+            showAlert('Network error: ' + error.message, 'error');
+            return;
+        }
 
-        // Clone template
-        const chartWrapper = chartTemplate.content.cloneNode(true);
-        const chartElement = chartWrapper.querySelector('.chart-wrapper');
-        const chartContainer = chartWrapper.querySelector('.chart-container');
-        const chartTitle = chartWrapper.querySelector('.chart-title');
+        if (job.status === 'done') {
+            addChart(chartData, job.result.chart, job.result.reduction);
+            saveCharts();
+            return;
+        }
 
-        // Set chart title
-        const title = getChartTitle(chartData);
-        chartTitle.textContent = title;
+        const events = new EventSource(`/api/jobs/${job.job_id}/events`);
+        // Removing the placeholder cancels the job so the server stops working on it
+        const pending = addPendingChart(chartData, () => {
+            events.close();
+            fetch(`/api/jobs/${job.job_id}`, {method: 'DELETE'});
+        });
+        saveCharts();
 
-        // Set unique ID for chart container
-        const chartId = `chart-${chartCounter}`;
-        chartContainer.id = chartId;
+        events.addEventListener('running', () => {
+            pending.querySelector('.chart-note').textContent = 'Building chart...';
+        });
+        events.addEventListener('done', event => {
+            events.close();
+            const result = JSON.parse(event.data).result;
+            addChart(chartData, result.chart, result.reduction, pending);
+            saveCharts();
+        });
+        ['failed', 'cancelled'].forEach(status => {
+            events.addEventListener(status, event => {
+                events.close();
+                pending.remove();
+                saveCharts();
+                if (status === 'failed') {
+                    showAlert('Error: ' + JSON.parse(event.data).error, 'error');
+                }
+            });
+        });
+    }
+
+    // Encode a chart spec as query parameters, leaving out empty fields
+    function chartQuery(chartData) {
+        const params = new URLSearchParams();
+        Object.entries(chartData).forEach(([key, value]) => {
+            if (value) {
+                // Filters and time windows are sent as JSON text
+                params.append(key, typeof value === 'object' ? JSON.stringify(value) : value);
+            }
+        });
+        return params.toString();
+    }
+
+    // Restore the charts saved for this dataset, rendering each as it arrives
+    async function restoreCharts() {
+        const saved = JSON.parse(localStorage.getItem(storageKey) || '[]');
+        if (saved.length === 0) {
+            return;
+        }
+
+        try {
+            const response = await fetchChart(`/api/generate_charts/${filename}?stream=1`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({charts: saved})
+            });
+            if (!response.ok) {
+                const result = await response.json();
+                showAlert('Error restoring charts: ' + result.error, 'error');
+                return;
+            }
+
+            // Keep the saved order even though charts finish out of order
+            const slots = saved.map(() => {
+                const slot = document.createElement('div');
+                chartsContainer.appendChild(slot);
+                return slot;
+            });
+            await readLines(response, line => {
+                const {index, result} = JSON.parse(line);
+                if (result.error) {
+                    showAlert('Error restoring chart: ' + result.error, 'error');
+                    slots[index].remove();
+                } else {
+                    addChart(saved[index], result.chart, result.reduction, slots[index]);
+                }
+            });
+            saveCharts();
+        } catch (error) {
+            showAlert('Network error: ' + error.message, 'error');
+        }
+    }
+
+    // Call onLine for every line of a streamed NDJSON response
+    async function readLines(response, onLine) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const {done, value} = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), {stream: !done});
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(onLine);
+            if (done) {
+                break;
+            }
+        }
+        if (buffer.trim()) {
+            onLine(buffer);
+        }
+    }
+
+    // Remember the specs of the charts on screen so the dashboard can be restored
+    function saveCharts() {
+        const specs = Array.from(chartsContainer.querySelectorAll('.chart-wrapper'))
+            .map(chart => JSON.parse(chart.dataset.spec));
+        localStorage.setItem(storageKey, JSON.stringify(specs));
+
+        // Follow the charts now on screen
+        if (liveToggle.checked) {
+            scheduleLive(500);
+        }
+    }
+
+    function scheduleLive(delay) {
+        clearTimeout(liveTimer);
+        liveTimer = setTimeout(connectLive, delay);
+    }
+
+    function stopLive() {
+        clearTimeout(liveTimer);
+        if (liveEvents) {
+            liveEvents.close();
+            liveEvents = null;
+        }
+    }
+
+    // Open the live channel for the drawn charts, each with the row count it was drawn from
+    function connectLive() {
+        stopLive();
+        if (!liveToggle.checked) {
+            return;
+        }
+        const charts = Array.from(chartsContainer.querySelectorAll('.chart-wrapper[data-rows]'));
+        if (charts.length === 0) {
+            return;
+        }
+
+        const specs = charts.map(chart => Object.assign(JSON.parse(chart.dataset.spec), {rows: Number(chart.dataset.rows)}));
+        liveEvents = new EventSource(`/api/live/${filename}?charts=${encodeURIComponent(JSON.stringify(specs))}`);
+        liveEvents.addEventListener('dataset', event => {
+            document.getElementById('datasetRows').textContent = JSON.parse(event.data).rows.toLocaleString();
+        });
+        liveEvents.addEventListener('update', event => {
+            const {index, update} = JSON.parse(event.data);
+            applyUpdate(charts[index], update);
+        });
+        // Reconnect with the current row counts rather than the ones in the original URL; the
+        // server refuses streams while too many dashboards are live, so retry slowly
+        liveEvents.onerror = () => {
+            liveEvents.close();
+            liveEvents = null;
+            scheduleLive(15000);
+        };
+    }
+
+    // Apply a live update: new points appended to the traces, or new trace data
+    function applyUpdate(chartElement, update) {
+        if (!chartElement.isConnected) {
+            return;
+        }
+        if (update.type === 'error') {
+            showAlert('Error updating chart: ' + update.error, 'error');
+            return;
+        }
+
+        const plot = chartElement.querySelector('.chart-container');
+        if (!plot.data) {
+            reloadChart(chartElement);
+            return;
+        }
+        if (update.type === 'extend') {
+            const indices = update.traces.map(trace =>
+                trace.name === null ? 0 : plot.data.findIndex(existing => existing.name === trace.name));
+            if (indices.includes(-1)) {
+                // A new color value needs a trace of its own
+                reloadChart(chartElement);
+                return;
+            }
+            Plotly.extendTraces(plot, {
+                x: update.traces.map(trace => trace.x),
+                y: update.traces.map(trace => trace.y)
+            }, indices);
+        } else {
+            // Only the trace data is sent; the chart keeps its layout
+            Plotly.react(plot, update.data, plot.layout);
+        }
+        setChartRows(chartElement, update.reduction);
+        if (chartElement.dataset.zoom) {
+            // The update covers the whole dataset; show the zoomed range again
+            loadZoom(chartElement);
+        }
+    }
+
+    // Redraw a chart from the full chart API
+    async function reloadChart(chartElement) {
+        const chartData = JSON.parse(chartElement.dataset.spec);
+        try {
+            const response = await fetchChart(`/api/generate_chart/${filename}?${chartQuery(chartData)}`);
+            const result = await response.json();
+            if (!response.ok) {
+                showAlert('Error updating chart: ' + result.error, 'error');
+                return;
+            }
+            const plot = chartElement.querySelector('.chart-container');
+            Plotly.react(plot, result.chart.data, result.chart.layout);
+            setChartRows(chartElement, result.reduction);
+        } catch (error) {
+            showAlert('Network error: ' + error.message, 'error');
+        }
+    }
+
+    // Record the row count a chart was drawn from and explain its data reduction
+    function setChartRows(chartElement, reduction) {
+        // Filtered charts count the dataset's rows before filtering
+        chartElement.dataset.rows = reduction.filtered_from ?? reduction.input_points;
+        chartElement.dataset.zoomable = zoomMethods.includes(reduction.method);
+        chartElement.querySelector('.chart-note').textContent = getReductionNote(reduction);
+    }
+
+    // Clone the chart template for a spec; onRemove runs when the chart is removed
+    function createChartCard(chartData, onRemove) {
+        const chartElement = chartTemplate.content.cloneNode(true).querySelector('.chart-wrapper');
+        chartElement.dataset.spec = JSON.stringify(chartData);
+
+        // Set chart title
+        chartElement.querySelector('.chart-title').textContent = getChartTitle(chartData);
 
         // Add remove functionality
-        const removeBtn = chartWrapper.querySelector('.chart-remove');
+        const removeBtn = chartElement.querySelector('.chart-remove');
         removeBtn.addEventListener('click', function() {
+            if (onRemove) {
+                onRemove();
+            }
             chartElement.remove();
+            saveCharts();
         });
 
+        return chartElement;
+    }
+
+    // Add a placeholder for a chart that is still being built
+    function addPendingChart(chartData, onRemove) {
+        const chartElement = createChartCard(chartData, onRemove);
+        chartElement.querySelector('.chart-note').textContent = 'Waiting for a worker...';
+        chartsContainer.appendChild(chartElement);
+        return chartElement;
+    }
+
+    // Add chart to container, replacing placeholder when given
+    function addChart(chartData, chartJson, reduction, placeholder) {
+        chartCounter++;
+
+        const chartElement = createChartCard(chartData);
+        const chartContainer = chartElement.querySelector('.chart-container');
+
+        // Explain when the server reduced the data to fit the point budget
+        setChartRows(chartElement, reduction);
+
+        // Set unique ID for chart container
+        const chartId = `chart-${chartCounter}`;
+        chartContainer.id = chartId;
+
         // Add to container
-        chartsContainer.appendChild(chartWrapper);
+        if (placeholder) {
+            placeholder.replaceWith(chartElement);
+        } else {
+            chartsContainer.appendChild(chartElement);
+        }
 
         // Render Plotly chart
         setTimeout(() => {
-            Plotly.newPlot(chartId, chartJson.data, chartJson.layout, {responsive: true});
+            Plotly.newPlot(chartId, chartJson.data, chartJson.layout, {responsive: true})
+                .then(() => watchZoom(chartElement));
         }, 100);
     }
 
+    // Load the points of the visible range when a downsampled chart is zoomed, and the overview when reset
+    function watchZoom(chartElement) {
+        const plot = chartElement.querySelector('.chart-container');
+        plot.on('plotly_relayout', event => {
+            if (chartElement.dataset.zoomable !== 'true') {
+                return;
+            }
+            clearTimeout(chartElement.zoomTimer);
+            if (event['xaxis.autorange'] || event['yaxis.autorange']) {
+                delete chartElement.dataset.zoom;
+                reloadChart(chartElement);
+            } else if (Object.keys(event).some(key => key.startsWith('xaxis.range') || key.startsWith('yaxis.range'))) {
+                chartElement.dataset.zoom = JSON.stringify({x: plot.layout.xaxis.range, y: plot.layout.yaxis.range});
+                chartElement.zoomTimer = setTimeout(() => loadZoom(chartElement), 250);
+            }
+        });
+    }
+
+    // Replace the traces of a zoomed chart with the points in view, at the chart's point budget
+    async function loadZoom(chartElement) {
+        const zoom = JSON.parse(chartElement.dataset.zoom);
+        const chartData = JSON.parse(chartElement.dataset.spec);
+        const range = {x_start: String(zoom.x[0]), x_end: String(zoom.x[1])};
+        if (chartData.chart_type === 'scatter') {
+            Object.assign(range, {y_start: String(zoom.y[0]), y_end: String(zoom.y[1])});
+        }
+        const requestId = chartElement.zoomRequest = (chartElement.zoomRequest || 0) + 1;
+        try {
+            const response = await fetchChart(`/api/zoom/${filename}?${chartQuery(Object.assign({}, chartData, range))}`);
+            const result = await response.json();
+            // Skip responses overtaken by a later zoom or a reset
+            if (requestId !== chartElement.zoomRequest || !chartElement.dataset.zoom) {
+                return;
+            }
+            if (!response.ok) {
+                showAlert('Error zooming chart: ' + result.error, 'error');
+                return;
+            }
+            const plot = chartElement.querySelector('.chart-container');
+            Plotly.react(plot, result.data, plot.layout);
+            chartElement.querySelector('.chart-note').textContent = getReductionNote(result.reduction);
+        } catch (error) {
+            showAlert('Network error: ' + error.message, 'error');
+        }
+    }
+
     // Generate chart title based on data
     function getChartTitle(chartData) {
         const chartType = chartData.chart_type;
         const x = chartData.x_column;
         const y = chartData.y_column;
         const color = chartData.color_column;
+        const filters = (chartData.filters || [])
+            .map(filter => `${filter.column} ${filter.op} ${JSON.stringify(filter.value)}`).join(', ');
+        const suffix = filters ? ` (${filters})` : '';
 
         switch(chartType) {
             case 'bar':
-                return y ? `${y} by ${x}` : `Count of ${x}`;
+                return (y ? `${y} by ${x}` : `Count of ${x}`) + suffix;
             case 'line':
-                return `${y} over ${x}`;
+                return (chartData.resample ? `${chartData.aggregation} of ${y} over ${x}` : `${y} over ${x}`) + suffix;
             case 'scatter':
-                return `${x} vs ${y}`;
+                return `${x} vs ${y}` + suffix;
             case 'pie':
-                return `Distribution of ${x}`;
+                return `Distribution of ${x}` + suffix;
             case 'histogram':
-                return `Distribution of ${x}`;
+                return `Distribution of ${x}` + suffix;
             default:
                 return 'Chart';
         }
     }
 
+    // Describe server-side filtering and data reduction for the chart footer
+    function getReductionNote(reduction) {
+        if (!reduction) {
+            return '';
+        }
+        const input = reduction.input_points.toLocaleString();
+        const output = reduction.output_points.toLocaleString();
+        const filtered = reduction.filtered_from === undefined ? '' :
+            `${input} of ${reduction.filtered_from.toLocaleString()} rows match the filters. `;
+
+        switch(reduction.method) {
+            case 'minmax':
+                return filtered + `Downsampled from ${input} to ${output} points (min/max per bucket)`;
+            case 'resample':
+                return filtered + `${input} points resampled to ${output} (${reduction.aggregation} per ${reduction.bucket})`;
+            case 'webgl':
+                return filtered + `${input} points rendered with WebGL`;
+            case 'sample':
+                return filtered + `Random sample of ${output} out of ${input} points`;
+            case 'density':
+                return filtered + `${input} points binned into a density map`;
+            case 'top_values': {
+                const error = reduction.max_error ? ` (counts at most ${reduction.max_error.toLocaleString()} too high)` : '';
+                return `Most frequent of ~${reduction.distinct.toLocaleString()} values, the rest grouped as Other` + error;
+            }
+            case 'zoom':
+                return reduction.level === 0 ? `All ${input} points in view` : `${output} of ${input} points in view`;
+            default:
+                return filtered.trim();
+        }
+    }
+
     // Clear all charts
     clearChartsBtn.addEventListener('click', function() {
         if (confirm('Are you sure you want to clear all charts?')) {
+            // Remove through each chart's button so pending jobs are cancelled too
             const charts = chartsContainer.querySelectorAll('.chart-wrapper');
-            charts.forEach(chart => chart.remove());
+            charts.forEach(chart => chart.querySelector('.chart-remove').click());
             chartCounter = 0;
+            saveCharts();
         }
     });
 
@@ -164,4 +580,5 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Initialize - trigger change event for initial chart type
     chartTypeSelect.dispatchEvent(new Event('change'));
+    restoreCharts();
 });
\ No newline at end of file
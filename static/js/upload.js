@@ -0,0 +1,82 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const uploadForm = document.getElementById('uploadForm');
+    const fileInput = document.getElementById('file');
+    const progressWrapper = document.getElementById('uploadProgress');
+    const progressBar = progressWrapper.querySelector('.progress-bar');
+    const chunkSize = parseInt(uploadForm.dataset.chunkSize, 10);
+    const maxRetries = 5;
+
+    // Large files are sent in parts so they are not limited by the request size cap
+    uploadForm.addEventListener('submit', function(e) {
+        const file = fileInput.files[0];
+        if (!file || file.size <= chunkSize) {
+            return;
+        }
+        e.preventDefault();
+        uploadInChunks(file);
+    });
+
+    async function uploadInChunks(file) {
+        const submitBtn = uploadForm.querySelector('button[type="submit"]');
+        submitBtn.disabled = true;
+        progressWrapper.style.display = 'block';
+
+        try {
+            const start = await postJson('/api/uploads', {filename: file.name, size: file.size});
+            const uploadId = start.upload_id;
+            let offset = start.offset;
+            let retries = 0;
+
+            while (offset < file.size) {
+                const part = file.slice(offset, offset + chunkSize);
+                try {
+                    const response = await fetch(`/api/uploads/${uploadId}?offset=${offset}`, {
+                        method: 'PUT',
+                        headers: {'Content-Type': 'application/octet-stream'},
+                        body: part
+                    });
+                    const result = await response.json();
+                    if (!response.ok && response.status !== 409) {
+                        throw new Error(result.error);
+                    }
+                    // On a conflict the server reports the offset to resume from
+                    offset = result.offset;
+                    retries = 0;
+                } catch (error) {
+                    if (++retries > maxRetries) {
+                        throw error;
+                    }
+                    const status = await fetch(`/api/uploads/${uploadId}`).then(r => r.json());
+                    offset = status.offset;
+                }
+                setProgress(offset / file.size);
+            }
+
+            const complete = await postJson(`/api/uploads/${uploadId}/complete`, {});
+            window.location.href = complete.dashboard_url;
+        } catch (error) {
+            alert('Upload failed: ' + error.message);
+            submitBtn.disabled = false;
+            progressWrapper.style.display = 'none';
+        }
+    }
+
+    async function postJson(url, body) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(body)
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.error);
+        }
+        return result;
+    }
+
+    function setProgress(fraction) {
+        const percent = Math.round(fraction * 100);
+        progressBar.style.width = `${percent}%`;
+        progressBar.textContent = `${percent}%`;
+    }
+});